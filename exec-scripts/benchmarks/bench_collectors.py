@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end các collector trên fleet SSH giả lập (benchmarks/sshsim.py).
+
+Với mỗi driver và mỗi kích thước fleet: dựng N thiết bị giả lập (server SSH thật trên
+các địa chỉ 127.10.x.y), ghi inventory CSV, rồi chạy collect_metrics_from_device của
+script vendor qua run_collection trong một process con riêng, nên peak RSS và CPU
+chỉ tính cho collector (cả process ssh con của cisco_cbs220), không gồm simulator.
+
+Báo cáo: wall time, phân vị p50/p95/p99 thời gian mỗi thiết bị (duration_seconds của
+collector_device_status), số thiết bị lấy được metrics, peak RSS và CPU (user+sys).
+
+    python3 benchmarks/bench_collectors.py --drivers cisco_sg,hillstone --devices 1,10,100,1000
+    python3 benchmarks/bench_collectors.py --devices 200 --latency 0.2 --failures hang=0.02,auth_fail=0.01
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.sshsim import SimulatedFleet, add_behaviour_arguments, behaviour_from_args, parse_failures
+
+STATUS_PATTERN = re.compile(r'^collector_device_status,.* status="(\w+)",duration_seconds=([\d.]+)')
+
+
+class _RecordingWriter:
+    """Writer thay cho LineWriter: giữ thời gian, trạng thái và số metrics của từng thiết bị."""
+
+    def __init__(self):
+        self.devices = []
+        self.lines = 0
+
+    def write_lines(self, lines):
+        self.lines += len(lines)
+        status, duration = None, 0.0
+        metrics = 0
+        for line in lines:
+            match = STATUS_PATTERN.match(line)
+            if match:
+                status, duration = match.group(1), float(match.group(2))
+            elif not line.startswith("collector_"):
+                metrics += 1
+        if status is not None:
+            # Lô không có collector_device_status là dòng collector_stats của cả lần chạy
+            self.devices.append((status, duration, metrics))
+
+    def close(self):
+        pass
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_driver(driver_name, inventory_path):
+    """Chế độ process con: chạy một lần thu thập và in kết quả dạng JSON ra stdout."""
+    from common.drivers import load_driver
+    from common.engine import run_collection
+    from common.inventory import Inventory
+
+    driver = load_driver(driver_name)
+    devices = Inventory(inventory_path).select(vendor=driver_name)
+    writer = _RecordingWriter()
+    start = time.perf_counter()
+    run_collection(devices, driver.collect_metrics_from_device, writer)
+    wall = time.perf_counter() - start
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss là KB trên Linux, byte trên macOS
+    rss_unit = 1048576 if sys.platform == "darwin" else 1024
+    durations = [duration for _, duration, _ in writer.devices]
+    statuses = {}
+    for status, _, _ in writer.devices:
+        statuses[status] = statuses.get(status, 0) + 1
+    json.dump({
+        'devices': len(devices),
+        'wall': wall,
+        'p50': percentile(durations, 0.50),
+        'p95': percentile(durations, 0.95),
+        'p99': percentile(durations, 0.99),
+        'with_metrics': sum(1 for _, _, metrics in writer.devices if metrics),
+        'statuses': statuses,
+        'lines': writer.lines,
+        'peak_rss_mb': own.ru_maxrss / rss_unit,
+        'cpu_s': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+    }, sys.stdout)
+
+
+def run_case(driver_name, count, args, host_key):
+    """Dựng fleet, chạy process con đo collector, trả về dict kết quả."""
+    fleet = SimulatedFleet(driver_name, count, behaviour_from_args(args), parse_failures(args.failures),
+                           workers=args.sim_workers, base_address=args.base_address,
+                           distinct_addresses=not args.single_address, host_key=host_key).start()
+    state_dir = tempfile.mkdtemp(prefix="bench-collectors-")
+    try:
+        inventory_path = os.path.join(state_dir, "inventory.csv")
+        fleet.write_inventory(inventory_path)
+        env = dict(
+            os.environ,
+            COLLECTOR_STATE_DIR=state_dir,
+            COLLECTOR_CONCURRENCY=str(args.concurrency),
+            COLLECTOR_RUN_DEADLINE=str(args.run_deadline),
+            # Mỗi lần chạy thu thập mọi nhóm, không circuit breaker, không multiplexing ssh
+            COLLECTOR_SCHEDULE="0",
+            COLLECTOR_BREAKER="0",
+            COLLECTOR_SSH_CONTROL_PERSIST="0",
+        )
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-driver", driver_name, "--inventory", inventory_path],
+            env=env, stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{driver_name} x{count}: collector process exited with {result.returncode}")
+        stats = json.loads(result.stdout)
+        stats['failures'] = fleet.failures()
+        return stats
+    finally:
+        fleet.close()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drivers", default="cisco_sg,cisco_cbs220,hillstone")
+    parser.add_argument("--devices", default="1,10,100", help="Fleet sizes, e.g. 1,10,100,1000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--run-deadline", type=float, default=0, help="COLLECTOR_RUN_DEADLINE (0 = no limit)")
+    parser.add_argument("--sim-workers", type=int, default=max(1, min(4, (os.cpu_count() or 1) // 2)),
+                        help="Simulator server processes")
+    parser.add_argument("--base-address", default="127.10.0.1")
+    parser.add_argument("--single-address", action="store_true", help="All devices on 127.0.0.1 (macOS)")
+    parser.add_argument("--verbose", action="store_true", help="Show collector stderr")
+    parser.add_argument("--run-driver", help=argparse.SUPPRESS)
+    parser.add_argument("--inventory", help=argparse.SUPPRESS)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    if args.run_driver:
+        run_driver(args.run_driver, args.inventory)
+        return
+
+    import paramiko
+    host_key = paramiko.RSAKey.generate(2048)
+    print(f"{'driver':<13} {'devices':>7} {'wall_s':>8} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} "
+          f"{'ok':>6} {'rss_mb':>7} {'cpu_s':>7}  notes")
+    ok = True
+    for driver_name in filter(None, args.drivers.split(",")):
+        for count in (int(value) for value in args.devices.split(",")):
+            try:
+                stats = run_case(driver_name, count, args, host_key)
+            except (RuntimeError, ValueError, OSError) as e:
+                print(f"{driver_name:<13} {count:>7}  failed: {e}")
+                ok = False
+                continue
+            notes = " ".join(f"{status}={number}" for status, number in sorted(stats['statuses'].items())
+                             if status != "completed")
+            if stats['failures']:
+                notes += " injected " + ",".join(f"{mode}={number}" for mode, number in sorted(stats['failures'].items()))
+            print(f"{driver_name:<13} {count:>7} {stats['wall']:>8.2f} {stats['p50']:>7.3f} {stats['p95']:>7.3f} "
+                  f"{stats['p99']:>7.3f} {stats['with_metrics']:>6} {stats['peak_rss_mb']:>7.1f} "
+                  f"{stats['cpu_s']:>7.2f}  {notes.strip()}", flush=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
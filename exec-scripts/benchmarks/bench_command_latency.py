@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark độ trễ mỗi lệnh: vòng đọc cũ (sleep(delay) + poll recv_ready mỗi 100ms)
+so với PromptReader, trên thiết bị giả lập với nhiều mức độ trễ phản hồi.
+Phần thứ hai so sánh gửi tuần tự với send_batch (pipelining) khi RTT cao.
+
+    python3 benchmarks/bench_command_latency.py --iterations 3 --rtt 0.2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.channel import PromptReader
+from benchmarks.fakedevice import SimulatedDevice
+
+SHOW_CPU = "CPU utilization for five seconds: 3%; one minute: 2%; five minutes: 2%;"
+BATCH_RESPONSES = {
+    "show cpu": SHOW_CPU,
+    "show tech-support memory": "Total = 262144, Free = 100000, Used = 162144, Usage = 61%",
+    "show interface status": "gi1/0/1 connected 1 a-full a-1000 copper",
+    "show inventory": 'NAME: "1" DESCR: "SG350-28P"',
+}
+
+
+def legacy_send_command(channel, command, delay=2):
+    """Vòng đọc cũ của CiscoSSHClient.send_command (trước khi có PromptReader)."""
+    channel.send(command + "\n")
+    time.sleep(delay)
+    output = ""
+    start_time = time.time()
+    while time.time() - start_time < 15:
+        if channel.recv_ready():
+            output += channel.recv(4096).decode('utf-8', errors='ignore')
+        else:
+            time.sleep(0.1)
+        if output.strip().endswith('#'):
+            break
+    return output
+
+
+def measure(send, latency, iterations):
+    device = SimulatedDevice({"show cpu": SHOW_CPU}, latency=latency)
+    reader = PromptReader(device.channel)
+    banner, _ = reader.read_until_prompt(5)
+    reader.learn_prompt(banner)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        send(device, reader)
+        samples.append(time.perf_counter() - start)
+    device.close()
+    return samples
+
+
+def measure_batch(rtt, iterations):
+    """So sánh N lệnh gửi tuần tự với send_batch trên thiết bị có RTT."""
+    commands = list(BATCH_RESPONSES)
+    device = SimulatedDevice(BATCH_RESPONSES, latency=0.01, rtt=rtt)
+    reader = PromptReader(device.channel)
+    banner, _ = reader.read_until_prompt(5)
+    reader.learn_prompt(banner)
+    results = {"sequential": [], "batch": []}
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for command in commands:
+            reader.send_command(command, 15)
+        results["sequential"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        reader.send_batch(commands, 15 * len(commands))
+        results["batch"].append(time.perf_counter() - start)
+    device.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--latencies", default="0.01,0.1,0.5",
+                        help="Độ trễ phản hồi của thiết bị giả lập (giây), phân cách bằng dấu phẩy")
+    parser.add_argument("--rtt", type=float, default=0.2,
+                        help="RTT mạng của thiết bị giả lập cho phần so sánh pipelining (giây)")
+    args = parser.parse_args()
+
+    engines = {
+        "legacy": lambda device, reader: legacy_send_command(device.channel, "show cpu"),
+        "prompt_reader": lambda device, reader: reader.send_command("show cpu", 15),
+    }
+
+    print(f"{'latency':>8} {'engine':>14} {'mean_ms':>10} {'max_ms':>10}")
+    for latency in (float(value) for value in args.latencies.split(",")):
+        for name, send in engines.items():
+            samples = measure(send, latency, args.iterations)
+            print(f"{latency:>8.3f} {name:>14} {statistics.mean(samples) * 1000:>10.1f} {max(samples) * 1000:>10.1f}")
+
+    print(f"\n{len(BATCH_RESPONSES)} commands, rtt={args.rtt}s")
+    print(f"{'mode':>12} {'mean_ms':>10} {'max_ms':>10}")
+    for mode, samples in measure_batch(args.rtt, args.iterations).items():
+        print(f"{mode:>12} {statistics.mean(samples) * 1000:>10.1f} {max(samples) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark wall-clock theo kích thước fleet: ThreadPoolExecutor(LIMIT_WORKERS=3) cũ
+so với engine asyncio (common.engine.run_collection) trên thiết bị giả lập.
+
+Dòng threadpool(--concurrency) là đối chứng cùng mức concurrency với engine: phần lớn
+chênh lệch so với threadpool(3) đến từ concurrency cao hơn, không phải từ asyncio.
+
+    python3 benchmarks/bench_fleet_scaling.py --devices 10,100,500 --concurrency 32
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.channel import PromptReader
+from common.engine import run_collection
+from common.output import LineWriter
+from benchmarks.fakedevice import SimulatedDevice
+
+RESPONSES = {
+    "show cpu": "CPU utilization for five seconds: 3%; one minute: 2%; five minutes: 2%;",
+    "show memory": "The percentage of memory utilization: 25%\n 2097152 528078 1569074",
+}
+LIMIT_WORKERS = 3
+
+
+def make_collect(latency):
+    def collect(device_config):
+        """Tương đương collect_metrics_from_device: mở session, chạy 2 lệnh, đóng."""
+        device = SimulatedDevice(RESPONSES, prompt=f"{device_config['hostname']}#", latency=latency)
+        try:
+            reader = PromptReader(device.channel)
+            banner, _ = reader.read_until_prompt(5)
+            reader.learn_prompt(banner)
+            metrics = []
+            for command in RESPONSES:
+                output, _ = reader.send_command(command, 15)
+                metrics.append(f"bench,agent_host={device_config['hostname']} bytes={len(output)}i")
+            return metrics
+        finally:
+            device.close()
+    return collect
+
+
+def run_threadpool(devices, collect, workers=LIMIT_WORKERS):
+    """Vòng __main__ cũ của cisco-sg / hillstone (workers=LIMIT_WORKERS). Returns số dòng metrics."""
+    all_metrics = []
+    with ThreadPoolExecutor(max_workers=min(len(devices), workers)) as executor:
+        futures = [executor.submit(collect, device) for device in devices]
+        for future in as_completed(futures):
+            all_metrics.extend(future.result())
+    return len(all_metrics)
+
+
+def run_engine(devices, collect, concurrency):
+    """Engine asyncio, metrics được ghi (và bỏ) qua LineWriter. Returns số dòng metrics."""
+    with open(os.devnull, 'w') as sink:
+        return run_collection(devices, collect, LineWriter(sink), concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", default="10,100,500")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="Độ trễ mỗi lệnh của thiết bị giả lập (giây)")
+    parser.add_argument("--skip-threadpool", action="store_true",
+                        help="Bỏ threadpool(3) cũ (rất chậm với fleet lớn); vẫn chạy đối chứng cùng concurrency")
+    args = parser.parse_args()
+
+    collect = make_collect(args.latency)
+    engines = {}
+    if not args.skip_threadpool:
+        engines[f"threadpool({LIMIT_WORKERS})"] = lambda devices: run_threadpool(devices, collect)
+    engines[f"threadpool({args.concurrency})"] = lambda devices: run_threadpool(devices, collect, args.concurrency)
+    engines[f"asyncio({args.concurrency})"] = lambda devices: run_engine(devices, collect, args.concurrency)
+
+    print(f"{'devices':>8} {'engine':>16} {'wall_s':>8} {'lines':>8} {'peak_rss_mb':>12}")
+    for count in (int(value) for value in args.devices.split(",")):
+        devices = [{'hostname': f"sim-{index}"} for index in range(count)]
+        for name, run in engines.items():
+            start = time.perf_counter()
+            lines = run(devices)
+            elapsed = time.perf_counter() - start
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{count:>8} {name:>16} {elapsed:>8.2f} {lines:>8} {peak_rss:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
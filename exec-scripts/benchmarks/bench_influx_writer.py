@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark InfluxWriter (common/influx.py) với một server HTTP giả lập /api/v2/write
+chạy cục bộ: so sánh ghi N dòng ra stdout (LineWriter vào /dev/null) với gửi batch
+gzip, đếm số request, số kết nối TCP và số byte nhận được. Server có thể trả 503
+cho vài request đầu (--fail-first) để kiểm tra retry không làm mất hay lặp dòng.
+
+    python3 benchmarks/bench_influx_writer.py --lines 200000 --batch-size 5000 --fail-first 2
+"""
+import argparse
+import gzip
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.influx import InfluxWriter
+from common.lineproto import SeriesEncoder
+from common.output import LineWriter
+
+
+class StubInflux:
+    """Server /api/v2/write giả lập: giải nén gzip, đếm dòng, request, kết nối và byte."""
+
+    def __init__(self, fail_first=0):
+        self.lines = []
+        self.requests = 0
+        self.connections = 0
+        self.wire_bytes = 0
+        self.raw_bytes = 0
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                with stub.lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                    if not failing:
+                        data = gzip.decompress(body) if self.headers.get('Content-Encoding') == 'gzip' else body
+                        stub.wire_bytes += len(body)
+                        stub.raw_bytes += len(data)
+                        stub.lines.extend(data.decode('utf-8').splitlines())
+                status = 503 if failing else 204
+                self.send_response(status)
+                if failing:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def make_devices(lines, per_device):
+    """Các nhóm dòng kiểu cisco_interface, mỗi nhóm là metrics của một thiết bị."""
+    timestamp = time.time_ns()
+    devices = []
+    for start in range(0, lines, per_device):
+        series = SeriesEncoder("cisco_interface", host=f"172.18.{start // per_device // 250}.{start // per_device % 250}")
+        devices.append([
+            series.encode({'status': index % 2, 'protocol': index % 2, 'vlan': str(index % 4094)}, timestamp,
+                          interface=f"gi1/0/{index % per_device}")
+            for index in range(start, min(lines, start + per_device))
+        ])
+    return devices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--per-device", type=int, default=52, help="Lines per device (one write_lines call)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--fail-first", type=int, default=0, help="Requests answered with 503 before accepting")
+    args = parser.parse_args()
+
+    devices = make_devices(args.lines, args.per_device)
+    expected = [line for lines in devices for line in lines]
+
+    with open(os.devnull, 'w') as devnull:
+        writer = LineWriter(devnull)
+        start = time.perf_counter()
+        for lines in devices:
+            writer.write_lines(lines)
+        writer.close()
+        stdout_elapsed = time.perf_counter() - start
+    print(f"stdout LineWriter: {args.lines} lines in {stdout_elapsed * 1000:.0f} ms")
+
+    stub = StubInflux(fail_first=args.fail_first)
+    writer = InfluxWriter(stub.url, "org", "bucket", token="token", batch_size=args.batch_size, flush_interval=1.0)
+    start = time.perf_counter()
+    for lines in devices:
+        writer.write_lines(lines)
+    enqueue_elapsed = time.perf_counter() - start
+    writer.close(timeout=60)
+    total_elapsed = time.perf_counter() - start
+    stub.close()
+
+    print(f"InfluxWriter:      {args.lines} lines enqueued in {enqueue_elapsed * 1000:.0f} ms, "
+          f"delivered in {total_elapsed * 1000:.0f} ms")
+    print(f"  {stub.requests} request(s) ({args.fail_first} failed) over {stub.connections} connection(s), "
+          f"{stub.raw_bytes / 1e6:.1f} MB line protocol -> {stub.wire_bytes / 1e6:.2f} MB gzip "
+          f"({stub.raw_bytes / max(1, stub.wire_bytes):.1f}x)")
+    ok = stub.lines == expected
+    print(f"  received {len(stub.lines)} line(s), {'identical to input' if ok else 'MISMATCH'}; "
+          f"writer sent={writer.sent} dropped={writer.dropped}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark chi phí khởi động của inventory: parse + dựng index cho YAML và CSV
+với 1000+ thiết bị, so với load_device_configs() quét biến môi trường đánh số.
+Đo thêm chi phí select() theo index và reload_if_changed() khi file không đổi
+(chi phí mỗi chu kỳ ở chế độ execd).
+
+    python3 benchmarks/bench_inventory_load.py --devices 1000,5000
+"""
+import argparse
+import csv
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.inventory import Inventory
+
+VENDORS = ["cisco_sg", "cisco_cbs220", "hillstone"]
+SITES = [f"site{index}" for index in range(20)]
+
+
+def device_rows(count):
+    for index in range(count):
+        yield {
+            'host': f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+            'vendor': VENDORS[index % len(VENDORS)],
+            'site': SITES[index % len(SITES)],
+            'tags': f"floor{index % 8};{'core' if index % 50 == 0 else 'access'}",
+            'port': "22",
+            'username': "admin",
+            'password': "${SWITCH_PASSWORD}",
+        }
+
+
+def write_csv(path, count):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(next(device_rows(1))))
+        writer.writeheader()
+        writer.writerows(device_rows(count))
+
+
+def write_yaml(path, count):
+    with open(path, 'w') as f:
+        f.write("defaults:\n  port: 22\n  username: admin\n  password: ${SWITCH_PASSWORD}\ndevices:\n")
+        for row in device_rows(count):
+            tags = ", ".join(row['tags'].split(";"))
+            f.write(f"  - host: {row['host']}\n    vendor: {row['vendor']}\n"
+                    f"    site: {row['site']}\n    tags: [{tags}]\n")
+
+
+def env_load(count):
+    """Cách cũ: CISCO_HOST_1..N trong os.environ, load_device_configs của cisco-sg."""
+    env = {}
+    for index, row in enumerate(device_rows(count), 1):
+        env[f"CISCO_HOST_{index}"] = row['host']
+        env[f"CISCO_USERNAME_{index}"] = row['username']
+        env[f"CISCO_PASSWORD_{index}"] = "secret"
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cisco-sg", "device_cisco.py")
+    spec = importlib.util.spec_from_file_location("bench_cisco_sg", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return lambda: module.load_device_configs(env)
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", default="1000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    print(f"{'devices':>8} {'source':>8} {'load_ms':>9} {'select_ms':>10} {'reload_noop_us':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (int(value) for value in args.devices.split(",")):
+            stderr, sys.stderr = sys.stderr, devnull
+            try:
+                load_env = env_load(count)
+                env_ms = timed(load_env, args.repeat)
+                results = []
+                for source, write in (("csv", write_csv), ("yaml", write_yaml)):
+                    path = os.path.join(tmp, f"inventory_{count}.{source}")
+                    write(path, count)
+                    load_ms = timed(lambda: Inventory(path), args.repeat)
+                    inventory = Inventory(path)
+                    select_ms = timed(lambda: inventory.select(vendor="hillstone", site="site3", tag="core"), args.repeat)
+                    reload_us = timed(inventory.reload_if_changed, args.repeat) * 1000
+                    results.append((source, load_ms, select_ms, reload_us))
+            finally:
+                sys.stderr = stderr
+            print(f"{count:>8} {'env':>8} {env_ms:>9.1f} {'-':>10} {'-':>15}")
+            for source, load_ms, select_ms, reload_us in results:
+                print(f"{count:>8} {source:>8} {load_ms:>9.1f} {select_ms:>10.3f} {reload_us:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Benchmark và fuzz encoder line protocol (common/lineproto.py).
+
+Benchmark: render N point kiểu cisco_interface (2 tag, 3 field) bằng f-string như
+các hàm get_*_stats cũ, bằng encode(), bằng SeriesEncoder và bằng encode_batch()
+vào một buffer; mỗi cách lấy vòng nhanh nhất trong --repeat vòng.
+
+Fuzz: sinh ngẫu nhiên measurement/tag/field chứa dấu phẩy, dấu bằng, khoảng trắng,
+nháy kép, backslash, xuống dòng và ký tự nhiều byte; parse lại dòng đã encode bằng
+parser tham chiếu theo spec và so với giá trị gốc. F-string cũ được fuzz cùng dữ
+liệu để so sánh.
+
+    python3 benchmarks/bench_lineproto.py --points 100000 --fuzz 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.lineproto import SeriesEncoder, encode, encode_batch
+
+ALPHABET = "abcXYZ019_-./:" + ",= \"\\\n\t" + "éộ日"
+CONTROL_TEXT = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+def legacy_line(host, interface, status, protocol, vlan, timestamp):
+    return (
+        f"cisco_interface,host={host},interface={interface} "
+        f"status={status}i,protocol={protocol}i,vlan=\"{vlan}\" {timestamp}"
+    )
+
+
+def _read_until(line, position, stops):
+    """Đọc tới ký tự dừng chưa escape; '\\X' được hiểu là X."""
+    value = []
+    while position < len(line) and line[position] not in stops:
+        if line[position] == '\\' and position + 1 < len(line):
+            position += 1
+        value.append(line[position])
+        position += 1
+    return "".join(value), position
+
+
+def parse_line(line):
+    """
+    Parser tham chiếu: (measurement, tags, fields, timestamp). Field string trả về
+    dạng str, các kiểu khác trả về nguyên văn (ví dụ '12i').
+
+    Raises:
+        ValueError: Dòng không đúng cú pháp
+    """
+    if "\n" in line:
+        raise ValueError("raw newline")
+    measurement, position = _read_until(line, 0, ", ")
+    tags = {}
+    while position < len(line) and line[position] == ',':
+        key, position = _read_until(line, position + 1, "=, ")
+        if position >= len(line) or line[position] != '=':
+            raise ValueError("tag without '='")
+        value, position = _read_until(line, position + 1, ", =")
+        if not key or not value or (position < len(line) and line[position] == '='):
+            raise ValueError("empty or ambiguous tag")
+        tags[key] = value
+    if position >= len(line) or line[position] != ' ':
+        raise ValueError("missing field set")
+
+    fields = {}
+    separator = ','
+    while separator == ',':
+        key, position = _read_until(line, position + 1, "=, ")
+        if position >= len(line) or line[position] != '=' or not key:
+            raise ValueError("field without '='")
+        position += 1
+        if position < len(line) and line[position] == '"':
+            value, position = _read_until(line, position + 1, '"')
+            if position >= len(line):
+                raise ValueError("unterminated string")
+            position += 1
+        else:
+            value, position = _read_until(line, position, ", ")
+            if not value:
+                raise ValueError("empty field value")
+        fields[key] = value
+        separator = line[position] if position < len(line) else ''
+    if separator != ' ':
+        raise ValueError("missing timestamp")
+    timestamp = line[position + 1:]
+    if not timestamp.isdigit():
+        raise ValueError("bad timestamp")
+    return measurement, tags, fields, int(timestamp)
+
+
+def random_text(rng, max_length=12):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, max_length)))
+
+
+def as_text(value):
+    """Giá trị mà parser tham chiếu phải đọc lại (xuống dòng/tab thành backslash + chữ)."""
+    return "".join(CONTROL_TEXT.get(char, char) for char in value)
+
+
+def fuzz(iterations, seed):
+    rng = random.Random(seed)
+    encoder_failures = legacy_failures = 0
+    for _ in range(iterations):
+        measurement = random_text(rng)
+        tags = {random_text(rng, 6): random_text(rng) for _ in range(rng.randint(0, 3))}
+        fields = {random_text(rng, 6): rng.choice([random_text(rng, 40), rng.randint(-10 ** 12, 10 ** 12),
+                                                   rng.uniform(-1e6, 1e6), rng.random() < 0.5])
+                  for _ in range(rng.randint(1, 4))}
+        timestamp = rng.randint(0, 2 ** 62)
+
+        expected_fields = {}
+        for key, value in fields.items():
+            if isinstance(value, str):
+                expected_fields[as_text(key)] = as_text(value)
+            elif isinstance(value, bool):
+                expected_fields[as_text(key)] = "true" if value else "false"
+            elif isinstance(value, int):
+                expected_fields[as_text(key)] = f"{value}i"
+            else:
+                expected_fields[as_text(key)] = repr(value)
+        expected = (as_text(measurement), {as_text(key): as_text(value) for key, value in tags.items()},
+                    expected_fields, timestamp)
+
+        try:
+            parsed = parse_line(encode(measurement, tags, fields, timestamp))
+        except ValueError:
+            parsed = None
+        if parsed != expected:
+            encoder_failures += 1
+            if encoder_failures <= 3:
+                print(f"  MISMATCH {encode(measurement, tags, fields, timestamp)!r}")
+
+        legacy = measurement + "".join(f",{key}={value}" for key, value in tags.items()) + " " + ",".join(
+            f"{key}=\"{value}\"" if isinstance(value, str) else f"{key}={value}" for key, value in fields.items()
+        ) + f" {timestamp}"
+        try:
+            legacy_ok = parse_line(legacy)[:3] == (measurement, tags, {key: str(value) for key, value in fields.items()})
+        except ValueError:
+            legacy_ok = False
+        if not legacy_ok:
+            legacy_failures += 1
+    return encoder_failures, legacy_failures
+
+
+def bench(points, repeat=5):
+    rows = [(f"172.18.10.{index % 250}", f"gi1/0/{index % 48}", index % 2, index % 2, str(index % 4094))
+            for index in range(points)]
+    timestamp = time.time_ns()
+
+    def fstring():
+        return "\n".join(legacy_line(host, interface, status, protocol, vlan, timestamp)
+                         for host, interface, status, protocol, vlan in rows) + "\n"
+
+    def encoder():
+        return "\n".join(encode("cisco_interface", {'host': host, 'interface': interface},
+                                {'status': status, 'protocol': protocol, 'vlan': vlan}, timestamp)
+                         for host, interface, status, protocol, vlan in rows) + "\n"
+
+    def series_encoder():
+        series = {}
+        lines = []
+        for host, interface, status, protocol, vlan in rows:
+            encoder = series.get(host)
+            if encoder is None:
+                encoder = series[host] = SeriesEncoder("cisco_interface", host=host)
+            lines.append(encoder.encode({'status': status, 'protocol': protocol, 'vlan': vlan}, timestamp,
+                                        interface=interface))
+        return "\n".join(lines) + "\n"
+
+    def batch():
+        return encode_batch(("cisco_interface", {'host': host, 'interface': interface},
+                             {'status': status, 'protocol': protocol, 'vlan': vlan})
+                            for host, interface, status, protocol, vlan in rows)
+
+    results = []
+    for name, render in (("f-string (unescaped)", fstring), ("encode()", encoder),
+                         ("SeriesEncoder", series_encoder), ("encode_batch()", batch)):
+        # Vòng nhanh nhất trong `repeat` vòng, bớt nhiễu từ process khác
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            data = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append((name, best, len(data)))
+
+    baseline = results[0][1]
+    print(f"{points} points, best of {max(1, repeat)}")
+    for name, elapsed, size in results:
+        print(f"  {name:<22} {elapsed * 1000:8.1f} ms  {elapsed / points * 1e6:6.2f} us/point  "
+              f"x{elapsed / baseline:4.2f}  {size / 1e6:5.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per encoder, the best one is reported")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Fuzz iterations (0 to skip)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    bench(args.points, args.repeat)
+    if args.fuzz:
+        encoder_failures, legacy_failures = fuzz(args.fuzz, args.seed)
+        print(f"fuzz {args.fuzz} points: encoder {encoder_failures} mismatches, "
+              f"legacy f-string {legacy_failures} mismatches")
+        if encoder_failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark bộ đệm nhận: vòng đọc cũ (`output += chunk.decode()` rồi
+`output.strip().endswith('#')` sau mỗi chunk, O(n^2)) so với PromptReader
+(bytearray + dò prompt trên phần đuôi + decode một lần) trên output nhiều MB
+kiểu 'show tech-support'. Channel nằm trong bộ nhớ nên chỉ đo chi phí buffering.
+
+    python3 benchmarks/bench_read_buffer.py --sizes-mb 1,4,16 --segment 4096
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.channel import PromptReader
+
+PROMPT = "switch01#"
+# Dòng có ký tự tiếng Việt (UTF-8 nhiều byte) để kiểm tra ký tự bị cắt giữa hai chunk
+LINE = "Port gi1/0/{index:<4} Mô tả: uplink tầng {index:<6} rx_bytes=1234567890 tx_bytes=987654321\r\n"
+
+
+class MemoryChannel:
+    """Channel trả dữ liệu có sẵn, mỗi lần recv tối đa `segment` byte (một lượt dữ liệu mạng)."""
+
+    def __init__(self, payload, segment):
+        self.payload = payload
+        self.segment = segment
+        self.offset = 0
+
+    def send(self, data):
+        return len(data)
+
+    def recv(self, nbytes):
+        size = min(nbytes, self.segment)
+        chunk = self.payload[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+    def settimeout(self, timeout):
+        pass
+
+
+def build_output(size_mb):
+    lines = []
+    total = 0
+    index = 0
+    while total < size_mb * 1024 * 1024:
+        line = LINE.format(index=index)
+        lines.append(line)
+        total += len(line.encode('utf-8'))
+        index += 1
+    return "".join(lines)
+
+
+def legacy_read(channel):
+    """Vòng đọc cũ (trước PromptReader), bỏ phần sleep/poll để chỉ đo buffering."""
+    output = ""
+    while True:
+        chunk = channel.recv(4096)
+        if not chunk:
+            break
+        output += chunk.decode('utf-8', errors='ignore')
+        if output.strip().endswith('#'):
+            break
+    return output
+
+
+def prompt_reader_read(channel):
+    output, _ = PromptReader(channel).read_until_prompt(30)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes-mb", default="1,4,16")
+    parser.add_argument("--segment", type=int, default=4096,
+                        help="Số byte tối đa mỗi lần recv (kích thước một lượt dữ liệu mạng)")
+    args = parser.parse_args()
+
+    engines = {"legacy": legacy_read, "prompt_reader": prompt_reader_read}
+
+    print(f"{'size_mb':>8} {'engine':>14} {'wall_ms':>10} {'mb_per_s':>10} {'lost_chars':>11}")
+    for size_mb in (float(value) for value in args.sizes_mb.split(",")):
+        expected = build_output(size_mb) + PROMPT
+        payload = expected.encode('utf-8')
+        for name, read in engines.items():
+            channel = MemoryChannel(payload, args.segment)
+            start = time.perf_counter()
+            output = read(channel)
+            elapsed = time.perf_counter() - start
+            lost = len(expected) - len(output)
+            print(f"{size_mb:>8.1f} {name:>14} {elapsed * 1000:>10.1f} "
+                  f"{len(payload) / 1024 / 1024 / elapsed:>10.1f} {lost:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Phát lại corpus output đã capture (common/capture.py) qua client và parser của các driver, không SSH.
+
+Với mỗi thiết bị trong corpus và mỗi lần phát lại (output thứ i của mỗi lệnh),
+collect_metrics_from_session của driver chạy trên client do replay_session() của driver
+dựng trên ReplayChannel: mọi nhóm metrics (COLLECTOR_SCHEDULE=0) đi qua đúng đường đọc
+channel (phân trang, batch, streaming ngắt sớm), làm sạch output và các hàm
+get_*_stats / parse_* như khi thu thập thật.
+
+Báo cáo theo driver: số lần phát lại, output, KB đầu vào, metrics, nhóm parse lỗi,
+lệnh không có trong corpus, thời gian tốt nhất trong --repeat vòng, lần phát lại/s và MB/s.
+Đối chiếu: --update-baseline FILE ghi metrics (bỏ timestamp) của từng lần phát lại,
+--baseline FILE so sánh với lần ghi trước, để kiểm tra thay đổi parser trên output thật.
+Exit code khác 0 nếu có nhóm parse lỗi hoặc khác baseline.
+
+--simulate N dựng corpus từ fleet giả lập (benchmarks/sshsim.py) N thiết bị mỗi driver,
+--runs lần thu thập, khi chưa có corpus từ thiết bị thật; --page-lines bật phân trang
+không tắt được (corpus có prompt --More--), --output-kb thêm output vào mỗi lệnh.
+
+    COLLECTOR_CAPTURE_DIR=/var/lib/collector/corpus python3 cisco-sg/device_cisco.py
+    python3 benchmarks/bench_replay.py --corpus /var/lib/collector/corpus --update-baseline baseline.json
+    python3 benchmarks/bench_replay.py --corpus /var/lib/collector/corpus --baseline baseline.json
+    python3 benchmarks/bench_replay.py --simulate 20 --runs 3
+    python3 benchmarks/bench_replay.py --simulate 5 --page-lines 20 --output-kb 64
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Phải đặt trước khi import driver: Scheduler đọc COLLECTOR_SCHEDULE khi khởi tạo
+os.environ['COLLECTOR_SCHEDULE'] = "0"
+os.environ.setdefault('COLLECTOR_STATE_DIR', tempfile.mkdtemp(prefix="bench-replay-"))
+
+from common import stats
+from common.capture import Corpus, ReplayChannel
+from common.drivers import DRIVERS, load_driver
+
+TIMESTAMP = re.compile(r" \d+$")
+
+
+class _NullWriter:
+    def write_lines(self, lines):
+        pass
+
+    def close(self):
+        pass
+
+
+def simulate(directory, drivers, count, runs, page_lines=0, output_kb=0.0):
+    """Capture output của fleet giả lập vào `directory` (mỗi driver `runs` lần thu thập)."""
+    from benchmarks.sshsim import DeviceBehaviour, SimulatedFleet
+    from common.engine import run_collection
+    from common.inventory import Inventory
+
+    os.environ.update(COLLECTOR_CAPTURE_DIR=directory, COLLECTOR_BREAKER="0", COLLECTOR_SSH_CONTROL_PERSIST="0")
+    try:
+        for name in drivers:
+            driver = load_driver(name)
+            behaviour = DeviceBehaviour(latency=0.0, output_kb=output_kb, page_lines=page_lines,
+                                        paging_locked=bool(page_lines))
+            fleet = SimulatedFleet(name, count, behaviour).start()
+            try:
+                inventory_path = os.path.join(os.environ['COLLECTOR_STATE_DIR'], f"inventory-{name}.csv")
+                fleet.write_inventory(inventory_path)
+                devices = Inventory(inventory_path).select(vendor=name)
+                for _ in range(runs):
+                    with open(os.devnull, 'w') as devnull, redirect_stderr(devnull):
+                        run_collection(devices, driver.collect_metrics_from_device, _NullWriter())
+            finally:
+                fleet.close()
+    finally:
+        os.environ.pop('COLLECTOR_CAPTURE_DIR', None)
+
+
+def load_samples(corpus, name):
+    """
+    Đọc và giải nén output của một driver trước khi đo.
+
+    Returns:
+        tuple: ([(host, outputs, lần phát lại)], số output, tổng số ký tự)
+    """
+    samples, count, size = [], 0, 0
+    for host in corpus.hosts(name):
+        outputs = corpus.load(name, host)
+        runs = max((len(texts) for texts in outputs.values()), default=0)
+        samples.extend((host, outputs, run) for run in range(runs))
+        for texts in outputs.values():
+            count += len(texts)
+            size += sum(len(text) for text in texts)
+    return samples, count, size
+
+
+def replay(driver, name, samples):
+    """Chạy một vòng phát lại; trả về (giây, {khoá: metrics}, nhóm parse lỗi, lệnh thiếu)."""
+    results, failed, missing = {}, 0, 0
+    start = time.perf_counter()
+    for host, outputs, run in samples:
+        channel = ReplayChannel(outputs, run)
+        device = stats.DeviceStats(host, name)
+        stats.bind(device)
+        try:
+            metrics = driver.collect_metrics_from_session(driver.replay_session(channel), host)
+        finally:
+            stats.bind(None)
+        results[f"{name}/{host}/{run}"] = metrics
+        failed += device.parse_failed
+        missing += len(channel.missing)
+    return time.perf_counter() - start, results, failed, missing
+
+
+def without_timestamps(results):
+    return {key: [TIMESTAMP.sub("", line) for line in lines] for key, lines in results.items()}
+
+
+def compare(baseline, results, drivers):
+    """
+    Số lần phát lại khác baseline (in chi tiết). Lần phát lại chưa có trong baseline, hoặc
+    có trong baseline nhưng output đã bị xoay vòng khỏi corpus, chỉ được báo, không tính.
+    """
+    baseline = {key: lines for key, lines in baseline.items() if key.split("/", 1)[0] in drivers}
+    differences = 0
+    for key, lines in sorted(results.items()):
+        if key not in baseline:
+            continue
+        if baseline[key] != lines:
+            differences += 1
+            removed = [line for line in baseline[key] if line not in lines]
+            added = [line for line in lines if line not in baseline[key]]
+            print(f"CHANGED  {key}:")
+            for line in removed[:5]:
+                print(f"  - {line}")
+            for line in added[:5]:
+                print(f"  + {line}")
+    for key in sorted(set(baseline) - set(results)):
+        print(f"MISSING  {key}: in baseline, not in corpus")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Corpus directory (COLLECTOR_CAPTURE_DIR of the capture)")
+    parser.add_argument("--drivers", default=",".join(DRIVERS))
+    parser.add_argument("--repeat", type=int, default=5, help="Replay rounds, the best one is reported")
+    parser.add_argument("--baseline", help="Compare metrics with this baseline file")
+    parser.add_argument("--update-baseline", help="Write the replayed metrics to this baseline file")
+    parser.add_argument("--simulate", type=int, default=0, help="Capture a corpus from N simulated devices per driver first")
+    parser.add_argument("--runs", type=int, default=3, help="Collection runs captured with --simulate")
+    parser.add_argument("--page-lines", type=int, default=0,
+                        help="Simulated devices page their output every N lines and ignore paging off")
+    parser.add_argument("--output-kb", type=float, default=0.0, help="Extra KB of output per simulated command")
+    parser.add_argument("--verbose", action="store_true", help="Show collector stderr during replay")
+    args = parser.parse_args()
+
+    drivers = [name for name in args.drivers.split(",") if name]
+    corpus_dir = args.corpus
+    temporary = None
+    if args.simulate:
+        if corpus_dir is None:
+            corpus_dir = temporary = tempfile.mkdtemp(prefix="bench-replay-corpus-")
+        simulate(corpus_dir, drivers, args.simulate, args.runs, args.page_lines, args.output_kb)
+    if corpus_dir is None:
+        parser.error("--corpus or --simulate is required")
+
+    corpus = Corpus(corpus_dir)
+    ok = True
+    all_results = {}
+    print(f"{'driver':<13} {'replays':>7} {'outputs':>7} {'input_kb':>9} {'metrics':>8} {'failed':>6} "
+          f"{'missing':>7} {'best_s':>8} {'replays/s':>10} {'MB/s':>7}")
+    try:
+        for name in drivers:
+            if name not in corpus.drivers():
+                continue
+            try:
+                driver = load_driver(name)
+            except ImportError as e:
+                print(f"{name:<13} driver not loaded ({e}), skipped")
+                continue
+            if not hasattr(driver, "replay_session"):
+                print(f"{name:<13} driver has no replay_session(), skipped")
+                continue
+            samples, outputs, size = load_samples(corpus, name)
+            best = None
+            for _ in range(max(1, args.repeat)):
+                if args.verbose:
+                    seconds, results, failed, missing = replay(driver, name, samples)
+                else:
+                    with open(os.devnull, 'w') as devnull, redirect_stderr(devnull):
+                        seconds, results, failed, missing = replay(driver, name, samples)
+                best = seconds if best is None else min(best, seconds)
+            all_results.update(results)
+            metrics = sum(len(lines) for lines in results.values())
+            # Ký tự đưa vào parser trong một vòng (lệnh có ít output hơn được phát lại quay vòng)
+            replayed = sum(len(texts[run % len(texts)]) for _, texts_by_command, run in samples
+                           for texts in texts_by_command.values())
+            ok = ok and not failed
+            print(f"{name:<13} {len(samples):>7} {outputs:>7} {size / 1024:>9.1f} {metrics:>8} {failed:>6} "
+                  f"{missing:>7} {best:>8.4f} {len(samples) / best if best else 0:>10,.0f} "
+                  f"{replayed / 1048576 / best if best else 0:>7.1f}", flush=True)
+    finally:
+        if temporary:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    if not all_results:
+        print(f"No captured outputs for {', '.join(drivers)} in {corpus_dir}")
+        sys.exit(1)
+    results = without_timestamps(all_results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            differences = compare(json.load(f), results, drivers)
+        print(f"baseline {args.baseline}: {differences} of {len(results)} replays changed")
+        ok = ok and not differences
+    if args.update_baseline:
+        with open(args.update_baseline, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print(f"baseline written to {args.update_baseline} ({len(results)} replays)")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark chia fleet của common/shard.py: độ lệch tải giữa các instance và số thiết
+bị phải đổi instance khi thêm một instance (N -> N+1), so sánh index/count (modulo)
+với consistent-hash ring.
+
+    python3 benchmarks/bench_shard_balance.py --devices 5000 --instances 2,4,8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.shard import HashRing, ModuloShard
+
+
+def hosts(count):
+    return [f"10.{index // 65536}.{index // 256 % 256}.{index % 256}" for index in range(count)]
+
+
+def modulo_assignment(devices, count):
+    shards = [ModuloShard(index, count) for index in range(count)]
+    return {host: next(shard.index for shard in shards if shard.owns(host)) for host in devices}
+
+
+def ring_assignment(devices, count):
+    ring = HashRing([f"collector-{index}" for index in range(count)])
+    return {host: ring.owner(host) for host in devices}
+
+
+def report(name, devices, count, assign):
+    start = time.perf_counter()
+    before = assign(devices, count)
+    elapsed = time.perf_counter() - start
+    after = assign(devices, count + 1)
+
+    sizes = {}
+    for owner in before.values():
+        sizes[owner] = sizes.get(owner, 0) + 1
+    ideal = len(devices) / count
+    skew = max(sizes.values()) / ideal - 1
+    moved = sum(1 for host in devices if before[host] != after[host])
+    print(f"  {name:<8} max load +{skew * 100:5.1f}% over ideal, "
+          f"{count}->{count + 1} moves {moved / len(devices) * 100:5.1f}% "
+          f"(ideal {100 / (count + 1):4.1f}%), assign {elapsed * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--instances", default="2,4,8")
+    args = parser.parse_args()
+
+    devices = hosts(args.devices)
+    for count in (int(value) for value in args.instances.split(",")):
+        print(f"{args.devices} devices, {count} instances")
+        report("modulo", devices, count, modulo_assignment)
+        report("ring", devices, count, ring_assignment)
+
+
+if __name__ == "__main__":
+    main()
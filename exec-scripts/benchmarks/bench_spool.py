@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark spool trên đĩa (common/spool.py) và kịch bản sink gián đoạn.
+
+1. Tốc độ append vào spool và tốc độ đọc lại theo batch.
+2. Outage: InfluxWriter ghi trong khi sink không truy cập được (mọi dòng vào spool),
+   rồi một writer mới (lần chạy sau) gửi tiếp khi stub server hoạt động lại; kiểm tra
+   mọi dòng tới nơi đúng một lần.
+3. Giới hạn dung lượng: ghi vượt --max-mb, segment cũ nhất bị xoá.
+
+    python3 benchmarks/bench_spool.py --lines 200000
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.influx import InfluxWriter
+from common.spool import Spool
+from benchmarks.bench_influx_writer import StubInflux, make_devices
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_throughput(devices, directory, batch_size):
+    lines = sum(len(device) for device in devices)
+    spool = Spool(directory)
+    start = time.perf_counter()
+    for device in devices:
+        spool.append(device)
+    append_elapsed = time.perf_counter() - start
+    size = spool.size
+
+    start = time.perf_counter()
+    replayed = 0
+    while spool.pending():
+        batch, token = spool.read_batch(batch_size)
+        replayed += len(batch)
+        spool.commit(token)
+    read_elapsed = time.perf_counter() - start
+    spool.close()
+    print(f"append: {lines} lines ({size / 1e6:.1f} MB) in {append_elapsed * 1000:.0f} ms "
+          f"({lines / append_elapsed / 1e3:.0f}k lines/s); read back {replayed} in {read_elapsed * 1000:.0f} ms")
+
+
+def bench_outage(devices, directory, batch_size):
+    expected = [line for device in devices for line in device]
+    half = len(devices) // 2
+
+    # Lần chạy 1: sink không truy cập được, mọi dòng phải vào spool
+    writer = InfluxWriter(f"http://127.0.0.1:{unused_port()}", "org", "bucket", batch_size=batch_size,
+                          flush_interval=0.2, spool=Spool(directory))
+    for device in devices[:half]:
+        writer.write_lines(device)
+    writer.close(timeout=2)
+    print(f"outage run: {writer.count} lines, {writer.spooled} spooled, {writer.dropped} dropped")
+
+    # Lần chạy 2: sink hoạt động lại, gửi dữ liệu mới rồi gửi lại spool
+    stub = StubInflux()
+    writer = InfluxWriter(stub.url, "org", "bucket", batch_size=batch_size, flush_interval=0.2,
+                          spool=Spool(directory))
+    start = time.perf_counter()
+    for device in devices[half:]:
+        writer.write_lines(device)
+    writer.close(timeout=60)
+    elapsed = time.perf_counter() - start
+    stub.close()
+
+    ok = sorted(stub.lines) == sorted(expected) and len(stub.lines) == len(expected)
+    print(f"recovery run: {writer.count} new + {writer.replayed} replayed lines in {stub.requests} request(s), "
+          f"{elapsed * 1000:.0f} ms; {'every line delivered once' if ok else 'MISMATCH'}")
+    return ok
+
+
+def bench_eviction(devices, directory, max_mb):
+    spool = Spool(directory, segment_bytes=int(max_mb * 1048576 / 4), max_bytes=int(max_mb * 1048576))
+    written = 0
+    for _ in range(3):
+        for device in devices:
+            spool.append(device)
+            written += sum(len(line) + 1 for line in device)
+    print(f"eviction: wrote {written / 1e6:.1f} MB with a {max_mb} MB cap -> {spool.size / 1e6:.1f} MB kept, "
+          f"{spool.evicted_bytes / 1e6:.1f} MB evicted oldest-first")
+    spool.close()
+    return spool.size <= max_mb * 1048576
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--max-mb", type=float, default=8)
+    args = parser.parse_args()
+
+    devices = make_devices(args.lines, 52)
+    root = tempfile.mkdtemp(prefix="bench-spool-")
+    try:
+        bench_throughput(devices, os.path.join(root, "throughput"), args.batch_size)
+        ok = bench_outage(devices, os.path.join(root, "outage"), args.batch_size)
+        ok = bench_eviction(devices, os.path.join(root, "eviction"), args.max_mb) and ok
+    finally:
+        shutil.rmtree(root)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark 'show tech-support memory': đọc toàn bộ output rồi chạy regex cũ
+so với streaming extractor dừng sớm (PromptReader.stream_command + Ctrl-C).
+
+    python3 benchmarks/bench_streaming_parser.py --size-mb 4
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.channel import PromptReader
+from common.stream import RegexStreamExtractor
+from benchmarks.fakedevice import SimulatedDevice
+
+COMMAND = "show tech-support memory"
+ANCHOR = "Dynamic (OS managed) RAM usage:"
+PATTERN = re.compile(re.escape(ANCHOR) + r".*?Total = (\d+), Free = (\d+), Used = (\d+), Usage = (\d+)%", re.DOTALL)
+LEGACY_PATTERN = r"Dynamic \(OS managed\) RAM usage:(?:.|\n)*?Total = (\d+), Free = (\d+), Used = (\d+), Usage = (\d+)%"
+
+
+def make_dump(size_mb):
+    """Bản dump giả: vài dòng đầu chứa field cần lấy, phần còn lại là bảng pool rất dài."""
+    head = (
+        "------------------ show memory ------------------\r\n"
+        f"{ANCHOR}\r\n"
+        "  Total = 262144, Free = 98304, Used = 163840, Usage = 62%\r\n"
+    )
+    line = "pool 0x0000abcd  size    4096  used    2048  free    2048  blocks  12\r\n"
+    return head + line * (size_mb * 1024 * 1024 // len(line))
+
+
+def run_full_read(reader):
+    output, _ = reader.send_command(COMMAND, 60)
+    match = re.search(LEGACY_PATTERN, output)
+    return match is not None, len(output)
+
+
+def run_streaming(reader):
+    extractor = RegexStreamExtractor(PATTERN, anchor=ANCHOR)
+    found = reader.stream_command(COMMAND, extractor, 60)
+    return found, extractor.chars_seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=4)
+    args = parser.parse_args()
+
+    dump = make_dump(args.size_mb)
+    print(f"{'mode':>10} {'found':>6} {'chars_read':>12} {'wall_ms':>10}")
+    for name, run in (("full_read", run_full_read), ("streaming", run_streaming)):
+        device = SimulatedDevice({COMMAND: dump}, latency=0)
+        reader = PromptReader(device.channel)
+        banner, _ = reader.read_until_prompt(5)
+        reader.learn_prompt(banner)
+        start = time.perf_counter()
+        found, chars = run(reader)
+        elapsed = time.perf_counter() - start
+        # Session phải còn dùng được sau khi ngắt
+        _, in_sync = reader.send_command("", 5)
+        print(f"{name:>10} {str(found):>6} {chars:>12} {elapsed * 1000:>10.1f}   in_sync={in_sync}")
+        device.close()
+
+
+if __name__ == "__main__":
+    main()
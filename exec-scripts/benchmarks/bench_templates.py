@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra và benchmark template parser (common/templates.py).
+
+1. Đối chiếu: mọi template đã đăng ký của các driver được chạy trên output đã ghi lại
+   (benchmarks/recorded/<driver>/<lệnh>.txt, lệnh với dấu cách thay bằng "_"), cả với
+   xuống dòng \\n và \\r\\n, so với record mong đợi trong recorded/expected.json.
+   Template không có output ghi lại cũng bị báo lỗi.
+2. Throughput (records/s): template so với cách parse cũ (re.search với pattern dạng
+   chuỗi trên từng dòng, hoặc nhiều lần search trên cùng một output) trên output lớn,
+   ví dụ 'show interface status' 500 cổng; kết quả hai cách phải giống nhau.
+
+    python3 benchmarks/bench_templates.py --ports 500
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import templates
+from common.drivers import DRIVERS, load_driver
+
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded")
+
+
+def recorded_path(directory, template):
+    return os.path.join(directory, template.driver, template.command.replace(" ", "_") + ".txt")
+
+
+def verify(directory):
+    """Chạy mọi template trên output đã ghi lại; trả về True nếu tất cả khớp."""
+    with open(os.path.join(directory, "expected.json")) as f:
+        expected = json.load(f)
+    for name in DRIVERS:
+        try:
+            load_driver(name)
+        except ImportError as e:
+            print(f"{name}: driver not loaded ({e}), its templates are not checked")
+
+    ok = True
+    for template in templates.registered():
+        path = recorded_path(directory, template)
+        if not os.path.exists(path):
+            print(f"MISSING  {template.driver:<13} {template.command!r}: no recorded output at {path}")
+            ok = False
+            continue
+        with open(path, newline="") as f:
+            output = f.read()
+        wanted = expected.get(template.driver, {}).get(template.command)
+        unix = output.replace("\r\n", "\n")
+        for variant, text in (("\\n", unix), ("\\r\\n", unix.replace("\n", "\r\n"))):
+            records = template.parse(text)
+            if records != wanted:
+                print(f"MISMATCH {template.driver:<13} {template.command!r} ({variant}):\n"
+                      f"  got      {records}\n  expected {wanted}")
+                ok = False
+                break
+        else:
+            print(f"ok       {template.driver:<13} {template.command!r}: {len(records)} record(s)")
+    return ok
+
+
+# --- Output lớn và parser kiểu cũ để so sánh ---
+
+def make_interface_status(ports, rng):
+    lines = ["Port     Type         Duplex  Speed Neg      ctrl State       Pressure Mode",
+             "-------- ------------ ------  ----- -------- ---- ----------- -------- -------"]
+    for port in range(1, ports + 1):
+        status = rng.choice(("connected", "connected", "notconnect", "disabled"))
+        lines.append(f"gi{port // 48 + 1}/0/{port % 48 + 1:<4} {status:<11} {'Up' if status == 'connected' else 'Down':<5} "
+                     f"Full  1000  {rng.choice((1, 10, 20, 100))}")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def make_inventory(components, rng):
+    return "".join(
+        f'NAME: "GigabitEthernet1/0/{index}"  DESCR: "1000BASE-LX SFP"\r\n'
+        f"PID: GLC-LH-SMD        VID: V0{rng.randint(1, 9)}  SN: FNS{rng.randint(10000000, 99999999)}\r\n\r\n"
+        for index in range(1, components + 1)
+    )
+
+
+def make_hillstone_cpu(_ports, rng):
+    names = ("Average cpu utilization", "Current cpu utilization", "Last 1 minute", "Last 5 minutes", "Last 15 minutes")
+    return "\r\n" + "".join(f"{name} : {rng.uniform(0.1, 60):.1f}%\r\n" for name in names)
+
+
+def legacy_interface_status(output):
+    records = []
+    interface_pattern = r"(\S+)\s+(connected|notconnect|disabled)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)"
+    for line in output.splitlines():
+        match = re.search(interface_pattern, line.strip())
+        if match:
+            records.append({'interface': match.group(1), 'status': match.group(2),
+                            'protocol': match.group(3), 'vlan': match.group(6)})
+    return records
+
+
+def legacy_inventory(output):
+    pattern = (r'NAME:\s*"([^"]*)"\s*,?\s*DESCR:\s*"([^"]*)"\s*'
+               r'PID:\s*(\S*)\s*,?\s*VID:\s*(\S*)\s*,?\s*SN:\s*(\S*)')
+    return [dict(zip(('name', 'descr', 'pid', 'vid', 'serial'), match.groups()))
+            for match in re.finditer(pattern, output)]
+
+
+def legacy_hillstone_cpu(output):
+    avg = re.search(r"Average cpu utilization\s*:\s*([\d.]+)%", output)
+    cur = re.search(r"Current cpu utilization\s*:\s*([\d.]+)%", output)
+    min1 = re.search(r"Last 1 minute\s*:\s*([\d.]+)%", output)
+    min5 = re.search(r"Last 5 minutes\s*:\s*([\d.]+)%", output)
+    min15 = re.search(r"Last 15 minutes\s*:\s*([\d.]+)%", output)
+    if avg and cur and min1 and min5 and min15:
+        return [{'avg': float(avg.group(1)), 'cur': float(cur.group(1)), 'min1': float(min1.group(1)),
+                 'min5': float(min5.group(1)), 'min15': float(min15.group(1))}]
+    return []
+
+
+# (driver, lệnh, hàm sinh output (kích thước, rng), parser cũ, kích thước)
+CASES = (
+    ("cisco_sg", "show interface status", make_interface_status, legacy_interface_status, 'ports'),
+    ("cisco_sg", "show inventory", make_inventory, legacy_inventory, 'components'),
+    ("hillstone", "show cpu", make_hillstone_cpu, legacy_hillstone_cpu, None),
+)
+
+
+def timed(parse, output, min_time, rounds=5):
+    """
+    Số lần chạy/giây của parse(output): tốt nhất trong `rounds` vòng, tổng cộng ít nhất
+    `min_time` giây (lấy vòng tốt nhất để bớt nhiễu từ process khác). Trả về (records, lần/giây).
+    """
+    best = 0.0
+    for _ in range(rounds):
+        runs, start = 0, time.perf_counter()
+        while True:
+            records = parse(output)
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / rounds:
+                break
+        best = max(best, runs / elapsed)
+    return records, best
+
+
+def bench_throughput(args):
+    rng = random.Random(args.seed)
+    ok = True
+    print(f"\n{'command':<32} {'records':>7} {'template rec/s':>15} {'legacy rec/s':>13} {'speedup':>8}")
+    for driver, command, make_output, legacy, size in CASES:
+        template = templates.get(driver, command)
+        if template is None:
+            continue
+        output = make_output(getattr(args, size) if size else 1, rng)
+        records, template_rate = timed(template.parse, output, args.min_time)
+        legacy_records, legacy_rate = timed(legacy, output, args.min_time)
+        # Parser cũ trả về chuỗi; so sánh sau khi ép kiểu giống template
+        same = len(records) == len(legacy_records) and all(
+            {key: str(value) for key, value in record.items()} == {key: str(value) for key, value in old.items()}
+            for record, old in zip(records, legacy_records))
+        ok = ok and same
+        count = max(1, len(records))
+        print(f"{driver + ' ' + command:<32} {len(records):>7} {template_rate * count:>15,.0f} "
+              f"{legacy_rate * count:>13,.0f} {template_rate / legacy_rate:>7.1f}x"
+              + ("" if same else "  RESULTS DIFFER"))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recorded", default=RECORDED_DIR, help="Directory of recorded outputs and expected.json")
+    parser.add_argument("--ports", type=int, default=500, help="Ports in the large 'show interface status'")
+    parser.add_argument("--components", type=int, default=200, help="Components in the large 'show inventory'")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ok = verify(args.recorded)
+    ok = bench_throughput(args) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
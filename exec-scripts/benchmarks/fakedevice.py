@@ -0,0 +1,108 @@
+"""
+Thiết bị giả lập cho benchmark: một thread trả lời lệnh qua socketpair,
+được bọc bởi FakeChannel có cùng giao diện với paramiko.Channel
+(send / recv / recv_ready / settimeout / close).
+"""
+import select
+import socket
+import threading
+import time
+
+
+class FakeChannel:
+    """Giả lập paramiko.Channel trên một đầu của socketpair."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.sock.sendall(data)
+        return len(data)
+
+    def recv(self, nbytes):
+        return self.sock.recv(nbytes)
+
+    def recv_ready(self):
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        return bool(readable)
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+
+class SimulatedDevice:
+    """
+    Thiết bị trả lời mỗi lệnh sau `latency` giây, kèm echo lệnh và prompt.
+    Args:
+        responses (dict): Lệnh -> output (str)
+        prompt (str): Prompt của thiết bị
+        latency (float): Độ trễ xử lý trước khi trả lời mỗi lệnh
+        banner (str): Nội dung gửi ngay khi mở kênh
+        rtt (float): Round-trip mạng, tính một lần cho mỗi lượt dữ liệu gửi tới thiết bị
+    """
+
+    def __init__(self, responses, prompt="switch01#", latency=0.05, banner="", rtt=0.0):
+        self.responses = responses
+        self.prompt = prompt
+        self.latency = latency
+        self.banner = banner
+        self.rtt = rtt
+        # Vị trí (byte) trong output lớn nhất tại đó client đã ngắt bằng Ctrl-C
+        self.aborted_at = None
+        self._device_sock, client_sock = socket.socketpair()
+        self.channel = FakeChannel(client_sock)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        sock = self._device_sock
+        buffer = b""
+        try:
+            sock.sendall((self.banner + self.prompt).encode('utf-8'))
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                time.sleep(self.rtt)
+                buffer += data
+                buffer = buffer.replace(b"\x03", b"")
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    command = line.decode('utf-8').strip()
+                    time.sleep(self.latency)
+                    reply = self.responses.get(command, "")
+                    if not command:
+                        sock.sendall(f"\r\n{self.prompt}".encode('utf-8'))
+                        continue
+                    sock.sendall(f"{command}\r\n".encode('utf-8'))
+                    if self._send_reply(sock, f"{reply}\r\n".encode('utf-8')):
+                        sock.sendall(f"^C\r\n{self.prompt}".encode('utf-8'))
+                        buffer = b""
+                    else:
+                        sock.sendall(self.prompt.encode('utf-8'))
+        except OSError:
+            pass
+
+    def _send_reply(self, sock, payload, chunk_size=16384):
+        """Gửi output theo từng đoạn; dừng lại nếu phía client gửi Ctrl-C. Returns True nếu bị ngắt."""
+        for offset in range(0, len(payload), chunk_size):
+            readable, _, _ = select.select([sock], [], [], 0)
+            if readable:
+                data = sock.recv(4096)
+                if b"\x03" in data:
+                    self.aborted_at = offset
+                    return True
+            sock.sendall(payload[offset:offset + chunk_size])
+        return False
+
+    def close(self):
+        self.channel.close()
+        self._device_sock.close()
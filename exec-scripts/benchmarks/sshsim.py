@@ -0,0 +1,685 @@
+#!/usr/bin/env python3
+"""
+Simulator SSH cho benchmark end-to-end: mỗi thiết bị giả lập là một server SSH thật
+(paramiko ServerInterface) trên một địa chỉ loopback riêng, nên collector chạy đúng
+code path như với switch thật (TCP, key exchange, xác thực, PTY, pexpect + ssh).
+
+Profile theo vendor tái hiện banner, prompt login/enable và output `show` mà parser
+của từng script đang đọc:
+
+    cisco_sg       xác thực SSH password/keyboard-interactive, CLI hỏi lại "User Name:"
+    cisco_cbs220   xác thực SSH "none", banner "Welcome to Layer 2 Managed Switch",
+                   "Username:", prompt '>' rồi enable
+    hillstone      xác thực SSH password, vào thẳng prompt "<tên># "
+
+Hành vi cấu hình được (DeviceBehaviour): độ trễ mỗi lệnh (+ jitter), độ trễ kiểm tra
+mật khẩu, kích thước output thêm, phân trang "More" (và firmware bỏ qua lệnh tắt
+paging), cùng lỗi giả lập theo tỉ lệ thiết bị: auth_fail (sai mật khẩu), hang
+(nhận lệnh show nhưng không trả lời) và disconnect (đóng kết nối khi nhận lệnh show).
+
+Chạy độc lập, rồi trỏ collector vào inventory được sinh ra:
+
+    python3 benchmarks/sshsim.py --vendor cisco_sg --devices 50 --inventory /tmp/sim.csv
+    COLLECTOR_INVENTORY=/tmp/sim.csv python3 cisco-sg/device_cisco.py
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import selectors
+import signal
+import socket
+import threading
+import time
+
+import paramiko
+
+DEFAULT_USERNAME = "admin"
+DEFAULT_PASSWORD = "admin"
+FAILURE_MODES = ("auth_fail", "hang", "disconnect")
+
+# Đoạn output gửi mỗi lần; giữa hai đoạn thiết bị kiểm tra Ctrl-C từ client
+CHUNK_SIZE = 16384
+CISCO_MORE = "More: <space>,  Quit: q or CTRL+Z, One line: <return> "
+HILLSTONE_MORE = " --More-- "
+
+
+# --- Output lệnh theo vendor (định dạng khớp regex của parser trong script) ---
+
+def _sg_cpu(rng):
+    return (
+        "\r\nCPU utilization service is on.\r\n\r\n"
+        f"CPU utilization for five seconds: {rng.randint(1, 40)}%; "
+        f"one minute: {rng.randint(1, 30)}%; five minutes: {rng.randint(1, 30)}%;\r\n"
+    )
+
+
+def _sg_memory(rng):
+    pools = "".join(
+        f"  pool {index:2d}   size {rng.randint(64, 4096):6d}   blocks {rng.randint(10, 900):5d}   "
+        f"in use {rng.randint(0, 800):5d}\r\n"
+        for index in range(48)
+    )
+    total = 524288
+    used = rng.randint(total // 4, total * 3 // 4)
+    return (
+        "\r\n--------------------------- show memory statistics ---------------------------\r\n"
+        f"{pools}\r\n"
+        "Dynamic (OS managed) RAM usage:\r\n"
+        f"  Total = {total}, Free = {total - used}, Used = {used}, Usage = {used * 100 // total}%\r\n"
+        "\r\n--------------------------- show memory allocations --------------------------\r\n"
+    )
+
+
+def _sg_interfaces(rng):
+    rows = []
+    for port in range(1, 29):
+        connected = rng.random() < 0.7
+        rows.append(f"gi1/0/{port:<4} {'connected' if connected else 'notconnect':<11} "
+                    f"{'Up' if connected else 'Down':<5} Full  1000  {rng.choice((1, 10, 20, 100))}")
+    return "\r\n" + "\r\n".join(rows) + "\r\n"
+
+
+def _sg_inventory(rng):
+    return (
+        '\r\nNAME: "1"  DESCR: "SG350-28P 28-Port Gigabit PoE Managed Switch"\r\n'
+        f"PID: SG350-28P-K9      VID: V02  SN: DNI{rng.randint(1000000, 9999999)}\r\n"
+    )
+
+
+def _cbs_cpu(rng):
+    return (
+        "\r\nCPU utilization service is on.\r\n\r\nCPU utilization\r\n--------------------------\r\n"
+        f"five seconds: {rng.randint(1, 100)}%; one minute: {rng.randint(1, 60)}%; "
+        f"five minutes: {rng.randint(1, 60)}%\r\n"
+    )
+
+
+def _cbs_memory(rng):
+    total = 255780
+    used = rng.randint(150000, 230000)
+    buffers, cached = rng.randint(4000, 8000), rng.randint(80000, 120000)
+    applications = max(0, used - buffers - cached)
+    return (
+        "\r\n             total       used       free     shared    buffers     cached\r\n"
+        f"Mem:    {total:10d} {used:10d} {total - used:10d} {67512:10d} {buffers:10d} {cached:10d}\r\n"
+        f"-/+ buffers/cache: {applications:10d} {total - applications:10d}\r\n"
+        "Swap:            0          0          0\r\n"
+    )
+
+
+def _hillstone_cpu(rng):
+    values = [rng.uniform(0.1, 60) for _ in range(5)]
+    return (
+        f"\r\nAverage cpu utilization : {values[0]:.1f}%\r\n"
+        f"Current cpu utilization : {values[1]:.1f}%\r\n"
+        f"Last 1 minute : {values[2]:.1f}%\r\n"
+        f"Last 5 minutes : {values[3]:.1f}%\r\n"
+        f"Last 15 minutes : {values[4]:.1f}%\r\n"
+    )
+
+
+def _hillstone_memory(rng):
+    total = 2097152
+    used = rng.randint(total // 5, total * 4 // 5)
+    return (
+        f"\r\nThe percentage of memory utilization: {used * 100 // total}%\r\n"
+        "   total(KB)    used(KB)   free(KB)\r\n"
+        f"   {total:<12d} {used:<10d} {total - used:<10d}\r\n"
+    )
+
+
+class VendorProfile:
+    """
+    Hành vi CLI của một dòng thiết bị.
+    Args:
+        ssh_auths (str): Phương thức SSH server chấp nhận ("none", "password,keyboard-interactive"...)
+        banner (str): Gửi ngay khi mở shell
+        username_prompt (str): Prompt login trong CLI, None nếu CLI không hỏi lại tài khoản
+        user_mode (bool): Sau login vào prompt '>' và cần 'enable'
+        hostname (str): Mẫu tên thiết bị, nhận {index}
+        prompt (str): Mẫu prompt, nhận {hostname} và {mode} ('#' hoặc '>')
+        paging_off (tuple): Lệnh tắt phân trang
+        more_prompt (str): Prompt phân trang
+        commands (dict): Lệnh -> hàm sinh output (rng) -> str
+        unknown (str): Thông báo lệnh không hỗ trợ
+    """
+
+    def __init__(self, ssh_auths, banner, username_prompt, user_mode, hostname, prompt, paging_off,
+                 more_prompt, commands, unknown):
+        self.ssh_auths = ssh_auths
+        self.banner = banner
+        self.username_prompt = username_prompt
+        self.user_mode = user_mode
+        self.hostname = hostname
+        self.prompt = prompt
+        self.paging_off = paging_off
+        self.more_prompt = more_prompt
+        self.commands = commands
+        self.unknown = unknown
+
+
+PROFILES = {
+    "cisco_sg": VendorProfile(
+        ssh_auths="password,keyboard-interactive",
+        banner="\r\n\r\n",
+        username_prompt="User Name:",
+        user_mode=False,
+        hostname="sg350-{index:04d}",
+        prompt="{hostname}{mode}",
+        paging_off=("terminal datadump",),
+        more_prompt=CISCO_MORE,
+        commands={
+            "show cpu": _sg_cpu,
+            "show tech-support memory": _sg_memory,
+            "show interface status": _sg_interfaces,
+            "show inventory": _sg_inventory,
+        },
+        unknown="% Unrecognized command",
+    ),
+    "cisco_cbs220": VendorProfile(
+        ssh_auths="none",
+        banner="\r\n\r\nWelcome to Layer 2 Managed Switch\r\n\r\n",
+        username_prompt="Username:",
+        user_mode=True,
+        hostname="cbs220-{index:04d}",
+        prompt="{hostname}{mode}",
+        paging_off=("terminal datadump",),
+        more_prompt=CISCO_MORE,
+        commands={
+            "show cpu utilization": _cbs_cpu,
+            "show memory statistics": _cbs_memory,
+        },
+        unknown="% Unrecognized command",
+    ),
+    "hillstone": VendorProfile(
+        ssh_auths="password",
+        banner="\r\nHillstone Networks StoneOS\r\nCopyright (c) Hillstone Networks. All rights reserved.\r\n\r\n",
+        username_prompt=None,
+        user_mode=False,
+        hostname="SG-6000-{index:04d}",
+        prompt="{hostname}{mode} ",
+        paging_off=("terminal length 0",),
+        more_prompt=HILLSTONE_MORE,
+        commands={
+            "show cpu": _hillstone_cpu,
+            "show memory": _hillstone_memory,
+        },
+        unknown="              ^\r\n-------------------------------------------\r\nunrecognized keyword",
+    ),
+}
+
+
+class DeviceBehaviour:
+    """
+    Tham số hiệu năng và lỗi giả lập của thiết bị.
+    Args:
+        latency (float): Thời gian xử lý mỗi lệnh (giây)
+        jitter (float): Cộng thêm ngẫu nhiên 0..jitter giây mỗi lệnh
+        login_latency (float): Thời gian kiểm tra mật khẩu
+        output_kb (float): Số KB output thêm vào cuối mỗi lệnh show
+        page_lines (int): Số dòng mỗi trang, 0 để tắt phân trang
+        paging_locked (bool): Firmware bỏ qua lệnh tắt phân trang
+        username, password, enable_password: Tài khoản thiết bị chấp nhận
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, login_latency=0.0, output_kb=0.0, page_lines=0,
+                 paging_locked=False, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD,
+                 enable_password=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.login_latency = login_latency
+        self.output_kb = output_kb
+        self.page_lines = page_lines
+        self.paging_locked = paging_locked
+        self.username = username
+        self.password = password
+        self.enable_password = enable_password
+
+
+class SimulatedSSHDevice:
+    """Một thiết bị: socket đang listen, profile, hành vi và lỗi giả lập (None nếu bình thường)."""
+
+    def __init__(self, index, address, profile, behaviour, failure=None):
+        self.index = index
+        self.profile = profile
+        self.behaviour = behaviour
+        self.failure = failure
+        self.hostname = profile.hostname.format(index=index)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((address, 0))
+        self.listener.listen(128)
+        self.address, self.port = self.listener.getsockname()
+
+
+class _DeviceServer(paramiko.ServerInterface):
+    def __init__(self, device):
+        self.device = device
+        self.shell_requested = threading.Event()
+
+    def _accept(self, username, password):
+        behaviour = self.device.behaviour
+        if self.device.failure == "auth_fail":
+            return paramiko.AUTH_FAILED
+        if username == behaviour.username and password == behaviour.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return self.device.profile.ssh_auths
+
+    def check_auth_none(self, username):
+        return paramiko.AUTH_SUCCESSFUL if self.device.profile.ssh_auths == "none" else paramiko.AUTH_FAILED
+
+    def check_auth_password(self, username, password):
+        if "password" not in self.device.profile.ssh_auths:
+            return paramiko.AUTH_FAILED
+        if self.device.profile.username_prompt:
+            # Firmware hỏi lại tài khoản trong CLI: bước SSH nhận mọi mật khẩu
+            return paramiko.AUTH_SUCCESSFUL
+        return self._accept(username, password)
+
+    def check_auth_interactive(self, username, submethods):
+        if "keyboard-interactive" not in self.device.profile.ssh_auths:
+            return paramiko.AUTH_FAILED
+        self.username = username
+        query = paramiko.InteractiveQuery()
+        query.add_prompt("Password: ", False)
+        return query
+
+    def check_auth_interactive_response(self, responses):
+        if self.device.profile.username_prompt:
+            return paramiko.AUTH_SUCCESSFUL
+        return self._accept(self.username, responses[0] if responses else "")
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell_requested.set()
+        return True
+
+
+class _ShellSession:
+    """CLI của một thiết bị trên một channel đã mở shell."""
+
+    def __init__(self, channel, device):
+        self.channel = channel
+        self.device = device
+        self.profile = device.profile
+        self.behaviour = device.behaviour
+        self.rng = random.Random(f"{device.index}-{time.time_ns()}")
+        self.buffer = bytearray()
+        self.skip_lf = False
+        self.mode = ">" if self.profile.user_mode else "#"
+        self.paging = device.behaviour.page_lines > 0
+
+    @property
+    def prompt(self):
+        return self.profile.prompt.format(hostname=self.device.hostname, mode=self.mode)
+
+    def send(self, text):
+        self.channel.sendall(text.encode('utf-8'))
+
+    def _fill(self):
+        data = self.channel.recv(4096)
+        if not data:
+            raise EOFError
+        self.buffer += data
+
+    def readline(self, echo=True):
+        """Đọc một dòng lệnh (kết thúc bằng CR, LF hoặc CRLF), echo lại như PTY."""
+        while True:
+            if self.skip_lf and self.buffer[:1] == b"\n":
+                del self.buffer[:1]
+            if self.buffer:
+                self.skip_lf = False
+            ends = [position for position in (self.buffer.find(b"\r"), self.buffer.find(b"\n")) if position >= 0]
+            if ends:
+                end = min(ends)
+                line = bytes(self.buffer[:end]).replace(b"\x03", b"")
+                self.skip_lf = self.buffer[end:end + 1] == b"\r"
+                del self.buffer[:end + 1]
+                text = line.decode('utf-8', 'ignore').strip()
+                self.send((text if echo else "") + "\r\n")
+                return text
+            self._fill()
+
+    def _take_key(self, start):
+        """Đợi phím bấm gửi tới sau vị trí `start` của buffer (phần trước là lệnh gõ trước)."""
+        while len(self.buffer) <= start:
+            self._fill()
+        key = self.buffer[start:start + 1]
+        del self.buffer[start:start + 1]
+        return key
+
+    def _interrupted(self):
+        """Client đã gửi Ctrl-C trong lúc đang in output (không chờ nếu chưa có dữ liệu)."""
+        while self.channel.recv_ready():
+            self._fill()
+        position = self.buffer.find(b"\x03")
+        if position < 0:
+            return False
+        del self.buffer[:position + 1]
+        return True
+
+    def send_output(self, text):
+        """In output theo đoạn (hoặc theo trang khi đang bật phân trang), dừng khi bị Ctrl-C / 'q'."""
+        if self.paging:
+            lines = text.split("\r\n")
+            page = self.behaviour.page_lines
+            position = 0
+            while position < len(lines):
+                self.send("\r\n".join(lines[position:position + page]))
+                position += page
+                if position >= len(lines):
+                    break
+                pending = len(self.buffer)
+                self.send("\r\n" + self.profile.more_prompt)
+                key = self._take_key(pending)
+                self.send("\x08" * len(self.profile.more_prompt))
+                if key in (b"q", b"Q", b"\x03", b"\x1a"):
+                    self.send("\r\n")
+                    return
+                if key in (b"\r", b"\n"):
+                    page = 1
+                else:
+                    page = self.behaviour.page_lines
+            self.send("\r\n")
+            return
+
+        data = text.encode('utf-8')
+        for offset in range(0, len(data), CHUNK_SIZE):
+            if self._interrupted():
+                self.send("^C\r\n")
+                return
+            self.channel.sendall(data[offset:offset + CHUNK_SIZE])
+        self.send("\r\n")
+
+    def _padding(self):
+        size = int(self.behaviour.output_kb * 1024)
+        if size <= 0:
+            return ""
+        line = "  .......................... padding ...........................\r\n"
+        return line * (size // len(line) + 1)
+
+    def _login(self):
+        """Login trong CLI (nếu profile có). Returns False nếu bị từ chối và kết nối đã đóng."""
+        while True:
+            self.send(self.profile.username_prompt)
+            username = self.readline()
+            if not username:
+                continue
+            self.send("Password:")
+            password = self.readline(echo=False)
+            time.sleep(self.behaviour.login_latency)
+            if (self.device.failure != "auth_fail" and username == self.behaviour.username
+                    and password == self.behaviour.password):
+                return True
+            self.send("\r\n% Authentication failed\r\n")
+            return False
+
+    def _enable(self):
+        enable_password = self.behaviour.enable_password
+        if enable_password:
+            self.send("Password:")
+            if self.readline(echo=False) != enable_password:
+                self.send("% Access denied\r\n")
+                return
+        self.mode = "#"
+
+    def run(self):
+        try:
+            self.send(self.profile.banner)
+            if self.profile.username_prompt and not self._login():
+                return
+            if not self.profile.username_prompt:
+                time.sleep(self.behaviour.login_latency)
+
+            while True:
+                self.send(self.prompt)
+                command = self.readline()
+                if not command:
+                    continue
+                if command in ("exit", "quit", "logout"):
+                    return
+                if command == "enable" and self.mode == ">":
+                    self._enable()
+                    continue
+                if command in self.profile.paging_off:
+                    if not self.behaviour.paging_locked:
+                        self.paging = False
+                    continue
+
+                if self.device.failure == "hang":
+                    # Nhận lệnh nhưng không bao giờ trả lời, chờ đến khi client đóng kết nối
+                    while True:
+                        self._fill()
+                if self.device.failure == "disconnect":
+                    return
+
+                time.sleep(self.behaviour.latency + self.rng.uniform(0, self.behaviour.jitter))
+                generator = self.profile.commands.get(command)
+                if generator is None:
+                    self.send_output(self.profile.unknown)
+                else:
+                    self.send_output(generator(self.rng) + self._padding())
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+
+
+def _serve_connection(sock, device, host_key):
+    transport = paramiko.Transport(sock)
+    transport.add_server_key(host_key)
+    server = _DeviceServer(device)
+    try:
+        transport.start_server(server=server)
+        channel = transport.accept(timeout=30)
+        if channel is None or not server.shell_requested.wait(10):
+            return
+        _ShellSession(channel, device).run()
+    except (EOFError, OSError, paramiko.SSHException):
+        pass
+    finally:
+        transport.close()
+
+
+def _accept_loop(devices, host_key, stop):
+    """Nhận kết nối trên socket của mọi thiết bị (một thread), mỗi kết nối một thread phục vụ."""
+    selector = selectors.DefaultSelector()
+    for device in devices:
+        device.listener.setblocking(False)
+        selector.register(device.listener, selectors.EVENT_READ, device)
+    while not stop.is_set():
+        for key, _ in selector.select(timeout=0.2):
+            try:
+                sock, _ = key.fileobj.accept()
+            except OSError:
+                continue
+            sock.setblocking(True)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=_serve_connection, args=(sock, key.data, host_key), daemon=True).start()
+    selector.close()
+
+
+def _worker_main(devices, host_key):
+    """Process con phục vụ một phần fleet cho đến khi bị terminate."""
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    _accept_loop(devices, host_key, threading.Event())
+
+
+def _address(base, index):
+    """Địa chỉ loopback thứ `index` tính từ `base` (127.0.0.0/8 đều trỏ về lo trên Linux)."""
+    octets = [int(part) for part in base.split(".")]
+    value = (octets[1] << 16 | octets[2] << 8 | octets[3]) + index
+    return f"127.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+class SimulatedFleet:
+    """
+    Nhóm thiết bị giả lập cùng vendor.
+    Args:
+        vendor (str): Tên profile (cisco_sg, cisco_cbs220, hillstone)
+        count (int): Số thiết bị
+        behaviour (DeviceBehaviour): Hành vi chung
+        failures (dict): Lỗi -> tỉ lệ thiết bị (0..1), ví dụ {'hang': 0.02}
+        workers (int): Số process phục vụ; >1 để simulator không thành nút thắt CPU
+        base_address (str): Địa chỉ loopback của thiết bị đầu tiên; mỗi thiết bị một địa chỉ
+                            (host khác nhau như fleet thật). Dùng distinct_addresses=False
+                            trên hệ thống chỉ có 127.0.0.1 (macOS)
+        host_key (paramiko.PKey): Host key dùng chung, mặc định sinh RSA mới
+        seed (int): Seed chọn thiết bị bị lỗi
+    """
+
+    def __init__(self, vendor, count, behaviour=None, failures=None, workers=1, base_address="127.10.0.1",
+                 distinct_addresses=True, host_key=None, seed=1):
+        self.vendor = vendor
+        self.profile = PROFILES[vendor]
+        self.behaviour = behaviour or DeviceBehaviour()
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.workers = max(1, workers)
+
+        order = list(range(count))
+        random.Random(seed).shuffle(order)
+        assigned = {}
+        position = 0
+        for mode in FAILURE_MODES:
+            share = round(count * (failures or {}).get(mode, 0))
+            for index in order[position:position + share]:
+                assigned[index] = mode
+            position += share
+
+        self.devices = [
+            SimulatedSSHDevice(index, _address(base_address, index) if distinct_addresses else "127.0.0.1",
+                               self.profile, self.behaviour, assigned.get(index))
+            for index in range(count)
+        ]
+        self._stop = threading.Event()
+        self._processes = []
+        self._thread = None
+
+    def start(self):
+        if self.workers == 1:
+            self._thread = threading.Thread(target=_accept_loop, args=(self.devices, self.host_key, self._stop),
+                                            daemon=True)
+            self._thread.start()
+            return self
+        context = multiprocessing.get_context("fork")
+        for worker in range(self.workers):
+            process = context.Process(target=_worker_main, args=(self.devices[worker::self.workers], self.host_key),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+        # Socket listen đã được process con kế thừa
+        for device in self.devices:
+            device.listener.close()
+        return self
+
+    def failures(self):
+        """Lỗi -> số thiết bị được gán."""
+        counts = {}
+        for device in self.devices:
+            if device.failure:
+                counts[device.failure] = counts.get(device.failure, 0) + 1
+        return counts
+
+    def write_inventory(self, path, username=None, password=None):
+        """Ghi inventory CSV (common/inventory.py) cho các thiết bị của fleet."""
+        username = username or self.behaviour.username
+        password = password or self.behaviour.password
+        with open(path, 'w') as f:
+            f.write("host,vendor,site,tags,port,username,password,enable_password\n")
+            for device in self.devices:
+                f.write(f"{device.address},{self.vendor},sim,{device.failure or 'ok'},{device.port},"
+                        f"{username},{password},{self.behaviour.enable_password or ''}\n")
+
+    def close(self):
+        self._stop.set()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(5)
+        if self._thread is not None:
+            self._thread.join(1)
+            for device in self.devices:
+                device.listener.close()
+
+
+def parse_failures(text):
+    """'hang=0.02,auth_fail=0.01' -> {'hang': 0.02, 'auth_fail': 0.01}."""
+    failures = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        mode, _, share = item.partition("=")
+        if mode not in FAILURE_MODES:
+            raise ValueError(f"Unknown failure mode '{mode}', expected one of {', '.join(FAILURE_MODES)}")
+        failures[mode] = float(share)
+    return failures
+
+
+def add_behaviour_arguments(parser):
+    """Tham số dòng lệnh chung cho DeviceBehaviour và lỗi giả lập (dùng lại trong bench_collectors.py)."""
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per command")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random 0..N seconds per command")
+    parser.add_argument("--login-latency", type=float, default=0.0, help="Seconds to check the password")
+    parser.add_argument("--output-kb", type=float, default=0.0, help="Extra KB appended to every show output")
+    parser.add_argument("--page-lines", type=int, default=0, help="Lines per '--More--' page (0 disables paging)")
+    parser.add_argument("--paging-locked", action="store_true", help="Ignore 'terminal datadump'/'terminal length 0'")
+    parser.add_argument("--enable-password", default=None, help="Require this password after 'enable' (cisco_cbs220)")
+    parser.add_argument("--failures", default="", help=f"Share of failing devices, e.g. hang=0.02,auth_fail=0.01 "
+                                                       f"({', '.join(FAILURE_MODES)})")
+
+
+def behaviour_from_args(args):
+    return DeviceBehaviour(latency=args.latency, jitter=args.jitter, login_latency=args.login_latency,
+                           output_kb=args.output_kb, page_lines=args.page_lines, paging_locked=args.paging_locked,
+                           enable_password=args.enable_password)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vendor", choices=sorted(PROFILES), default="cisco_sg")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="Server processes")
+    parser.add_argument("--base-address", default="127.10.0.1")
+    parser.add_argument("--single-address", action="store_true", help="All devices on 127.0.0.1 (one port each)")
+    parser.add_argument("--host-key", help="RSA host key file (created if missing) so known_hosts stay valid")
+    parser.add_argument("--inventory", help="Write a CSV inventory for the simulated devices to this path")
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    host_key = None
+    if args.host_key:
+        if os.path.exists(args.host_key):
+            host_key = paramiko.RSAKey.from_private_key_file(args.host_key)
+        else:
+            host_key = paramiko.RSAKey.generate(2048)
+            host_key.write_private_key_file(args.host_key)
+
+    fleet = SimulatedFleet(args.vendor, args.devices, behaviour_from_args(args), parse_failures(args.failures),
+                           workers=args.workers, base_address=args.base_address,
+                           distinct_addresses=not args.single_address, host_key=host_key).start()
+    if args.inventory:
+        fleet.write_inventory(args.inventory)
+    first, last = fleet.devices[0], fleet.devices[-1]
+    print(f"{len(fleet.devices)} {args.vendor} device(s) listening, {first.address}:{first.port} .. "
+          f"{last.address}:{last.port}; failures: {fleet.failures() or 'none'}"
+          + (f"; inventory: {args.inventory}" if args.inventory else ""), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.close()
+
+
+if __name__ == "__main__":
+    main()
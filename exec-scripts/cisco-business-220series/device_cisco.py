@@ -1,11 +1,10 @@
-import subprocess
+import argparse
+import hashlib
 import time
 import os
 import re
 import sys
-import threading
 import pexpect
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # --- Thông tin kết nối và xác thực ---
@@ -16,43 +15,111 @@ print(f"Looking for .env file at: {env_path}", file=sys.stderr)
 print(f".env file exists: {os.path.exists(env_path)}", file=sys.stderr)
 load_dotenv(env_path)
 
+# Thư viện dùng chung nằm ở exec-scripts/common
+sys.path.insert(0, os.path.dirname(script_dir))
+from common import capture, deadline, stats
+from common.state import get_state_dir
+from common.engine import run_collection
+from common.execd import run_execd
+from common.health import HealthStore, mark_failure
+from common.profiling import Profiler
+from common.inventory import Inventory
+from common.shard import shard_from_env
+from common.output import create_writer
+from common.schedule import MetricGroup, Scheduler
+from common.templates import Template
+from common.lineproto import encode
+from common.login import format_login_metric
+
+# Tên driver trong collector hợp nhất (common.drivers), cũng là tag vendor của collector_login
+DRIVER_NAME = "cisco_cbs220"
+
 # Load cấu hình thiết bị từ biến môi trường
-def load_device_configs():
+def load_device_configs(env=None):
     """Load tất cả cấu hình thiết bị từ biến môi trường"""
+    env = os.environ if env is None else env
     devices = []
-    device_num = 1
-    
-    while True:
-        host_key = f'CISCO_HOST_{device_num}'
-        host = os.getenv(host_key)
-        
+    # Quét mọi chỉ số có trong env: một chỉ số bị thiếu không làm mất các thiết bị phía sau
+    host_keys = re.compile(r"CISCO_HOST_(\d+)$")
+    device_nums = sorted(int(match.group(1)) for match in map(host_keys.match, env) if match)
+
+    for device_num in device_nums:
+        host = env.get(f'CISCO_HOST_{device_num}')
         if not host:
-            break
-            
+            continue
+
         device_config = {
             'hostname': host,
-            'port': int(os.getenv(f'CISCO_PORT_{device_num}', 22)),
-            'username': os.getenv(f'CISCO_USERNAME_{device_num}'),
-            'password': os.getenv(f'CISCO_PASSWORD_{device_num}'),
-            'enable_password': os.getenv(f'CISCO_ENABLE_PASSWORD_{device_num}', '').strip("'\"") or None
+            'port': int(env.get(f'CISCO_PORT_{device_num}') or 22),
+            'username': env.get(f'CISCO_USERNAME_{device_num}'),
+            'password': env.get(f'CISCO_PASSWORD_{device_num}'),
+            'enable_password': (env.get(f'CISCO_ENABLE_PASSWORD_{device_num}') or '').strip("'\"") or None
         }
         
         # Validate required fields
         if device_config['username'] and device_config['password']:
             devices.append(device_config)
-            print(f"Loaded device config for {host}", file=sys.stderr)
-            print(f"  Username: {device_config['username']}", file=sys.stderr)
-            print(f"  Password: {'*' * len(device_config['password']) if device_config['password'] else 'None'}", file=sys.stderr)
-            print(f"  Enable password: {'*' * len(device_config['enable_password']) if device_config['enable_password'] else 'None'}", file=sys.stderr)
         else:
             print(f"Warning: Incomplete config for device {device_num}, skipping", file=sys.stderr)
             print(f"  Username present: {bool(device_config['username'])}", file=sys.stderr)
             print(f"  Password present: {bool(device_config['password'])}", file=sys.stderr)
-            
-        device_num += 1
     
     return devices
 
+# Lệnh khởi tạo phiên: tắt phân trang để output dài không dừng ở "More:"
+TERMINAL_SETUP_COMMANDS = ["terminal datadump"]
+
+# Multiplexing OpenSSH (ControlMaster/ControlPersist): lần poll sau dùng lại kết nối
+# đã xác thực (không TCP handshake / key exchange / SSH auth lại). Giá trị là số giây
+# master connection được giữ sau khi session cuối đóng; 0 để tắt.
+DEFAULT_CONTROL_PERSIST = 300
+
+
+def get_control_persist():
+    try:
+        return max(0, int(os.getenv('COLLECTOR_SSH_CONTROL_PERSIST', DEFAULT_CONTROL_PERSIST)))
+    except ValueError:
+        print(f"Warning: Invalid COLLECTOR_SSH_CONTROL_PERSIST, using default {DEFAULT_CONTROL_PERSIST}", file=sys.stderr)
+        return DEFAULT_CONTROL_PERSIST
+
+
+def session_log_enabled():
+    """Ghi toàn bộ phiên pexpect ra stderr (COLLECTOR_SESSION_LOG=1, mặc định tắt)."""
+    return os.getenv('COLLECTOR_SESSION_LOG', '0').lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def build_ssh_command(hostname, port, username, control_persist):
+    """
+    Lệnh ssh cho pexpect.
+    Host key được ghi vào known_hosts trong thư mục trạng thái lần đầu (accept-new) và
+    kiểm tra ở các lần sau, thay cho StrictHostKeyChecking=no + /dev/null.
+
+    Returns:
+        tuple: (lệnh ssh, đường dẫn control socket hoặc None nếu tắt multiplexing)
+    """
+    state_dir = get_state_dir()
+    options = [
+        "-p", str(port),
+        "-o", "StrictHostKeyChecking=accept-new",
+        "-o", f"UserKnownHostsFile={os.path.join(state_dir, 'known_hosts')}",
+    ]
+    control_path = None
+    if control_persist:
+        control_dir = os.path.join(state_dir, "ssh-control")
+        os.makedirs(control_dir, mode=0o700, exist_ok=True)
+        # Tên ngắn cố định theo user@host:port (đường dẫn unix socket bị giới hạn ~104 ký tự)
+        digest = hashlib.sha1(f"{username}@{hostname}:{port}".encode('utf-8')).hexdigest()[:16]
+        control_path = os.path.join(control_dir, f"cbs220-{digest}")
+        options += [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={control_path}",
+            "-o", f"ControlPersist={control_persist}",
+        ]
+    return f"ssh {' '.join(options)} {username}@{hostname}", control_path
+
+# Prompt phân trang, dùng khi thiết bị không nhận lệnh tắt paging
+MORE_PROMPT = re.compile(rb"-+\s*More\s*-+|More: <space>,\s*Quit: q.*?One line: <return>", re.IGNORECASE)
+
 # --- Lớp xử lý kết nối và tương tác SSH bằng pexpect ---
 class CiscoSSHClient:
     def __init__(self, hostname, port, username, password, enable_password):
@@ -62,29 +129,57 @@ class CiscoSSHClient:
         self.password = password
         self.enable_password = enable_password if enable_password else None
         self.connection = None
+        # False khi một lệnh bị timeout hoặc lỗi giữa chừng: buffer pexpect có thể còn phần
+        # output cũ, lệnh sau sẽ đọc nhầm output đó nên session không được dùng lại
+        self.in_sync = True
+        # Tổng byte đã đọc từ pexpect (như PromptReader.bytes_received của cisco-sg/hillstone)
+        self.bytes_received = 0
+        # Loại lỗi kết nối/login gần nhất, dùng cho circuit breaker (common.health)
+        self.last_error = None
+
+    def _expect(self, patterns, timeout):
+        """connection.expect, cộng số byte thô đã đọc vào bytes_received và collector_stats."""
+        index = self.connection.expect(patterns, timeout=timeout)
+        received = len(self.connection.before or b"")
+        if isinstance(self.connection.after, bytes):
+            received += len(self.connection.after)
+        self.bytes_received += received
+        stats.add_bytes(received)
+        return index
 
     def connect_and_login(self):
-        """Thiết lập kết nối SSH bằng pexpect - giống SSH thủ công."""
+        """
+        Thiết lập kết nối SSH bằng pexpect - giống SSH thủ công.
+        Thời gian tới banner/prompt đầu tiên (ssh kết nối và xác thực), login trong CLI và
+        enable được ghi vào collector_stats (phase connect / login / enable).
+        """
+        start = time.monotonic()
+        connected_at = enable_at = ready_at = None
         try:
             print(f"Attempting to connect to {self.hostname} using pexpect...", file=sys.stderr)
             
-            # Create SSH connection using pexpect
-            ssh_command = f'ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null {self.username}@{self.hostname}'
+            # Create SSH connection using pexpect (qua control socket nếu master connection còn sống)
+            ssh_command, control_path = build_ssh_command(self.hostname, self.port, self.username, get_control_persist())
             print(f"SSH command: {ssh_command}", file=sys.stderr)
+            if control_path and os.path.exists(control_path):
+                print(f"Reusing multiplexed SSH connection to {self.hostname}", file=sys.stderr)
             
-            self.connection = pexpect.spawn(ssh_command, timeout=30)
+            self.connection = pexpect.spawn(ssh_command, timeout=deadline.clamp(30))
             
-            # Log all interaction for debugging
-            self.connection.logfile_read = sys.stderr.buffer
+            # Toàn bộ phiên ra stderr chỉ khi debug (COLLECTOR_SESSION_LOG=1); để lưu
+            # output lệnh dùng chế độ capture (common/capture.py)
+            if session_log_enabled():
+                self.connection.logfile_read = sys.stderr.buffer
             
-            index = self.connection.expect([
+            index = self._expect([
                 'Press <Enter> to continue',
                 'Welcome to Layer 2 Managed Switch',
                 'Username:',
                 'Password:',
                 pexpect.TIMEOUT,
                 pexpect.EOF
-            ], timeout=30)
+            ], timeout=deadline.clamp(30))
+            connected_at = time.monotonic()
             
             print(f"Initial expect index: {index}", file=sys.stderr)
             
@@ -93,13 +188,13 @@ class CiscoSSHClient:
                 self.connection.send('\n')
                 
                 # Wait for username prompt
-                index = self.connection.expect(['Username:', pexpect.TIMEOUT], timeout=10)
+                index = self._expect(['Username:', pexpect.TIMEOUT], timeout=deadline.clamp(10))
                 if index == 0:
                     print(f"Sending username: {self.username}", file=sys.stderr)
                     self.connection.sendline(self.username)
                     
                     # Wait for password prompt
-                    index = self.connection.expect(['Password:', pexpect.TIMEOUT], timeout=10)
+                    index = self._expect(['Password:', pexpect.TIMEOUT], timeout=deadline.clamp(10))
                     if index == 0:
                         print(f"Sending password", file=sys.stderr)
                         self.connection.sendline(self.password)
@@ -115,7 +210,7 @@ class CiscoSSHClient:
                 self.connection.sendline(self.username)
                 
                 # Wait for password prompt
-                index = self.connection.expect(['Password:', pexpect.TIMEOUT], timeout=10)
+                index = self._expect(['Password:', pexpect.TIMEOUT], timeout=deadline.clamp(10))
                 if index == 0:
                     print(f"Sending password", file=sys.stderr)
                     self.connection.sendline(self.password)
@@ -129,25 +224,27 @@ class CiscoSSHClient:
                 
             else:
                 print(f"Unexpected response or timeout during initial connection", file=sys.stderr)
+                self.last_error = "ConnectTimeout" if index == 4 else "ConnectionClosed"
                 return False
             
             # Wait for shell prompt
             print(f"Waiting for shell prompt...", file=sys.stderr)
-            index = self.connection.expect(['#', '>', pexpect.TIMEOUT], timeout=15)
+            index = self._expect(['#', '>', pexpect.TIMEOUT], timeout=deadline.clamp(15))
             
             if index == 1:  # User mode prompt '>'
                 print(f"In user mode, entering enable mode", file=sys.stderr)
                 self.connection.sendline('enable')
+                enable_at = time.monotonic()
                 
                 # Check if enable password is required
-                index = self.connection.expect(['Password:', '#', pexpect.TIMEOUT], timeout=10)
+                index = self._expect(['Password:', '#', pexpect.TIMEOUT], timeout=deadline.clamp(10))
                 if index == 0:  # Enable password required
                     if self.enable_password:
                         print(f"Sending enable password", file=sys.stderr)
                         self.connection.sendline(self.enable_password)
                         
                         # Wait for privileged prompt
-                        index = self.connection.expect(['#', pexpect.TIMEOUT], timeout=10)
+                        index = self._expect(['#', pexpect.TIMEOUT], timeout=deadline.clamp(10))
                         if index != 0:
                             print(f"Failed to enter privileged mode after enable password", file=sys.stderr)
                             return False
@@ -167,14 +264,28 @@ class CiscoSSHClient:
                 return False
             
             print(f"Successfully connected and authenticated to {self.hostname}", file=sys.stderr)
+            ready_at = time.monotonic()
+            for command in TERMINAL_SETUP_COMMANDS:
+                self.send_command(command, timeout=5, record=False)
             return True
             
         except Exception as e:
             print(f"Error connecting to {self.hostname}: {e}", file=sys.stderr)
+            self.last_error = type(e).__name__
             return False
+        finally:
+            end = ready_at or time.monotonic()
+            stats.add_phase("connect", (connected_at or end) - start)
+            if connected_at is not None:
+                stats.add_phase("login", (enable_at or end) - connected_at)
+            if enable_at is not None:
+                stats.add_phase("enable", end - enable_at)
 
-    def send_command(self, command, timeout=10):
-        """Gửi lệnh và nhận kết quả."""
+    def send_command(self, command, timeout=10, record=True):
+        """
+        Gửi lệnh và nhận kết quả. Khi bật capture, byte thô đọc được cho lệnh (echo,
+        prompt phân trang, prompt) được ghi vào corpus trừ khi record=False.
+        """
         if not self.connection:
             print(f"Error: No connection available to execute command '{command}'.", file=sys.stderr)
             return None
@@ -183,11 +294,29 @@ class CiscoSSHClient:
             print(f"Sending command: {command}", file=sys.stderr)
             self.connection.sendline(command)
             
-            # Wait for command to complete and return to prompt
-            index = self.connection.expect(['#', pexpect.TIMEOUT], timeout=timeout)
+            # Wait for command to complete and return to prompt, tự bấm phím cách ở prompt phân trang
+            start, bytes_before = time.monotonic(), self.bytes_received
+            command_deadline = start + deadline.clamp(timeout)
+            output = ""
+            raw = bytearray() if record and capture.active() else None
+            while True:
+                remaining = max(0, command_deadline - time.monotonic())
+                index = self._expect(['#', MORE_PROMPT, pexpect.TIMEOUT], timeout=remaining)
+                if raw is not None:
+                    raw += self.connection.before or b""
+                    if isinstance(self.connection.after, bytes):
+                        raw += self.connection.after
+                if index != 1:
+                    break
+                output += self.connection.before.decode('utf-8', errors='ignore')
+                self.connection.send(' ')
+
+            if raw is not None:
+                capture.record(command, raw.decode('utf-8', errors='ignore'))
+            stats.command(command, time.monotonic() - start, self.bytes_received - bytes_before)
             if index == 0:
                 # Get the output
-                output = self.connection.before.decode('utf-8', errors='ignore')
+                output += self.connection.before.decode('utf-8', errors='ignore')
                 
                 # Clean up the output
                 lines = output.split('\n')
@@ -202,12 +331,18 @@ class CiscoSSHClient:
                 return result
             else:
                 print(f"Command timeout for: {command}", file=sys.stderr)
+                self.in_sync = False
                 return None
                 
         except Exception as e:
             print(f"Error executing command '{command}': {e}", file=sys.stderr)
+            self.in_sync = False
             return None
 
+    def is_alive(self):
+        """Kiểm tra process ssh của pexpect còn chạy và buffer còn đồng bộ với prompt."""
+        return self.connection is not None and self.in_sync and self.connection.isalive()
+
     def close(self):
         """Đóng kết nối SSH."""
         if self.connection:
@@ -218,76 +353,88 @@ class CiscoSSHClient:
 
 # --- Hàm thu thập metrics và format cho Telegraf ---
 
-def get_memory_stats(ssh_client, host):
-    """Thu thập Memory (RAM) metrics từ 'show memory statistics'."""
-    raw_output = ssh_client.send_command("show memory statistics")
+# Parse theo kiểu Linux free: total từ dòng "Mem:", phần đã dùng không tính buffers/cache
+# từ dòng "-/+ buffers/cache:"
+# Format: "Mem: 255780 214016 41764 67512 6108 116692"
+#         "-/+ buffers/cache:          90756       165024"
+MEMORY_TEMPLATE = Template(DRIVER_NAME, "show memory statistics", [
+    r"-/\+ buffers/cache:\s+{used:int}\s+{free:int}",
+    r"Mem:\s+{total:int}",
+])
+
+def parse_memory_stats(raw_output, host, timestamp=None):
+    """Parse output của 'show memory statistics' thành Memory (RAM) metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
+    memory = MEMORY_TEMPLATE.parse_one(raw_output)
 
-    if raw_output:
-        print(f"Memory command output for {host}:\n{raw_output}", file=sys.stderr)
-        
-        # Parse theo kiểu Linux free - sử dụng "-/+ buffers/cache" line
-        # Format: "-/+ buffers/cache:          90756       165024"
-        buffers_cache_pattern = r"-/\+ buffers/cache:\s+(\d+)\s+(\d+)"
-        buffers_cache_match = re.search(buffers_cache_pattern, raw_output)
-        
-        # Parse total memory từ Mem line
-        # Format: "Mem: 255780 214016 41764 67512 6108 116692"
-        mem_pattern = r"Mem:\s+(\d+)"
-        mem_match = re.search(mem_pattern, raw_output)
-
-        if buffers_cache_match and mem_match:
-            total_kb = int(mem_match.group(1))
-            used_without_buffers_cache = int(buffers_cache_match.group(1))
-            
-            # Tính toán usage percentage theo kiểu Linux free (trừ buffers/cache)
-            ram_used_percent = round((used_without_buffers_cache / total_kb) * 100, 2) if total_kb > 0 else 0
-            
-            metrics.append(
-                f"switch_sys,agent_host={host},metric_type=memory mem_used_percent={ram_used_percent} {timestamp}"
-            )
-            print(f"Memory metrics parsed successfully for {host}: {ram_used_percent}% (Linux-style, excluding buffers/cache)", file=sys.stderr)
-        else:
-            print(f"Warning: Memory data not found in 'show memory statistics' output for {host}", file=sys.stderr)
+    if memory:
+        total_kb = memory['total']
+        used_without_buffers_cache = memory['used']
+
+        # Tính toán usage percentage theo kiểu Linux free (trừ buffers/cache)
+        ram_used_percent = round((used_without_buffers_cache / total_kb) * 100, 2) if total_kb > 0 else 0
+
+        metrics.append(encode(
+            "switch_sys", {'agent_host': host, 'metric_type': 'memory'},
+            {'mem_used_percent': float(ram_used_percent)}, timestamp,
+        ))
+        print(f"Memory metrics parsed successfully for {host}: {ram_used_percent}% (Linux-style, excluding buffers/cache)", file=sys.stderr)
     else:
-        print(f"No output received from memory command for {host}", file=sys.stderr)
+        print(f"Warning: Memory data not found in 'show memory statistics' output for {host}", file=sys.stderr)
 
     return metrics
 
-def get_cpu_stats(ssh_client, host):
-    """Thu thập CPU metrics từ 'show cpu'."""
-    raw_output = ssh_client.send_command("show cpu utilization")
+def get_memory_stats(ssh_client, host, timestamp=None):
+    """Thu thập Memory (RAM) metrics từ 'show memory statistics'."""
+    raw_output = ssh_client.send_command("show memory statistics")
+
+    if not raw_output:
+        print(f"No output received from memory command for {host}", file=sys.stderr)
+        return []
+    print(f"Memory command output for {host}:\n{raw_output}", file=sys.stderr)
+    return parse_memory_stats(raw_output, host, timestamp)
+
+# CPU usage trung bình 5 phút
+# Format: "five seconds: 100%; one minute: 31%; five minutes: 34%"
+CPU_TEMPLATE = Template(DRIVER_NAME, "show cpu utilization", r"five minutes:\s*{five_min:int}%")
+
+def parse_cpu_stats(raw_output, host, timestamp=None):
+    """Parse output của 'show cpu utilization' thành CPU metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
+    cpu = CPU_TEMPLATE.parse_one(raw_output)
 
-    if raw_output:
-        print(f"CPU command output for {host}:\n{raw_output}", file=sys.stderr)
-        
-        # Regex để parse CPU usage - tìm 5 second average
-        # Format: "five seconds: 100%; one minute: 31%; five minutes: 34%"
-        cpu_pattern = r"five minutes:\s*(\d+)%"
-        cpu_match = re.search(cpu_pattern, raw_output)
+    if cpu:
+        cpu_used_percent = cpu['five_min']
 
-        if cpu_match:
-            cpu_used_percent = int(cpu_match.group(1))
-            
-            metrics.append(
-                f"switch_sys,agent_host={host},metric_type=cpu cpu_used_percent={cpu_used_percent} {timestamp}"
-            )
-            print(f"CPU metrics parsed successfully for {host}: {cpu_used_percent}%", file=sys.stderr)
-        else:
-            print(f"Warning: CPU data not found in 'show cpu utilization' output for {host}", file=sys.stderr)
+        metrics.append(encode(
+            "switch_sys", {'agent_host': host, 'metric_type': 'cpu'},
+            {'cpu_used_percent': float(cpu_used_percent)}, timestamp,
+        ))
+        print(f"CPU metrics parsed successfully for {host}: {cpu_used_percent}%", file=sys.stderr)
     else:
-        print(f"No output received from CPU command for {host}", file=sys.stderr)
+        print(f"Warning: CPU data not found in 'show cpu utilization' output for {host}", file=sys.stderr)
 
     return metrics
 
-def collect_metrics_from_device(device_config):
-    """Collect metrics from a single device."""
+def get_cpu_stats(ssh_client, host, timestamp=None):
+    """Thu thập CPU metrics từ 'show cpu utilization'."""
+    raw_output = ssh_client.send_command("show cpu utilization")
+
+    if not raw_output:
+        print(f"No output received from CPU command for {host}", file=sys.stderr)
+        return []
+    print(f"CPU command output for {host}:\n{raw_output}", file=sys.stderr)
+    return parse_cpu_stats(raw_output, host, timestamp)
+
+def open_session(device_config):
+    """
+    Kết nối và login vào thiết bị.
+
+    Returns:
+        tuple: (CiscoSSHClient đã sẵn sàng hoặc None, metrics của bước login)
+    """
     host = device_config['hostname']
-    print(f"Starting metrics collection for {host}", file=sys.stderr)
-    
+    stats.set_vendor(DRIVER_NAME)
     ssh_client = CiscoSSHClient(
         hostname=device_config['hostname'],
         port=device_config['port'],
@@ -296,52 +443,100 @@ def collect_metrics_from_device(device_config):
         enable_password=device_config['enable_password']
     )
 
-    device_metrics = []
-    
-    if ssh_client.connect_and_login():
-        print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
-        
-        # Thu thập CPU metrics
-        cpu_metrics = get_cpu_stats(ssh_client, host)
-        if cpu_metrics:
-            device_metrics.extend(cpu_metrics)
-        else:
-            print(f"No CPU metrics collected from {host}.", file=sys.stderr)
-        
-        # Thu thập Memory metrics
-        memory_metrics = get_memory_stats(ssh_client, host)
-        if memory_metrics:
-            device_metrics.extend(memory_metrics)
-        else:
-            print(f"No Memory metrics collected from {host}.", file=sys.stderr)
+    login_start = time.monotonic()
+    logged_in = ssh_client.connect_and_login()
+    login_metrics = [format_login_metric(host, DRIVER_NAME, logged_in, time.monotonic() - login_start)]
+    stats.add_metrics(login_metrics)
+
+    if not logged_in:
+        print(f"Failed to establish SSH connection or login for {host}. Check credentials and switch configuration.", file=sys.stderr)
+        mark_failure(ssh_client.last_error or "LoginFailed")
+        ssh_client.close()
+        return None, login_metrics
+
+    print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
+    return ssh_client, login_metrics
+
+def replay_session(channel):
+    """Client trên channel phát lại (common.capture.ReplayChannel), dùng bởi benchmarks/bench_replay.py."""
+    ssh_client = CiscoSSHClient("replay", 22, None, None, None)
+    ssh_client.connection = capture.ReplaySpawn(channel, pexpect.TIMEOUT)
+    return ssh_client
+
+# Các nhóm metrics và chu kỳ mặc định (giây, đổi bằng COLLECTOR_INTERVAL_<NHÓM>);
+# mỗi lần chạy chỉ gửi lệnh của nhóm đến hạn
+METRIC_GROUPS = [
+    MetricGroup("cpu", 30, collect=get_cpu_stats, label="CPU"),
+    MetricGroup("memory", 60, collect=get_memory_stats, label="Memory"),
+]
+
+SCHEDULER = Scheduler(DRIVER_NAME, METRIC_GROUPS)
 
+def collect_metrics_from_session(ssh_client, host):
+    """Thu thập metrics của các nhóm đến hạn trên một session đã login."""
+    return SCHEDULER.collect(ssh_client, host)
+
+def collect_metrics_from_device(device_config):
+    """Collect metrics from a single device."""
+    host = device_config['hostname']
+    if not SCHEDULER.due_groups(host):
+        print(f"No metric groups due for {host}, skipping connection", file=sys.stderr)
+        return SCHEDULER.collect(None, host)
+
+    print(f"Starting metrics collection for {host}", file=sys.stderr)
+
+    ssh_client, device_metrics = open_session(device_config)
+    if ssh_client:
+        device_metrics.extend(collect_metrics_from_session(ssh_client, host))
         ssh_client.close()
         print(f"Completed metrics collection for {host}", file=sys.stderr)
-    else:
-        print(f"Failed to establish SSH connection or login for {host}. Check credentials and switch configuration.", file=sys.stderr)
-    
+
     return device_metrics
 
 # --- Main execution ---
 if __name__ == "__main__":
-    # Load all device configurations
-    devices = load_device_configs()
+    parser = argparse.ArgumentParser(description="Collect Cisco Business 220 switch metrics for Telegraf")
+    parser.add_argument("--execd", action="store_true",
+                        help="Run as a resident Telegraf execd process (poll on each stdin line, keep sessions open)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile runs with cProfile/tracemalloc (same as COLLECTOR_PROFILE=1, see common/profiling.py)")
+    parser.add_argument("--inventory", default=os.getenv('COLLECTOR_INVENTORY'),
+                        help=f"Device inventory file (YAML/CSV) instead of numbered env vars; only {DRIVER_NAME} entries are used")
+    args = parser.parse_args()
+
+    # Load all device configurations (inventory file nếu có, ngược lại từ biến môi trường)
+    inventory = Inventory(args.inventory) if args.inventory else None
+    devices = inventory.select(vendor=DRIVER_NAME) if inventory else load_device_configs()
     
     if not devices:
         print("No valid device configurations found in .env file.", file=sys.stderr)
         sys.exit(1)
     
+    # Sharding: nhiều instance chia nhau fleet, instance này chỉ poll phần của nó
+    # (COLLECTOR_SHARD_INDEX/COLLECTOR_SHARD_COUNT hoặc COLLECTOR_SHARD_RING)
+    shard = shard_from_env()
+    if shard is not None:
+        total = len(devices)
+        devices = shard.select(devices)
+        print(f"Sharding ({shard}): {len(devices)} of {total} device(s) assigned to this instance", file=sys.stderr)
+
     print(f"Found {len(devices)} device(s) to monitor", file=sys.stderr)
-    
-    all_metrics = []
-    
-    # Sequential processing for better debugging
-    for device_config in devices:
-        device_metrics = collect_metrics_from_device(device_config)
-        all_metrics.extend(device_metrics)
-    
-    # Output all collected metrics
-    for metric_line in all_metrics:
-        print(metric_line)
-    
-    print(f"Total metrics collected: {len(all_metrics)}", file=sys.stderr) 
\ No newline at end of file
+
+    # Circuit breaker: thiết bị lỗi liên tiếp bị bỏ qua theo backoff (COLLECTOR_BREAKER=0 để tắt)
+    health = HealthStore.from_env()
+    # Profiling: --profile hoặc COLLECTOR_PROFILE=1, báo cáo trong COLLECTOR_PROFILE_DIR
+    profiler = Profiler.from_env(args.profile)
+
+    if args.execd:
+        reload = inventory.reloader(vendor=DRIVER_NAME, shard=shard) if inventory else None
+        run_execd(devices, open_session, collect_metrics_from_session, reload=reload, health=health, profiler=profiler)
+        sys.exit(0)
+
+    # Thu thập song song trên event loop asyncio, giới hạn bởi COLLECTOR_CONCURRENCY;
+    # metrics của mỗi thiết bị được ghi ra stdout ngay khi thiết bị đó hoàn tất
+    # (đặt COLLECTOR_CONCURRENCY=1 để chạy tuần tự khi cần debug)
+    writer = create_writer()
+    run_collection(devices, collect_metrics_from_device, writer, health=health, profiler=profiler)
+    writer.close()
+
+    print(f"Total metrics collected: {writer.count}", file=sys.stderr) 
@@ -1,10 +1,9 @@
+import argparse
 import paramiko
-import time
 import os
 import re
+import socket
 import sys
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # --- Thông tin kết nối và xác thực ---
@@ -13,66 +12,85 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(script_dir, '.env')
 load_dotenv(env_path)
 
+# Thư viện dùng chung nằm ở exec-scripts/common
+sys.path.insert(0, os.path.dirname(script_dir))
+from common import authcache, deadline, stats
+from common.channel import PromptReader
+from common.engine import run_collection
+from common.execd import run_execd
+from common.health import HealthStore, mark_failure
+from common.profiling import Profiler
+from common.inventory import Inventory
+from common.shard import shard_from_env
+from common.output import create_writer
+from common.schedule import MetricGroup, Scheduler
+from common.stream import RegexStreamExtractor
+from common.templates import Template
+from common.lineproto import SeriesEncoder, encode, now_ns
+from common.login import LoginStateMachine, format_login_metric
+
+# Tên driver trong collector hợp nhất (common.drivers), cũng là tag vendor của collector_login
+DRIVER_NAME = "cisco_sg"
+
 # Load cấu hình thiết bị từ biến môi trường
-def load_device_configs():
+def load_device_configs(env=None):
     """Load tất cả cấu hình thiết bị từ biến môi trường"""
+    env = os.environ if env is None else env
     devices = []
-    device_num = 1
-    
-    while True:
-        host_key = f'CISCO_HOST_{device_num}'
-        host = os.getenv(host_key)
-        
+    # Quét mọi chỉ số có trong env: một chỉ số bị thiếu không làm mất các thiết bị phía sau
+    host_keys = re.compile(r"CISCO_HOST_(\d+)$")
+    device_nums = sorted(int(match.group(1)) for match in map(host_keys.match, env) if match)
+
+    for device_num in device_nums:
+        host = env.get(f'CISCO_HOST_{device_num}')
         if not host:
-            break
-            
+            continue
+
         device_config = {
             'hostname': host,
-            'port': int(os.getenv(f'CISCO_PORT_{device_num}', 22)),
-            'username': os.getenv(f'CISCO_USERNAME_{device_num}'),
-            'password': os.getenv(f'CISCO_PASSWORD_{device_num}'),
-            'enable_password': os.getenv(f'CISCO_ENABLE_PASSWORD_{device_num}', '').strip("'\"") or None
+            'port': int(env.get(f'CISCO_PORT_{device_num}') or 22),
+            'username': env.get(f'CISCO_USERNAME_{device_num}'),
+            'password': env.get(f'CISCO_PASSWORD_{device_num}'),
+            'enable_password': (env.get(f'CISCO_ENABLE_PASSWORD_{device_num}') or '').strip("'\"") or None
         }
         
         # Validate required fields
         if device_config['username'] and device_config['password']:
             devices.append(device_config)
-            print(f"Loaded device config for {host}", file=sys.stderr)
         else:
             print(f"Warning: Incomplete config for device {device_num}, skipping", file=sys.stderr)
-            
-        device_num += 1
     
     return devices
 
+# Lệnh khởi tạo phiên: tắt phân trang để output dài không dừng ở "More:"
+TERMINAL_SETUP_COMMANDS = ["terminal datadump"]
+
+# Các bộ disabled_algorithms thử lần lượt khi chưa có auth profile: workaround cũ cho
+# firmware SG (tắt rsa-sha2-*), rồi mặc định của paramiko cho thiết bị chỉ có rsa-sha2 host key
+ALGORITHM_CANDIDATES = [
+    {'pubkeys': ['rsa-sha2-256', 'rsa-sha2-512']},
+    {},
+]
+
+# Phương thức xác thực thử lần lượt trên cùng một transport khi chưa có auth profile
+AUTH_METHODS = ["password", "keyboard-interactive"]
+
 # --- Lớp xử lý kết nối và tương tác SSH ---
 class CiscoSSHClient:
-    def __init__(self, hostname, port, username, password, enable_password):
+    def __init__(self, hostname, port, username, password, enable_password, auth_profiles=None):
         self.hostname = hostname
         self.port = port
         self.username = username
         self.password = password
         self.enable_password = enable_password if enable_password else None
-        self.client = None
+        # Cache phương thức xác thực / thuật toán / host key theo host (common.authcache)
+        self.auth_profiles = auth_profiles
+        self.transport = None
         self.channel = None
-
-    def _read_channel_output(self, timeout=5):
-        """
-        Đọc toàn bộ dữ liệu output từ SSH channel trong một khoảng thời gian nhất định.
-        Args:
-            timeout (int): Thời gian tối đa (giây) để chờ và đọc dữ liệu từ channel
-            
-        Returns:
-            str: Toàn bộ output đã đọc được từ SSH channel, hoặc chuỗi rỗng nếu không có dữ liệu
-        """
-        output = ""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.channel and self.channel.recv_ready():
-                output += self.channel.recv(4096).decode('utf-8', errors='ignore')
-            else:
-                time.sleep(0.1)
-        return output
+        self.reader = None
+        self.login_duration = None
+        # Loại lỗi kết nối/login gần nhất, dùng cho circuit breaker (common.health)
+        self.last_error = None
 
     def _keyboard_interactive_handler(self, title, instructions, fields):
         """Xử lý các lời nhắc Keyboard-Interactive."""
@@ -86,299 +104,448 @@ class CiscoSSHClient:
                 responses.append("")
         return responses
 
-    def connect(self):
-        """Thiết lập kết nối SSH ban đầu, thử các phương thức xác thực."""
+    def _open_transport(self, disabled_algorithms, profile):
+        """TCP connect + key exchange; kiểm tra host key với key đã lưu trong profile (nếu có)."""
+        sock = socket.create_connection((self.hostname, self.port), timeout=deadline.clamp(15))
+        transport = paramiko.Transport(sock, disabled_algorithms=disabled_algorithms or None)
+        transport.banner_timeout = deadline.clamp(15)
+        transport.auth_timeout = deadline.clamp(15)
         try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-            connect_params = {
-                'hostname': self.hostname,
-                'port': self.port,
-                'username': self.username,
-                'timeout': 15,
-                'disabled_algorithms': {'pubkeys': ['rsa-sha2-256', 'rsa-sha2-512']}
-            }
+            transport.start_client(timeout=deadline.clamp(15))
+            key = transport.get_remote_server_key()
+            if profile and profile.get('host_key') and (
+                    key.get_name() != profile.get('host_key_type') or key.get_base64() != profile['host_key']):
+                raise paramiko.SSHException(
+                    f"Host key of {self.hostname} changed ({key.get_name()}); remove its entry from the auth profile cache if expected")
+        except Exception:
+            transport.close()
+            raise
+        return transport
+
+    def _authenticate(self, transport, methods):
+        """Thử lần lượt các phương thức trên cùng transport. Returns phương thức thành công hoặc None."""
+        for method in methods:
+            if method != methods[0]:
+                stats.retry()
+            try:
+                if method == "password":
+                    transport.auth_password(self.username, self.password, fallback=False)
+                else:
+                    transport.auth_interactive(self.username, self._keyboard_interactive_handler)
+            except paramiko.AuthenticationException as e:
+                print(f"{method} authentication failed for {self.hostname}: {e}", file=sys.stderr)
+                self.last_error = type(e).__name__
+                if not transport.is_active():
+                    return None
+                continue
+            if transport.is_authenticated():
+                return method
+        return None
 
+    def connect(self):
+        """
+        Thiết lập kết nối SSH (TCP + key exchange một lần) và xác thực.
+        Nếu có auth profile của host, phương thức và thuật toán đã thành công lần trước
+        được thử trước tiên; cấu hình thành công được lưu lại cho lần sau.
+        """
+        profile = self.auth_profiles.get(self.hostname, self.port) if self.auth_profiles else None
+        methods = list(AUTH_METHODS)
+        algorithm_sets = list(ALGORITHM_CANDIDATES)
+        if profile:
+            if profile.get('method') in methods:
+                methods.remove(profile['method'])
+                methods.insert(0, profile['method'])
+            cached_algorithms = profile.get('disabled_algorithms') or {}
+            algorithm_sets = [cached_algorithms] + [a for a in algorithm_sets if a != cached_algorithms]
+
+        for attempt, disabled_algorithms in enumerate(algorithm_sets):
+            if attempt:
+                stats.retry()
             try:
-                connect_params['password'] = self.password
-                self.client.connect(**connect_params)
-                print(f"SSH connected using password authentication to {self.hostname}.", file=sys.stderr)
-                return True
-            except paramiko.AuthenticationException:
-                print(f"Password authentication failed for {self.hostname}, trying keyboard-interactive...", file=sys.stderr)
-                del connect_params['password']
-                
-                try:
-                    self.client.connect(**connect_params, auth_interactive_shell=self._keyboard_interactive_handler)
-                    print(f"SSH connected using keyboard-interactive authentication to {self.hostname}.", file=sys.stderr)
-                    return True
-                except paramiko.AuthenticationException as e:
-                    print(f"Error: Keyboard-interactive authentication failed to {self.hostname}: {e}", file=sys.stderr)
-                    self.client = None
-                    return False
-            
-        except Exception as e:
-            print(f"Error: SSH initial connection failed to {self.hostname}: {e}", file=sys.stderr)
-            self.client = None
-            return False
+                with stats.phase("connect"):
+                    transport = self._open_transport(disabled_algorithms, profile)
+            except paramiko.ssh_exception.IncompatiblePeer as e:
+                # Không thương lượng được thuật toán với bộ này, thử bộ tiếp theo
+                self.last_error = type(e).__name__
+                continue
+            except Exception as e:
+                print(f"Error: SSH initial connection failed to {self.hostname}: {e}", file=sys.stderr)
+                self.last_error = type(e).__name__
+                return False
+
+            with stats.phase("auth"):
+                method = self._authenticate(transport, methods)
+            if method is None:
+                print(f"Error: Authentication failed to {self.hostname} (tried {', '.join(methods)})", file=sys.stderr)
+                transport.close()
+                return False
+
+            self.transport = transport
+            print(f"SSH connected using {method} authentication to {self.hostname}.", file=sys.stderr)
+            if self.auth_profiles:
+                key = transport.get_remote_server_key()
+                self.auth_profiles.update(self.hostname, self.port, method, disabled_algorithms,
+                                          key.get_name(), key.get_base64())
+            return True
+
+        print(f"Error: No compatible SSH algorithms with {self.hostname}", file=sys.stderr)
+        return False
+
+    def _invoke_shell(self):
+        """Mở channel shell có PTY trên transport (tương đương SSHClient.invoke_shell)."""
+        channel = self.transport.open_session(timeout=deadline.clamp(15))
+        channel.get_pty()
+        channel.invoke_shell()
+        return channel
 
     def interactive_login_and_enable(self):
         """Thực hiện login tương tác và vào chế độ enable (nếu cần)."""
-        if not self.client:
+        if not self.transport:
             return False
         try:
-            self.channel = self.client.invoke_shell()
-            time.sleep(1) # Chờ prompt ban đầu
-            output = self._read_channel_output()
-
-            if "Username:" in output or "login:" in output:
-                self.channel.send(self.username + "\n")
-                time.sleep(1)
-                output = self._read_channel_output()
-
-            if "Password:" in output:
-                self.channel.send(self.password + "\n")
-                time.sleep(1)
-                output = self._read_channel_output()
-
-            if not output.strip().endswith('#'):
-                self.channel.send("enable\n")
-                time.sleep(1)
-                output = self._read_channel_output()
-
-                if "Password:" in output and self.enable_password:
-                    self.channel.send(self.enable_password + "\n")
-                    time.sleep(1)
-                    output = self._read_channel_output()
-                elif "Password:" in output and not self.enable_password:
-                    print(f"Warning: Switch requires enable password but none provided for {self.hostname}.", file=sys.stderr)
-                    return False
-            
-            if output.strip().endswith('#'):
+            self.channel = self._invoke_shell()
+            login = LoginStateMachine(self.channel, self.username, self.password, self.enable_password)
+            success = login.run()
+            self.login_duration = login.duration
+
+            if success:
+                self.reader = login.reader
+                if not self.reader.setup_terminal(TERMINAL_SETUP_COMMANDS):
+                    print(f"Warning: Terminal setup did not complete on {self.hostname}, relying on --More-- handling.", file=sys.stderr)
                 return True
+            elif login.error == "enable password required but none provided":
+                print(f"Warning: Switch requires enable password but none provided for {self.hostname}.", file=sys.stderr)
             else:
-                print(f"Error: Could not enter privileged EXEC mode on {self.hostname}. Final output: {output}", file=sys.stderr)
-                return False
+                print(f"Error: Could not enter privileged EXEC mode on {self.hostname} ({login.error}). Final output: {login.output}", file=sys.stderr)
+            return False
 
         except Exception as e:
             print(f"Error: Interactive login/enable failed on {self.hostname}: {e}", file=sys.stderr)
             self.channel = None
             return False
 
-    def send_command(self, command, delay=2):
-        """Gửi lệnh và thu nhận kết quả thông qua kênh tương tác."""
-        if not self.channel:
+    def _clean_output(self, output, command):
+        """Bỏ dòng echo lệnh, dòng prompt và dòng trống khỏi output thô."""
+        output_lines = output.strip().splitlines()
+        clean_output = []
+        for line in output_lines:
+            if not line.strip().startswith(command.strip()) and \
+               not line.strip().endswith('#') and \
+               not line.strip() == '':
+                clean_output.append(line.strip())
+
+        return "\n".join(clean_output).strip()
+
+    def send_command(self, command, timeout=15):
+        """
+        Gửi lệnh và thu nhận kết quả thông qua kênh tương tác.
+        Trả về ngay khi prompt xuất hiện; timeout chỉ là giới hạn trên.
+        """
+        if not self.channel or not self.reader:
             print(f"Error: No channel available to execute command '{command}'.", file=sys.stderr)
             return None
         try:
-            self.channel.send(command + "\n")
-            time.sleep(delay)
-            output = ""
-            start_time = time.time()
-            while time.time() - start_time < 15:
-                if self.channel.recv_ready():
-                    output += self.channel.recv(4096).decode('utf-8', errors='ignore')
-                else:
-                    time.sleep(0.1)
-                
-                if output.strip().endswith('#'):
-                    break
-            
-            output_lines = output.strip().splitlines()
-            clean_output = []
-            for line in output_lines:
-                if not line.strip().startswith(command.strip()) and \
-                   not line.strip().endswith('#') and \
-                   not line.strip() == '':
-                    clean_output.append(line.strip())
-            
-            return "\n".join(clean_output).strip()
+            output, complete = self.reader.send_command(command, timeout)
+            if not complete:
+                print(f"Warning: Prompt not seen within {timeout}s for '{command}' on {self.hostname}, output may be truncated.", file=sys.stderr)
+
+            return self._clean_output(output, command)
+        except Exception as e:
+            print(f"Error: Failed to execute command '{command}' on {self.hostname}: {e}", file=sys.stderr)
+            return None
+
+    def send_commands(self, commands, timeout=15):
+        """
+        Gửi nhiều lệnh liên tiếp trong một round-trip.
+        Args:
+            commands (list): Danh sách lệnh
+            timeout (int): Giới hạn trên cho mỗi lệnh (cả nhóm: timeout * số lệnh)
+
+        Returns:
+            dict: lệnh -> output đã làm sạch (None nếu lệnh không chạy được)
+        """
+        if not self.channel or not self.reader:
+            print(f"Error: No channel available to execute commands {commands}.", file=sys.stderr)
+            return {command: None for command in commands}
+        try:
+            outputs, complete = self.reader.send_batch(commands, timeout * len(commands))
+            if not complete:
+                print(f"Warning: Not all prompts seen for {commands} on {self.hostname}, some outputs may be truncated.", file=sys.stderr)
+
+            results = {}
+            for command, output in zip(commands, outputs):
+                if output.strip() and not output.strip().startswith(command.strip()):
+                    print(f"Warning: Echo of '{command}' not found at start of its output on {self.hostname}.", file=sys.stderr)
+                results[command] = self._clean_output(output, command)
+            return results
+        except Exception as e:
+            print(f"Error: Failed to execute commands {commands} on {self.hostname}: {e}", file=sys.stderr)
+            return {command: None for command in commands}
+
+    def send_command_streaming(self, command, extractor, timeout=20):
+        """
+        Chạy lệnh có output lớn qua streaming extractor (common.stream).
+
+        Returns:
+            str: Phần text extractor giữ lại (đủ để parse), hoặc None nếu không lấy được
+        """
+        if not self.channel or not self.reader:
+            print(f"Error: No channel available to execute command '{command}'.", file=sys.stderr)
+            return None
+        try:
+            if self.reader.stream_command(command, extractor, timeout):
+                return extractor.text
+            print(f"Warning: Required fields not found in '{command}' output on {self.hostname} ({extractor.chars_seen} chars read).", file=sys.stderr)
+            return None
         except Exception as e:
             print(f"Error: Failed to execute command '{command}' on {self.hostname}: {e}", file=sys.stderr)
             return None
 
+    def is_alive(self):
+        """Kiểm tra session SSH (transport và channel) còn dùng được và đang đồng bộ với prompt."""
+        if not self.transport or not self.channel or self.channel.closed:
+            return False
+        if self.reader and not self.reader.in_sync:
+            return False
+        return self.transport.is_active()
+
     def close(self):
         """Đóng kết nối SSH."""
-        if self.client:
-            self.client.close()
+        if self.transport:
+            self.transport.close()
 
 # --- Hàm thu thập metrics và format cho Telegraf ---
 
-def get_cpu_stats(ssh_client, host):
-    """Thu thập CPU metrics từ lệnh 'show cpu'."""
-    output = ssh_client.send_command("show cpu")
+CPU_TEMPLATE = Template(
+    DRIVER_NAME, "show cpu",
+    r"CPU utilization for five seconds: {five_sec:int}%; one minute: {one_min:int}%; five minutes: {five_min:int}%;"
+)
+
+def parse_cpu_stats(output, host, timestamp=None):
+    """Parse output của 'show cpu' thành CPU metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
 
     if output:
-        cpu_pattern = r"CPU utilization for five seconds: (\d+)%; one minute: (\d+)%; five minutes: (\d+)%;"
-        cpu_match = re.search(cpu_pattern, output)
-        
-        if cpu_match:
-            five_sec_cpu = int(cpu_match.group(1))
-            one_min_cpu = int(cpu_match.group(2))
-            five_min_cpu = int(cpu_match.group(3))
-            
-            metrics.append(
-                f"cisco_cpu,host={host} "
-                f"five_sec={five_sec_cpu}i,one_min={one_min_cpu}i,five_min={five_min_cpu}i {timestamp}"
-            )
+        cpu = CPU_TEMPLATE.parse_one(output)
+
+        if cpu:
+            metrics.append(encode("cisco_cpu", {'host': host}, cpu, timestamp))
         else:
             print(f"Warning: 'show cpu' output not parsed as expected for {host}. Raw output:\n{output}", file=sys.stderr)
     return metrics
 
-def get_memory_stats(ssh_client, host):
-    """Thu thập Memory (RAM) metrics từ 'show tech-support memory'."""
-    raw_output = ssh_client.send_command("show tech-support memory", delay=5)
+def get_cpu_stats(ssh_client, host, timestamp=None):
+    """Thu thập CPU metrics từ lệnh 'show cpu'."""
+    return parse_cpu_stats(ssh_client.send_command("show cpu"), host, timestamp)
+
+# Local RAM usage trong 'show tech-support memory': dòng Total đầu tiên sau tiêu đề mục
+LOCAL_RAM_ANCHOR = "Dynamic (OS managed) RAM usage:"
+MEMORY_TEMPLATE = Template(
+    DRIVER_NAME, "show tech-support memory",
+    r"Total = {total:int}, Free = {free:int}, Used = {used:int}, Usage = {usage:int}%",
+    start=LOCAL_RAM_ANCHOR,
+)
+
+def parse_memory_stats(raw_output, host, timestamp=None):
+    """Parse output của 'show tech-support memory' thành Memory (RAM) metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
 
     if raw_output:
-        # Regex cho Local RAM usage, tương tự làm linh hoạt hơn
-        local_ram_pattern = r"Dynamic \(OS managed\) RAM usage:(?:.|\n)*?Total = (\d+), Free = (\d+), Used = (\d+), Usage = (\d+)%"
-        local_match = re.search(local_ram_pattern, raw_output)
-
-        if local_match:
-            total_local = int(local_match.group(1))
-            free_local = int(local_match.group(2))
-            used_local = int(local_match.group(3))
-            usage_local = int(local_match.group(4))
-            metrics.append(
-                f"memory,agent_host={host} "
-                f"total={total_local}i,free={free_local}i,used={used_local}i,usage={usage_local}i {timestamp}"
-            )
+        local_ram = MEMORY_TEMPLATE.parse_one(raw_output)
+
+        if local_ram:
+            metrics.append(encode("memory", {'agent_host': host}, local_ram, timestamp))
         else:
             print(f"Warning: Local RAM data not found in 'show tech-support memory' output for {host}.", file=sys.stderr)
 
     return metrics
 
-def get_interface_stats(ssh_client, host):
+def get_memory_stats(ssh_client, host, timestamp=None):
     """
-    Thu thập Interface stats.
-    Regex bên dưới là ví dụ, cần kiểm tra output thực tế của bạn.
+    Thu thập Memory (RAM) metrics từ 'show tech-support memory'.
+    Output được parse theo dạng streaming và bị ngắt ngay khi có dòng Total,
+    không đọc hết bản dump.
     """
-    output = ssh_client.send_command("show interface status")
+    extractor = RegexStreamExtractor(MEMORY_TEMPLATE.regex, anchor=LOCAL_RAM_ANCHOR)
+    return parse_memory_stats(ssh_client.send_command_streaming("show tech-support memory", extractor, timeout=20), host, timestamp)
+
+# Một dòng mỗi cổng: tên, trạng thái, protocol, hai cột bỏ qua, VLAN.
+# Mẫu là ví dụ, cần kiểm tra output thực tế của bạn.
+INTERFACE_TEMPLATE = Template(
+    DRIVER_NAME, "show interface status",
+    r"^[ \t]*{interface:word}[ \t]+{status:connected|notconnect|disabled}[ \t]+{protocol:word}"
+    r"[ \t]+{_:word}[ \t]+{_:word}[ \t]+{vlan:word}",
+    each=True,
+)
+
+def parse_interface_stats(output, host, timestamp=None):
+    """Parse output của 'show interface status' thành Interface stats."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
-
-    if output:
-        interface_pattern = r"(\S+)\s+(connected|notconnect|disabled)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)"
-        
-        for line in output.splitlines():
-            match = re.search(interface_pattern, line.strip())
-            if match:
-                interface_name = match.group(1)
-                status_str = match.group(2)
-                protocol_str = match.group(3) 
-                
-                status = 1 if status_str == 'connected' else 0
-                
-                protocol = 1 if 'up' in protocol_str.lower() else 0
-
-                vlan = match.group(6) 
-
-                metrics.append(
-                    f"cisco_interface,host={host},interface={interface_name} "
-                    f"status={status}i,protocol={protocol}i,vlan=\"{vlan}\" {timestamp}"
-                )
+    series = SeriesEncoder("cisco_interface", host=host)
+    if timestamp is None:
+        timestamp = now_ns()
+
+    for port in INTERFACE_TEMPLATE.records(output):
+        status = 1 if port['status'] == 'connected' else 0
+        protocol = 1 if 'up' in port['protocol'].lower() else 0
+        metrics.append(series.encode(
+            {'status': status, 'protocol': protocol, 'vlan': port['vlan']}, timestamp, interface=port['interface']
+        ))
     return metrics
 
-def get_inventory_stats(ssh_client, host):
-    """Thu thập Inventory stats từ 'show inventory'."""
-    output = ssh_client.send_command("show inventory")
+def get_interface_stats(ssh_client, host, timestamp=None):
+    """Thu thập Interface stats từ 'show interface status' (mẫu là ví dụ, xem INTERFACE_TEMPLATE)."""
+    return parse_interface_stats(ssh_client.send_command("show interface status"), host, timestamp)
+
+# Mỗi thành phần trong 'show inventory' gồm hai dòng:
+#   NAME: "1"  DESCR: "SG350-28P 28-Port Gigabit PoE Managed Switch"
+#   PID: SG350-28P-K9      VID: V01  SN: DNI1234567
+INVENTORY_TEMPLATE = Template(
+    DRIVER_NAME, "show inventory",
+    r'NAME:\s*{name:quoted}\s*,?\s*DESCR:\s*{descr:quoted}\s*'
+    r'PID:\s*{pid:word}\s*,?\s*VID:\s*{vid:word}\s*,?\s*SN:\s*{serial:word}',
+    each=True,
+)
+
+def parse_inventory_stats(output, host, timestamp=None):
+    """Parse output của 'show inventory' thành Inventory stats, một point cho mỗi thành phần."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
-    
+    series = SeriesEncoder("cisco_inventory", host=host)
+    if timestamp is None:
+        timestamp = now_ns()
+
     if output:
-        metrics.append(
-            f"cisco_inventory, host={host}, output=\"{output}\""
-        )
+        for component in INVENTORY_TEMPLATE.records(output):
+            name = component.pop('name')
+            metrics.append(series.encode(component, timestamp, name=name))
+        if not metrics:
+            print(f"Warning: 'show inventory' output not parsed as expected for {host}.", file=sys.stderr)
     return metrics
 
-def collect_metrics_from_device(device_config):
-    """Collect metrics from a single device."""
+def get_inventory_stats(ssh_client, host, timestamp=None):
+    """Thu thập Inventory stats từ 'show inventory'."""
+    return parse_inventory_stats(ssh_client.send_command("show inventory"), host, timestamp)
+
+def open_session(device_config):
+    """
+    Kết nối, login và vào chế độ enable trên một thiết bị.
+
+    Returns:
+        tuple: (CiscoSSHClient đã sẵn sàng hoặc None, metrics của bước login)
+    """
     host = device_config['hostname']
-    print(f"Starting metrics collection for {host}", file=sys.stderr)
-    
+    stats.set_vendor(DRIVER_NAME)
     ssh_client = CiscoSSHClient(
         hostname=device_config['hostname'],
         port=device_config['port'],
         username=device_config['username'],
         password=device_config['password'],
-        enable_password=device_config['enable_password']
+        enable_password=device_config['enable_password'],
+        auth_profiles=authcache.default_cache()
     )
 
-    device_metrics = []
-    
-    if ssh_client.connect() and ssh_client.interactive_login_and_enable():
-        print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
-        
-        # cpu_metrics = get_cpu_stats(ssh_client, host)
-        # if cpu_metrics:
-        #     device_metrics.extend(cpu_metrics)
-        # else:
-        #     print(f"No CPU metrics collected from {host}.", file=sys.stderr)
-
-        # inventory_devices = get_inventory_stats(ssh_client, host)
-        # if inventory_devices:
-        #     device_metrics.extend(inventory_devices)
-        # else:
-        #     print(f"No Inventory metrics collected from {host}.", file=sys.stderr)
-
-        memory_metrics = get_memory_stats(ssh_client, host)
-        if memory_metrics:
-            device_metrics.extend(memory_metrics)
-        else:
-            print(f"No Memory metrics collected from {host}.", file=sys.stderr)
+    login_metrics = []
+    logged_in = ssh_client.connect() and ssh_client.interactive_login_and_enable()
+    if ssh_client.login_duration is not None:
+        login_metrics.append(format_login_metric(host, DRIVER_NAME, logged_in, ssh_client.login_duration))
+        stats.add_metrics(login_metrics)
+
+    if not logged_in:
+        print(f"Failed to establish SSH connection or login/enable for {host}. Check credentials and switch configuration.", file=sys.stderr)
+        mark_failure(ssh_client.last_error or "LoginFailed")
+        ssh_client.close()
+        return None, login_metrics
+
+    print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
+    return ssh_client, login_metrics
+
+def replay_session(channel):
+    """Client trên channel phát lại (common.capture.ReplayChannel), dùng bởi benchmarks/bench_replay.py."""
+    ssh_client = CiscoSSHClient("replay", 22, None, None, None)
+    ssh_client.channel = channel
+    ssh_client.reader = PromptReader(channel)
+    if channel.prompt:
+        ssh_client.reader.learn_prompt(channel.prompt)
+    return ssh_client
+
+# Các nhóm metrics đang bật và chu kỳ mặc định (giây, đổi bằng COLLECTOR_INTERVAL_<NHÓM>).
+# Mỗi lần chạy chỉ gửi lệnh của nhóm đến hạn; lệnh của các nhóm đến hạn được gộp
+# trong cùng một round-trip. Bỏ comment để bật thêm.
+METRIC_GROUPS = [
+    # MetricGroup("cpu", 30, command="show cpu", parse=parse_cpu_stats, label="CPU"),
+    # MetricGroup("interfaces", 60, command="show interface status", parse=parse_interface_stats, label="Interface"),
+    # Hardware inventory gần như không đổi: chạy mỗi ngày, giữa các lần lấy từ cache trên đĩa
+    # MetricGroup("inventory", 86400, command="show inventory", parse=parse_inventory_stats, cache=True, label="Inventory"),
+    # 'show tech-support memory' rất dài nên không gộp batch: đọc streaming và ngắt sớm
+    MetricGroup("memory", 60, collect=get_memory_stats, label="Memory"),
+]
+
+SCHEDULER = Scheduler(DRIVER_NAME, METRIC_GROUPS)
+
+def collect_metrics_from_session(ssh_client, host):
+    """Thu thập metrics của các nhóm đến hạn trên một session đã login."""
+    return SCHEDULER.collect(ssh_client, host)
 
-        # interface_metrics = get_interface_stats(ssh_client, host)
-        # if interface_metrics:
-        #     device_metrics.extend(interface_metrics)
-        # else:
-        #     print(f"No Interface metrics collected from {host}.", file=sys.stderr)
+def collect_metrics_from_device(device_config):
+    """Collect metrics from a single device."""
+    host = device_config['hostname']
+    if not SCHEDULER.due_groups(host):
+        print(f"No metric groups due for {host}, skipping connection", file=sys.stderr)
+        return SCHEDULER.collect(None, host)
 
+    print(f"Starting metrics collection for {host}", file=sys.stderr)
+
+    ssh_client, device_metrics = open_session(device_config)
+    if ssh_client:
+        device_metrics.extend(collect_metrics_from_session(ssh_client, host))
         ssh_client.close()
         print(f"Completed metrics collection for {host}", file=sys.stderr)
-    else:
-        print(f"Failed to establish SSH connection or login/enable for {host}. Check credentials and switch configuration.", file=sys.stderr)
-    
+
     return device_metrics
 
 # --- Main execution ---
 if __name__ == "__main__":
-    # Load all device configurations
-    devices = load_device_configs()
+    parser = argparse.ArgumentParser(description="Collect Cisco SG switch metrics for Telegraf")
+    parser.add_argument("--execd", action="store_true",
+                        help="Run as a resident Telegraf execd process (poll on each stdin line, keep sessions open)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile runs with cProfile/tracemalloc (same as COLLECTOR_PROFILE=1, see common/profiling.py)")
+    parser.add_argument("--inventory", default=os.getenv('COLLECTOR_INVENTORY'),
+                        help=f"Device inventory file (YAML/CSV) instead of numbered env vars; only {DRIVER_NAME} entries are used")
+    args = parser.parse_args()
+
+    # Load all device configurations (inventory file nếu có, ngược lại từ biến môi trường)
+    inventory = Inventory(args.inventory) if args.inventory else None
+    devices = inventory.select(vendor=DRIVER_NAME) if inventory else load_device_configs()
     
     if not devices:
         print("No valid device configurations found in .env file.", file=sys.stderr)
         sys.exit(1)
     
+    # Sharding: nhiều instance chia nhau fleet, instance này chỉ poll phần của nó
+    # (COLLECTOR_SHARD_INDEX/COLLECTOR_SHARD_COUNT hoặc COLLECTOR_SHARD_RING)
+    shard = shard_from_env()
+    if shard is not None:
+        total = len(devices)
+        devices = shard.select(devices)
+        print(f"Sharding ({shard}): {len(devices)} of {total} device(s) assigned to this instance", file=sys.stderr)
+
     print(f"Found {len(devices)} device(s) to monitor", file=sys.stderr)
-    
-    all_metrics = []
-    
-    # Option 1: Sequential processing (safer for network devices)
-    # for device_config in devices:
-    #     device_metrics = collect_metrics_from_device(device_config)
-    #     all_metrics.extend(device_metrics)
-    
-    # Option 2: Parallel processing (faster but may overwhelm devices)
-    LIMIT_WORKERS = 3
-    max_workers = min(len(devices), LIMIT_WORKERS)  # Limit concurrent connections
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_device = {executor.submit(collect_metrics_from_device, device): device for device in devices}
-        
-        for future in as_completed(future_to_device):
-            device = future_to_device[future]
-            try:
-                device_metrics = future.result()
-                all_metrics.extend(device_metrics)
-            except Exception as exc:
-                print(f"Device {device['hostname']} generated an exception: {exc}", file=sys.stderr)
-    
-    # Output all collected metrics
-    for metric_line in all_metrics:
-        print(metric_line)
-    
-    print(f"Total metrics collected: {len(all_metrics)}", file=sys.stderr)
\ No newline at end of file
+
+    # Circuit breaker: thiết bị lỗi liên tiếp bị bỏ qua theo backoff (COLLECTOR_BREAKER=0 để tắt)
+    health = HealthStore.from_env()
+    # Profiling: --profile hoặc COLLECTOR_PROFILE=1, báo cáo trong COLLECTOR_PROFILE_DIR
+    profiler = Profiler.from_env(args.profile)
+
+    if args.execd:
+        reload = inventory.reloader(vendor=DRIVER_NAME, shard=shard) if inventory else None
+        run_execd(devices, open_session, collect_metrics_from_session, reload=reload, health=health, profiler=profiler)
+        sys.exit(0)
+
+    # Thu thập song song trên event loop asyncio, giới hạn bởi COLLECTOR_CONCURRENCY;
+    # metrics của mỗi thiết bị được ghi ra stdout ngay khi thiết bị đó hoàn tất
+    writer = create_writer()
+    run_collection(devices, collect_metrics_from_device, writer, health=health, profiler=profiler)
+    writer.close()
+
+    print(f"Total metrics collected: {writer.count}", file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Collector hợp nhất cho mọi dòng thiết bị.
+
+Thay vì chạy mỗi script vendor (cisco-sg, cisco-business-220series, hillstone) như
+một [[inputs.exec]] riêng, collector nạp tất cả driver trong common.drivers và thu
+thập toàn bộ fleet trên cùng một engine asyncio: một lần khởi động interpreter,
+một worker pool (COLLECTOR_CONCURRENCY) chia đều cho mọi vendor.
+
+Thiết bị được đọc từ file inventory (--inventory / COLLECTOR_INVENTORY, xem
+common/inventory.py), hoặc nếu không có inventory thì từ file .env của từng driver
+(cisco-sg/.env, ...). Cấu hình chung (COLLECTOR_*) đọc từ exec-scripts/.env.
+
+    python3 collector.py                       # tất cả driver, một lần chạy
+    python3 collector.py --drivers cisco_sg,hillstone
+    python3 collector.py --inventory devices.yaml --site hq
+    python3 collector.py --execd               # Telegraf execd, giữ session giữa các chu kỳ
+"""
+import argparse
+import os
+import sys
+from dotenv import dotenv_values, load_dotenv
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(script_dir, '.env'))
+
+sys.path.insert(0, script_dir)
+from common.drivers import DRIVERS, load_drivers
+from common.engine import run_collection
+from common.execd import run_execd
+from common.health import HealthStore
+from common.profiling import Profiler
+from common.inventory import Inventory
+from common.output import create_writer
+from common.shard import shard_from_env
+
+
+def load_fleet(drivers):
+    """
+    Load thiết bị của mọi driver, mỗi device_config được gắn thêm key 'driver'.
+    Mỗi driver đọc từ file .env riêng (không qua os.environ) để các driver dùng
+    chung tiền tố biến (CISCO_HOST_1, ...) không ghi đè lẫn nhau.
+    """
+    devices = []
+    for name, driver in drivers.items():
+        if not os.path.exists(driver.env_path):
+            print(f"Warning: No .env for driver '{name}' at {driver.env_path}, no devices loaded", file=sys.stderr)
+            continue
+        for device_config in driver.load_device_configs(dotenv_values(driver.env_path)):
+            device_config['driver'] = name
+            devices.append(device_config)
+    return devices
+
+
+def select_fleet(inventory, names=None, site=None, tag=None, shard=None):
+    """Thiết bị trong inventory khớp site/tag (và thuộc `shard`), giới hạn ở các driver `names` nếu có."""
+    devices = inventory.select(site=site, tag=tag, shard=shard)
+    if names:
+        devices = [device_config for device_config in devices if device_config['driver'] in names]
+    return devices
+
+
+class FleetDispatcher:
+    """Chuyển open_session / collect tới driver của từng thiết bị."""
+
+    def __init__(self, drivers):
+        self.drivers = drivers
+        self.driver_by_host = {}
+
+    def update(self, devices):
+        """
+        Nạp driver còn thiếu cho danh sách thiết bị mới và bỏ thiết bị không có driver dùng được.
+
+        Returns:
+            list: Các thiết bị sẽ được thu thập
+        """
+        missing = sorted({device_config['driver'] for device_config in devices} - set(self.drivers))
+        if missing:
+            self.drivers.update(load_drivers(missing))
+        usable = [device_config for device_config in devices if device_config['driver'] in self.drivers]
+        if len(usable) != len(devices):
+            print(f"Warning: {len(devices) - len(usable)} device(s) skipped, driver not available", file=sys.stderr)
+        self.driver_by_host = {
+            device_config['hostname']: self.drivers[device_config['driver']] for device_config in usable
+        }
+        return usable
+
+    def collect_metrics_from_device(self, device_config):
+        return self.drivers[device_config['driver']].collect_metrics_from_device(device_config)
+
+    def open_session(self, device_config):
+        return self.drivers[device_config['driver']].open_session(device_config)
+
+    def collect_metrics_from_session(self, session, host):
+        return self.driver_by_host[host].collect_metrics_from_session(session, host)
+
+
+# --- Main execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect metrics from every supported device family for Telegraf")
+    parser.add_argument("--drivers", default=os.getenv('COLLECTOR_DRIVERS', ''),
+                        help=f"Comma-separated drivers to load (default: all of {', '.join(DRIVERS)})")
+    parser.add_argument("--inventory", default=os.getenv('COLLECTOR_INVENTORY'),
+                        help="Device inventory file (YAML/CSV); reloaded on change in --execd mode")
+    parser.add_argument("--site", help="Only collect devices of this inventory site")
+    parser.add_argument("--tag", help="Only collect devices with this inventory tag")
+    parser.add_argument("--execd", action="store_true",
+                        help="Run as a resident Telegraf execd process (poll on each stdin line, keep sessions open)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile runs with cProfile/tracemalloc (same as COLLECTOR_PROFILE=1, see common/profiling.py)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.drivers.split(",") if name.strip()]
+    # Sharding: chỉ giữ phần fleet của instance này, trước khi load driver
+    shard = shard_from_env()
+    inventory = None
+    if args.inventory:
+        inventory = Inventory(args.inventory)
+        dispatcher = FleetDispatcher({})
+        fleet = select_fleet(inventory, names, args.site, args.tag)
+    else:
+        drivers = load_drivers(names)
+        dispatcher = FleetDispatcher(drivers)
+        fleet = load_fleet(drivers)
+
+    if not fleet:
+        print("No valid device configurations found for any driver.", file=sys.stderr)
+        sys.exit(1)
+
+    if shard is not None:
+        assigned = shard.select(fleet)
+        print(f"Sharding ({shard}): {len(assigned)} of {len(fleet)} device(s) assigned to this instance", file=sys.stderr)
+        fleet = assigned
+    devices = dispatcher.update(fleet)
+
+    print(f"Found {len(devices)} device(s) across {len(dispatcher.drivers)} driver(s)", file=sys.stderr)
+
+    health = HealthStore.from_env()
+    # Profiling: --profile hoặc COLLECTOR_PROFILE=1, báo cáo trong COLLECTOR_PROFILE_DIR
+    profiler = Profiler.from_env(args.profile)
+
+    if args.execd:
+        reload = None
+        if inventory is not None:
+            def reload():
+                if not inventory.reload_if_changed():
+                    return None
+                return dispatcher.update(select_fleet(inventory, names, args.site, args.tag, shard))
+        run_execd(devices, dispatcher.open_session, dispatcher.collect_metrics_from_session, reload=reload,
+                  health=health, profiler=profiler)
+        sys.exit(0)
+
+    writer = create_writer()
+    run_collection(devices, dispatcher.collect_metrics_from_device, writer, health=health, profiler=profiler)
+    writer.close()
+
+    print(f"Total metrics collected: {writer.count}", file=sys.stderr)
@@ -0,0 +1 @@
+"""Các thành phần dùng chung cho những collector SSH trong exec-scripts."""
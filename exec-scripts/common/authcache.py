@@ -0,0 +1,83 @@
+"""
+Cache bền vững "auth profile" theo host: phương thức xác thực đã thành công,
+bộ disabled_algorithms đã dùng được và host key của thiết bị.
+
+Lần connect sau thử ngay cấu hình đã thành công thay vì lần lượt password rồi
+keyboard-interactive (mỗi lần thử sai tốn một lượt trao đổi xác thực đầy đủ).
+Host key được ghi lại lần đầu (trust on first use); nếu về sau thiết bị trình ra
+key khác, kết nối bị từ chối cho đến khi xoá entry của host khỏi auth_profiles.json.
+
+File nằm trong thư mục trạng thái (common/state.py); COLLECTOR_AUTH_CACHE=0 để tắt.
+"""
+import os
+import sys
+import threading
+import time
+
+from common.state import load_json, state_path, update_json
+
+AUTH_CACHE_FILE = "auth_profiles.json"
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def _key(host, port):
+    return f"{host}:{port}"
+
+
+class AuthProfileCache:
+    """
+    Auth profile của các host, đọc/ghi ở `path`.
+    Args:
+        path (str): File JSON lưu profile
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.profiles = load_json(path, {}) or {}
+        self._lock = threading.Lock()
+
+    def get(self, host, port):
+        """Profile đã lưu của host:port (dict: method, disabled_algorithms, host_key_type, host_key) hoặc None."""
+        with self._lock:
+            profile = self.profiles.get(_key(host, port))
+            return dict(profile) if profile else None
+
+    def update(self, host, port, method, disabled_algorithms, host_key_type, host_key):
+        """Lưu profile vừa kết nối thành công; chỉ ghi file khi profile thực sự thay đổi."""
+        profile = {
+            'method': method,
+            'disabled_algorithms': disabled_algorithms or {},
+            'host_key_type': host_key_type,
+            'host_key': host_key,
+        }
+        key = _key(host, port)
+        with self._lock:
+            previous = self.profiles.get(key)
+            if previous and all(previous.get(field) == value for field, value in profile.items()):
+                return
+            profile['updated'] = int(time.time())
+            self.profiles[key] = profile
+            try:
+                update_json(self.path, {key: profile})
+            except OSError as e:
+                print(f"Warning: Cannot save auth profile to {self.path}: {e}", file=sys.stderr)
+
+    def forget(self, host, port):
+        """Xoá profile của host:port (ví dụ sau khi thay thiết bị)."""
+        key = _key(host, port)
+        with self._lock:
+            if self.profiles.pop(key, None) is not None:
+                update_json(self.path, {key: None})
+
+
+def default_cache():
+    """AuthProfileCache dùng chung trong process (tạo khi gọi lần đầu), hoặc None nếu COLLECTOR_AUTH_CACHE=0."""
+    global _default_cache
+    if os.getenv('COLLECTOR_AUTH_CACHE', '1').lower() in ('0', 'false', 'no', 'off'):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AuthProfileCache(state_path(AUTH_CACHE_FILE))
+        return _default_cache
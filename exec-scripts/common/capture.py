@@ -0,0 +1,271 @@
+"""
+Chế độ capture: ghi output thô của từng lệnh vào một corpus trên đĩa, và phát lại
+corpus đó qua client SSH và parser của driver mà không cần SSH (benchmarks/bench_replay.py).
+
+Bật bằng COLLECTOR_CAPTURE_DIR=<thư mục corpus>. Mỗi output là đúng những gì đọc
+được từ channel cho một lệnh, trước khi client làm sạch: echo lệnh, prompt phân
+trang và ký tự xoá dòng, prompt cuối; với lệnh streaming là phần dump đã đọc (đủ
+hoặc bị ngắt bằng Ctrl-C) cùng phần đọc bỏ tới prompt. PromptReader (common/channel.py)
+và client pexpect của CBS220 gọi record(lệnh, output); lệnh khởi tạo phiên (tắt
+phân trang) không được ghi. Mỗi output là một file nén gzip:
+
+    <corpus>/<driver>/<host>/<lệnh>/<timestamp ns>.txt.gz
+
+(lệnh và host với ký tự không an toàn cho tên file thay bằng "_", ví dụ
+show_cpu). Thiết bị đang thu thập lấy từ DeviceStats mà engine gắn vào thread
+(common.stats); ngoài thread do engine quản lý record() không làm gì. Chỉ
+COLLECTOR_CAPTURE_KEEP output gần nhất của mỗi thiết bị và lệnh được giữ lại
+(mặc định 50). Corpus chứa output thật của thiết bị: đặt ở thư mục chỉ collector đọc được.
+
+Phát lại: Corpus đọc corpus, ReplayChannel thay cho channel paramiko và trả về
+output đã ghi khi client gửi lệnh; ReplaySpawn bọc nó thay cho pexpect.spawn. Hàm
+replay_session(channel) của driver dựng client của vendor trên channel đó, nên
+việc làm sạch output, phân trang, batch và ngắt sớm lệnh streaming chạy như khi
+thu thập thật.
+"""
+import gzip
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+
+from common import stats
+from common.state import safe_filename
+
+DEFAULT_KEEP = 50
+SUFFIX = ".txt.gz"
+# Kích thước tối đa mỗi lần recv() khi phát lại, gần với một lần đọc từ channel thật
+REPLAY_CHUNK = 4096
+
+
+def capture_dir():
+    """Thư mục corpus, None nếu không bật capture."""
+    return os.getenv('COLLECTOR_CAPTURE_DIR') or None
+
+
+def capture_keep():
+    try:
+        return max(1, int(os.getenv('COLLECTOR_CAPTURE_KEEP', DEFAULT_KEEP)))
+    except ValueError:
+        print(f"Warning: Invalid COLLECTOR_CAPTURE_KEEP, using default {DEFAULT_KEEP}", file=sys.stderr)
+        return DEFAULT_KEEP
+
+
+def active():
+    """True nếu capture đang bật cho thiết bị đang thu thập trên thread hiện tại."""
+    return capture_dir() is not None and stats.current() is not None
+
+
+def slug(name):
+    """Tên thư mục của một lệnh hoặc host: dấu cách và ký tự không an toàn thành "_"."""
+    return safe_filename(name.strip())
+
+
+def record(command, output):
+    """
+    Ghi output của `command` cho thiết bị đang thu thập (nếu bật capture).
+    Lỗi khi ghi chỉ được cảnh báo, không làm hỏng lần thu thập.
+    """
+    directory = capture_dir()
+    device = stats.current()
+    if directory is None or device is None or output is None:
+        return
+    path = os.path.join(directory, slug(device.vendor or "unknown"), slug(device.host), slug(command))
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(output.encode('utf-8'), mtime=0))
+            os.replace(tmp_path, os.path.join(path, f"{time.time_ns()}{SUFFIX}"))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        _rotate(path, capture_keep())
+    except OSError as e:
+        print(f"Warning: Cannot capture output of '{command}' to {directory}: {e}", file=sys.stderr)
+
+
+def _rotate(path, keep):
+    """Xoá output cũ, chỉ giữ `keep` file gần nhất (tên file là timestamp)."""
+    for name in _captures(path)[:-keep]:
+        try:
+            os.unlink(os.path.join(path, name))
+        except OSError:
+            pass
+
+
+def _captures(path):
+    """Tên các file output trong thư mục của một lệnh, cũ nhất trước."""
+    try:
+        names = [name for name in os.listdir(path) if name.endswith(SUFFIX) and not name.startswith(".")]
+    except OSError:
+        return []
+    return sorted(names, key=lambda name: int(name[:-len(SUFFIX)]) if name[:-len(SUFFIX)].isdigit() else 0)
+
+
+def _subdirs(path):
+    try:
+        return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+    except OSError:
+        return []
+
+
+def read_output(path):
+    """Nội dung một file output trong corpus."""
+    with gzip.open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+class Corpus:
+    """
+    Corpus output đã ghi, theo cấu trúc trong docstring của module.
+    Args:
+        directory (str): Thư mục corpus (COLLECTOR_CAPTURE_DIR lúc ghi)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def drivers(self):
+        return _subdirs(self.directory)
+
+    def hosts(self, driver):
+        return _subdirs(os.path.join(self.directory, driver))
+
+    def files(self, driver, host):
+        """dict tên thư mục lệnh -> đường dẫn các file output, cũ nhất trước."""
+        base = os.path.join(self.directory, driver, host)
+        files = {}
+        for command in _subdirs(base):
+            names = _captures(os.path.join(base, command))
+            if names:
+                files[command] = [os.path.join(base, command, name) for name in names]
+        return files
+
+    def load(self, driver, host):
+        """dict tên thư mục lệnh -> nội dung các output của thiết bị, cũ nhất trước."""
+        return {command: [read_output(path) for path in paths]
+                for command, paths in self.files(driver, host).items()}
+
+
+class ReplayChannel:
+    """
+    Thay cho channel SSH: mỗi lệnh gửi tới trả về output thô đã ghi của nó. Lần phát
+    lại thứ `run` dùng output thứ `run` của mỗi lệnh (quay vòng nếu lệnh có ít output
+    hơn). Phím cách (phân trang) và Ctrl-C bị bỏ qua vì phần thiết bị in ra sau đó đã
+    nằm trong output ghi lại. Khi hết dữ liệu recv() báo timeout ngay. Lệnh không có
+    trong corpus được ghi vào `missing` và không trả về gì, như thiết bị không trả lời.
+    Args:
+        outputs (dict): Tên thư mục lệnh -> danh sách output (Corpus.load)
+        run (int): Thứ tự lần phát lại
+    """
+
+    def __init__(self, outputs, run=0):
+        self.outputs = outputs
+        self.run = run
+        self.missing = []
+        self.closed = False
+        self._pending = bytearray()
+
+    @property
+    def prompt(self):
+        """Prompt của thiết bị, lấy từ dòng cuối của một output đã ghi; None nếu không có."""
+        # common.channel import module này: import ở đây để tránh vòng import
+        from common.channel import PROMPT_LINE_PATTERN
+        for texts in self.outputs.values():
+            for text in texts:
+                lines = text.strip().splitlines()
+                if lines and PROMPT_LINE_PATTERN.fullmatch(lines[-1].strip()):
+                    return lines[-1].strip()
+        return None
+
+    def _output(self, command):
+        outputs = self.outputs.get(slug(command))
+        if not outputs:
+            self.missing.append(command)
+            return ""
+        return outputs[self.run % len(outputs)]
+
+    def send(self, data):
+        if not data.endswith("\n"):
+            return len(data)
+        # Mỗi output ghi lại là trọn một lệnh: phần chưa đọc của lệnh trước bị bỏ
+        self._pending.clear()
+        for command in data.split("\n")[:-1]:
+            self._pending += self._output(command).encode('utf-8')
+        return len(data)
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self, size):
+        if not self._pending:
+            raise socket.timeout()
+        chunk = bytes(self._pending[:min(size, REPLAY_CHUNK)])
+        del self._pending[:len(chunk)]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class ReplaySpawn:
+    """
+    Thay cho pexpect.spawn (client CBS220) trên một ReplayChannel: expect() tìm pattern
+    khớp sớm nhất trong dữ liệu đã ghi; không khớp thì trả về vị trí của `timeout`
+    (pexpect.TIMEOUT) trong danh sách pattern, như pexpect khi hết giờ.
+    Args:
+        channel (ReplayChannel): Channel phát lại
+        timeout: Đối tượng đánh dấu timeout trong danh sách pattern (pexpect.TIMEOUT)
+    """
+
+    def __init__(self, channel, timeout):
+        self.channel = channel
+        self.timeout = timeout
+        self.before = None
+        self.after = None
+        self._buffer = b""
+
+    def send(self, data):
+        return self.channel.send(data)
+
+    def sendline(self, line=""):
+        return self.channel.send(line + "\n")
+
+    def expect(self, patterns, timeout=None):
+        while True:
+            try:
+                self._buffer += self.channel.recv(REPLAY_CHUNK)
+            except socket.timeout:
+                break
+        best = None
+        for index, pattern in enumerate(patterns):
+            # Như pexpect: pattern dạng chuỗi là regex
+            if isinstance(pattern, str):
+                pattern = re.compile(pattern.encode('utf-8'))
+            elif isinstance(pattern, bytes):
+                pattern = re.compile(pattern)
+            elif not hasattr(pattern, 'search'):
+                continue
+            match = pattern.search(self._buffer)
+            if match and (best is None or match.start() < best[1].start()):
+                best = (index, match)
+        if best is None:
+            self.before, self.after = self._buffer, self.timeout
+            return patterns.index(self.timeout)
+        index, match = best
+        self.before, self.after = self._buffer[:match.start()], match.group()
+        self._buffer = self._buffer[match.end():]
+        return index
+
+    def isalive(self):
+        return not self.channel.closed
+
+    def close(self):
+        self.channel.close()
@@ -0,0 +1,345 @@
+"""
+Engine đọc SSH channel theo prompt.
+
+Thay cho kiểu `time.sleep(delay)` rồi poll `recv_ready()` mỗi 100ms: engine chờ
+trực tiếp trên channel (settimeout + recv) và trả về ngay khi phần đuôi output
+khớp với prompt của thiết bị. Timeout của mỗi lệnh chỉ còn là giới hạn trên.
+
+Output được gom vào bytearray (O(n) theo kích thước output), việc dò prompt chỉ
+giải mã phần đuôi, và toàn bộ output được decode một lần khi đọc xong nên ký tự
+nhiều byte bị cắt giữa hai chunk không bị mất.
+
+Thời gian và số byte của từng lệnh được ghi vào collector_stats (common/stats.py).
+Khi bật capture (common/capture.py), byte thô nhận được cho mỗi lệnh (echo, prompt
+phân trang, prompt, cả phần dump bị ngắt của lệnh streaming) được ghi vào corpus.
+"""
+import codecs
+import re
+import socket
+import time
+
+from common import capture, deadline, stats
+
+# Tên trong prompt CLI: chữ, số, . - _ / : @ ~ và ngoặc, ví dụ switch01, sw(config), SG-6000[DBG]
+PROMPT_NAME = r"[\w.\-()/\[\]~:@]+"
+# Một dòng prompt hoàn chỉnh: tên rồi '#' hoặc '>'
+PROMPT_LINE_PATTERN = re.compile(PROMPT_NAME + r"[#>]")
+
+# Prompt mặc định khi chưa học được prompt thật của thiết bị: dòng cuối có dạng prompt và
+# kết thúc bằng '#'; dòng banner như '#####' hay 'Welcome to ...#' không khớp
+DEFAULT_PROMPT_PATTERN = re.compile(r"(?:^|[\r\n])" + PROMPT_NAME + r"#\s*\Z")
+
+# Chỉ so khớp prompt trên phần đuôi của output (tính theo byte), không quét lại toàn bộ buffer
+TAIL_WINDOW = 256
+
+CHUNK_SIZE = 32768
+
+# Prompt phân trang: "--More--" (Hillstone, IOS) và
+# "More: <space>,  Quit: q or CTRL+Z, One line: <return>" (Cisco SG/CBS)
+MORE_PATTERN = re.compile(rb"(?:-+\s*More\s*-+|More: <space>,\s*Quit: q.*?One line: <return>)\s*$", re.IGNORECASE)
+
+# Ký tự xoá dòng (backspace, ANSI escape) thiết bị in ra sau khi rời prompt phân trang
+PAGER_ERASE_PATTERN = re.compile(r"\x08+|\x1b\[[0-9;]*[A-Za-z]")
+
+# Chuỗi ngắt lệnh đang chạy (Ctrl-C) và thời gian tối đa chờ prompt sau khi ngắt
+ABORT_SEQUENCE = "\x03"
+DRAIN_TIMEOUT = 5
+
+
+def _decode(data):
+    return data.decode('utf-8', errors='ignore')
+
+
+class PromptReader:
+    def __init__(self, channel, prompt_pattern=DEFAULT_PROMPT_PATTERN, chunk_size=CHUNK_SIZE):
+        self.channel = channel
+        self.prompt_pattern = prompt_pattern
+        self.prompt = None
+        self.chunk_size = chunk_size
+        # False khi lần đọc gần nhất không về được prompt: output kế tiếp có thể lẫn dữ liệu cũ
+        self.in_sync = True
+        # Số lần phải tự bấm phím cách ở prompt phân trang (0 nếu đã tắt paging)
+        self.pages_continued = 0
+        # Tổng byte đã nhận trên channel
+        self.bytes_received = 0
+        # Byte thô của lệnh đang chạy, chỉ giữ khi bật capture
+        self._raw = None
+
+    def learn_prompt(self, output):
+        """
+        Ghi nhớ prompt của thiết bị từ dòng cuối cùng của output (ví dụ 'switch01#').
+        Chỉ gọi khi channel đã im lặng sau prompt (xem read_quiet), không phải giữa banner.
+
+        Returns:
+            str: Prompt đã học được, hoặc None nếu dòng cuối không có dạng prompt
+        """
+        lines = output.strip().splitlines()
+        if not lines:
+            return None
+        prompt = lines[-1].strip()
+        if not PROMPT_LINE_PATTERN.fullmatch(prompt):
+            return None
+        self.prompt = prompt
+        self.prompt_pattern = re.compile(re.escape(prompt) + r"\s*$")
+        return prompt
+
+    def _recv(self, read_deadline):
+        """Chờ chunk kế tiếp tối đa đến read_deadline. Returns bytes, hoặc None nếu hết giờ / channel đóng."""
+        remaining = read_deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        self.channel.settimeout(remaining)
+        try:
+            chunk = self.channel.recv(self.chunk_size)
+        except socket.timeout:
+            return None
+        if chunk:
+            self.bytes_received += len(chunk)
+            stats.add_bytes(len(chunk))
+            if self._raw is not None:
+                self._raw += chunk
+        return chunk or None
+
+    def _tap(self, record=True):
+        """Bắt đầu giữ byte thô của lệnh sắp gửi nếu đang bật capture."""
+        self._raw = bytearray() if record and capture.active() else None
+
+    def _untap(self):
+        raw, self._raw = self._raw, None
+        return raw
+
+    def _continue_paging(self, buffer):
+        """
+        Nếu buffer đang dừng ở prompt phân trang, gửi phím cách để thiết bị in tiếp
+        và bỏ dòng prompt phân trang khỏi buffer (sửa tại chỗ).
+        """
+        match = MORE_PATTERN.search(buffer, max(0, len(buffer) - TAIL_WINDOW))
+        if match:
+            del buffer[match.start():]
+            self.channel.send(" ")
+            self.pages_continued += 1
+
+    def setup_terminal(self, commands, timeout=5):
+        """
+        Chạy các lệnh khởi tạo phiên (tắt phân trang...) một lần sau khi login.
+
+        Returns:
+            bool: True nếu mọi lệnh đều trả về prompt
+        """
+        ok = True
+        for command in commands:
+            # Lệnh khởi tạo không được ghi vào corpus capture (không có trong lần phát lại)
+            _, complete = self.send_command(command, timeout, record=False)
+            ok = ok and complete
+        return ok
+
+    def read_until(self, patterns, timeout):
+        """
+        Đọc channel cho đến khi phần đuôi output khớp một trong các pattern.
+        Args:
+            patterns (list): Danh sách regex đã compile
+            timeout (float): Thời gian tối đa (giây), chỉ là giới hạn trên;
+                             không vượt quá budget còn lại của thiết bị
+
+        Returns:
+            tuple: (output, index) với index là vị trí pattern khớp,
+                   hoặc None nếu hết thời gian / channel đã đóng
+        """
+        read_deadline = time.monotonic() + deadline.clamp(timeout)
+        buffer = bytearray()
+        while True:
+            chunk = self._recv(read_deadline)
+            if chunk is None:
+                return _decode(buffer), None
+            buffer += chunk
+            self._continue_paging(buffer)
+            tail = _decode(buffer[-TAIL_WINDOW:])
+            for index, pattern in enumerate(patterns):
+                if pattern.search(tail):
+                    return _decode(buffer), index
+
+    def read_quiet(self, quiet, timeout):
+        """
+        Đọc tiếp đến khi channel im lặng `quiet` giây (tối đa `timeout` giây).
+
+        Returns:
+            str: Output đọc thêm, '' nếu channel im lặng ngay
+        """
+        read_deadline = time.monotonic() + deadline.clamp(timeout)
+        buffer = bytearray()
+        while True:
+            chunk = self._recv(min(read_deadline, time.monotonic() + quiet))
+            if chunk is None:
+                return _decode(buffer)
+            buffer += chunk
+
+    def read_until_prompt(self, timeout):
+        """Đọc đến khi gặp prompt. Returns (output, True nếu đã thấy prompt)."""
+        output, index = self.read_until([self.prompt_pattern], timeout)
+        self.in_sync = index is not None
+        return output, self.in_sync
+
+    def send_command(self, command, timeout, record=True):
+        """
+        Gửi lệnh và trả về output thô (gồm cả echo và prompt) cùng cờ hoàn tất.
+        record=False để không ghi lệnh vào corpus capture.
+        """
+        pages_before = self.pages_continued
+        start, bytes_before = time.monotonic(), self.bytes_received
+        self._tap(record)
+        try:
+            self.channel.send(command + "\n")
+            output, complete = self.read_until_prompt(timeout)
+        finally:
+            raw = self._untap()
+        if raw is not None:
+            capture.record(command, _decode(raw))
+        stats.command(command, time.monotonic() - start, self.bytes_received - bytes_before)
+        if self.pages_continued != pages_before:
+            output = PAGER_ERASE_PATTERN.sub("", output)
+        return output, complete
+
+    def _read_prompts(self, count, timeout):
+        """
+        Đọc đến khi prompt đã học xuất hiện `count` lần.
+
+        Returns:
+            tuple: (buffer bytes, danh sách vị trí byte bắt đầu của từng prompt,
+                    danh sách thời điểm time.monotonic() thấy từng prompt)
+        """
+        read_deadline = time.monotonic() + deadline.clamp(timeout)
+        prompt = self.prompt.encode('utf-8')
+        buffer = bytearray()
+        positions = []
+        seen_at = []
+        scan_from = 0
+        while len(positions) < count:
+            chunk = self._recv(read_deadline)
+            if chunk is None:
+                break
+            buffer += chunk
+            self._continue_paging(buffer)
+            scan_from = min(scan_from, len(buffer))
+            # Chỉ quét phần mới nhận (cộng phần prompt có thể bị cắt ở chunk trước)
+            while True:
+                position = buffer.find(prompt, scan_from)
+                if position < 0:
+                    scan_from = max(scan_from, len(buffer) - len(prompt) + 1)
+                    break
+                positions.append(position)
+                seen_at.append(time.monotonic())
+                scan_from = position + len(prompt)
+        return buffer, positions, seen_at
+
+    def send_batch(self, commands, timeout):
+        """
+        Gửi nhiều lệnh liên tiếp trong một lượt và tách output theo ranh giới prompt.
+        Chỉ tốn một lần chờ round-trip cho cả nhóm lệnh thay vì mỗi lệnh một lần.
+        Args:
+            commands (list): Danh sách lệnh
+            timeout (float): Giới hạn trên cho cả nhóm lệnh
+
+        Returns:
+            tuple: (list output thô theo thứ tự lệnh, True nếu đã thấy đủ prompt)
+        """
+        if not self.prompt:
+            # Chưa học được prompt thì không đếm được ranh giới, chạy tuần tự
+            outputs, complete = [], True
+            batch_deadline = time.monotonic() + timeout
+            for command in commands:
+                output, ok = self.send_command(command, max(0.0, batch_deadline - time.monotonic()))
+                outputs.append(output)
+                complete = complete and ok
+            return outputs, complete
+
+        pages_before = self.pages_continued
+        sent_at = time.monotonic()
+        self._tap()
+        try:
+            self.channel.send("".join(command + "\n" for command in commands))
+            buffer, positions, seen_at = self._read_prompts(len(commands), timeout)
+        finally:
+            raw = self._untap()
+        if raw is not None:
+            self._record_batch(commands, raw)
+
+        prompt_length = len(self.prompt.encode('utf-8'))
+        outputs = []
+        start = 0
+        for command, position, finished_at in zip(commands, positions, seen_at):
+            outputs.append(_decode(buffer[start:position]))
+            # Thời gian của mỗi lệnh trong batch: từ prompt của lệnh trước đến prompt của nó
+            stats.command(command, finished_at - sent_at, position + prompt_length - start)
+            start = position + prompt_length
+            sent_at = finished_at
+        complete = len(outputs) == len(commands)
+        self.in_sync = complete
+        if not complete:
+            outputs.append(_decode(buffer[start:]))
+        outputs.extend([""] * (len(commands) - len(outputs)))
+        if self.pages_continued != pages_before:
+            outputs = [PAGER_ERASE_PATTERN.sub("", output) for output in outputs]
+        return outputs, complete
+
+    def _record_batch(self, commands, raw):
+        """Tách byte thô của một batch theo prompt (như _read_prompts) và ghi từng lệnh."""
+        prompt = self.prompt.encode('utf-8')
+        start = 0
+        for command in commands:
+            position = raw.find(prompt, start)
+            end = len(raw) if position < 0 else position + len(prompt)
+            if end > start:
+                capture.record(command, _decode(raw[start:end]))
+            start = end
+
+    def stream_command(self, command, extractor, timeout, abort_sequence=ABORT_SEQUENCE):
+        """
+        Gửi lệnh và đưa output cho extractor theo từng chunk, không giữ toàn bộ output.
+        Khi extractor báo đã đủ field, phần output còn lại bị ngắt bằng abort_sequence
+        rồi đọc bỏ đến prompt.
+        Args:
+            command (str): Lệnh cần chạy
+            extractor: Đối tượng có feed(text) -> bool (xem common.stream)
+            timeout (float): Giới hạn trên cho cả lệnh
+
+        Returns:
+            bool: True nếu extractor đã lấy đủ field
+        """
+        start, bytes_before = time.monotonic(), self.bytes_received
+        self._tap()
+        try:
+            return self._stream(command, extractor, timeout, abort_sequence)
+        finally:
+            raw = self._untap()
+            if raw is not None:
+                capture.record(command, _decode(raw))
+            stats.command(command, time.monotonic() - start, self.bytes_received - bytes_before)
+
+    def _stream(self, command, extractor, timeout, abort_sequence):
+        self.channel.send(command + "\n")
+        read_deadline = time.monotonic() + deadline.clamp(timeout)
+        # Decoder tăng dần: mỗi byte chỉ được decode một lần và ký tự nhiều byte không bị cắt
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        tail = b""
+        while True:
+            chunk = self._recv(read_deadline)
+            if chunk is None:
+                self.in_sync = False
+                return extractor.done
+            tail = (tail + chunk)[-TAIL_WINDOW:]
+            at_prompt = self.prompt_pattern.search(_decode(tail)) is not None
+            if not at_prompt and MORE_PATTERN.search(tail):
+                self.channel.send(" ")
+                self.pages_continued += 1
+                tail = b""
+
+            if extractor.feed(decoder.decode(chunk)):
+                if at_prompt:
+                    self.in_sync = True
+                else:
+                    self.channel.send(abort_sequence)
+                    self.read_until_prompt(DRAIN_TIMEOUT)
+                return True
+            if at_prompt:
+                self.in_sync = True
+                return False
@@ -0,0 +1,59 @@
+"""
+Deadline (budget thời gian) của thiết bị đang được thu thập trên thread hiện tại.
+
+Engine đặt deadline trước khi chạy collect cho một thiết bị; mọi thao tác chờ
+(connect, login, đọc channel, pexpect.expect) dùng clamp() để không bao giờ chờ
+quá budget còn lại. Nhờ vậy một thiết bị treo tự dừng khi hết phần thời gian của nó.
+
+Ngoài ra có một deadline chung của cả process (timeout exec của Telegraf tính từ
+đầu lần chạy), dùng cho những việc sau khi thu thập xong như đóng output.
+"""
+import threading
+import time
+
+_local = threading.local()
+_process_deadline = None
+
+
+def set_deadline(deadline):
+    """Đặt deadline (theo time.monotonic()) cho thread hiện tại; None để bỏ giới hạn."""
+    _local.deadline = deadline
+
+
+def get_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+def remaining():
+    """Số giây còn lại trước deadline, hoặc None nếu thread không có deadline."""
+    deadline = get_deadline()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def clamp(timeout):
+    """Giới hạn một timeout theo budget còn lại của thiết bị."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return min(timeout, left)
+
+
+def expired():
+    """True nếu thread hiện tại đã dùng hết budget."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def set_process_deadline(deadline):
+    """Đặt deadline (theo time.monotonic()) của cả process; None để bỏ giới hạn."""
+    global _process_deadline
+    _process_deadline = deadline
+
+
+def process_remaining():
+    """Số giây còn lại trước deadline của process, hoặc None nếu không có."""
+    if _process_deadline is None:
+        return None
+    return max(0.0, _process_deadline - time.monotonic())
@@ -0,0 +1,89 @@
+"""
+Registry driver cho collector hợp nhất (exec-scripts/collector.py).
+
+Mỗi driver là một script vendor sẵn có (cisco-sg/, cisco-business-220series/,
+hillstone/), cung cấp cùng một giao diện:
+
+    DRIVER_NAME                                  tên driver, dùng cho tag vendor
+    env_path                                     đường dẫn file .env của driver
+    load_device_configs(env=None)                -> list device_config
+    open_session(device_config)                  -> (session hoặc None, login metrics)
+    collect_metrics_from_session(session, host)  -> list metrics
+    collect_metrics_from_device(device_config)   -> list metrics
+    replay_session(channel)                      -> session trên common.capture.ReplayChannel
+                                                    (tuỳ chọn, cho benchmarks/bench_replay.py)
+
+Script vẫn chạy độc lập như trước; collector chỉ import chúng như module để
+một scheduler và một worker pool phục vụ mọi vendor.
+"""
+import importlib.util
+import os
+import sys
+import threading
+
+EXEC_SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tên driver -> script vendor (tương đối với exec-scripts/)
+DRIVERS = {
+    "cisco_sg": "cisco-sg/device_cisco.py",
+    "cisco_cbs220": "cisco-business-220series/device_cisco.py",
+    "hillstone": "hillstone/devices_hillstone.py",
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def register_driver(name, script_path):
+    """Đăng ký thêm driver (script_path tuyệt đối hoặc tương đối với exec-scripts/)."""
+    DRIVERS[name] = script_path
+
+
+def load_driver(name):
+    """
+    Import script vendor của driver như một module (chỉ import một lần).
+
+    Returns:
+        module: Module driver
+
+    Raises:
+        KeyError: Driver chưa được đăng ký
+        ImportError: Script thiếu thư viện (ví dụ pexpect) hoặc thiếu hàm bắt buộc
+    """
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+        path = os.path.join(EXEC_SCRIPTS_DIR, DRIVERS[name])
+        spec = importlib.util.spec_from_file_location(f"driver_{name}", path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[spec.name]
+            raise
+        for attribute in ("load_device_configs", "open_session",
+                          "collect_metrics_from_session", "collect_metrics_from_device"):
+            if not hasattr(module, attribute):
+                raise ImportError(f"Driver {name} ({path}) does not define {attribute}()")
+        _loaded[name] = module
+        return module
+
+
+def load_drivers(names=None):
+    """
+    Nạp các driver được chọn (mặc định: tất cả driver đã đăng ký).
+    Driver không import được (thiếu thư viện, lỗi cú pháp) bị bỏ qua kèm cảnh báo.
+
+    Returns:
+        dict: Tên driver -> module
+    """
+    drivers = {}
+    for name in names or list(DRIVERS):
+        try:
+            drivers[name] = load_driver(name)
+        except KeyError:
+            print(f"Warning: Unknown driver '{name}', available: {', '.join(DRIVERS)}", file=sys.stderr)
+        except Exception as e:
+            print(f"Warning: Driver '{name}' could not be loaded, skipping: {e}", file=sys.stderr)
+    return drivers
@@ -0,0 +1,343 @@
+"""
+Engine thu thập bất đồng bộ (asyncio) cho toàn bộ thiết bị.
+
+Một event loop điều phối tất cả thiết bị; số session chạy đồng thời được giới hạn
+bởi COLLECTOR_CONCURRENCY (mặc định 32) thay cho LIMIT_WORKERS = 3 cố định.
+paramiko/pexpect là API blocking nên mỗi session chạy trên một thread riêng; thread
+chỉ nằm chờ trên socket (PromptReader). Mỗi thread giữ một slot cho tới khi nó thật
+sự kết thúc: thread của thiết bị quá hạn bị bỏ lại vẫn chiếm slot (kể cả sang lần
+poll sau ở chế độ execd), nên số thread/session còn sống trong process không vượt
+quá giới hạn concurrency dù fleet có bao nhiêu thiết bị hay bao nhiêu thiết bị treo.
+
+Mỗi lần chạy có một deadline tổng (COLLECTOR_RUN_DEADLINE, mặc định 50s để nằm
+trong timeout = "60s" của Telegraf), được chia thành budget cho từng thiết bị.
+Thiết bị vượt budget bị bỏ lại và báo cáo qua measurement collector_device_status;
+metrics của các thiết bị khác vẫn được ghi ra, cùng với metrics thiết bị bị bỏ lại đã
+thu thập xong trước đó (stats.add_metrics).
+
+Metrics của từng thiết bị được ghi qua LineWriter ngay khi thiết bị hoàn tất.
+
+Nếu truyền HealthStore (common/health.py), thiết bị đang bị circuit breaker chặn
+được bỏ qua ngay với status="backoff" mà không chiếm worker.
+
+Mỗi thiết bị được thu thập có một DeviceStats (common/stats.py) gắn vào thread của nó;
+số đo được ghi ra measurement collector_stats cùng dòng collector_device_status, kèm
+một dòng tổng hợp cho cả lần chạy.
+
+Nếu truyền Profiler (common/profiling.py), lần chạy được lấy mẫu chạy dưới cProfile
+và tracemalloc; báo cáo được ghi khi lần chạy kết thúc.
+"""
+import asyncio
+import collections
+import math
+import os
+import sys
+import threading
+import time
+
+from common import deadline, stats
+from common.health import DeviceBusy, DeviceUnreachable
+from common.lineproto import encode
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_RUN_DEADLINE = 50.0
+# Timeout exec của Telegraf (telegraf.conf); đóng output phải xong trước đó
+DEFAULT_EXEC_TIMEOUT = 60.0
+# Khoảng dự phòng trước timeout exec cho việc thoát process
+EXEC_TIMEOUT_MARGIN = 2.0
+
+# Thời gian chờ thêm sau budget trước khi bỏ hẳn thread của thiết bị
+CANCEL_GRACE = 1.0
+
+STATUS_COMPLETED = "completed"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+STATUS_BACKOFF = "backoff"
+STATUS_BUSY = "busy"
+
+
+def _env_number(name, default, cast):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        print(f"Warning: Invalid {name}, using default {default}", file=sys.stderr)
+        return default
+
+
+def get_concurrency():
+    """Đọc giới hạn concurrency từ biến môi trường COLLECTOR_CONCURRENCY."""
+    return max(1, _env_number('COLLECTOR_CONCURRENCY', DEFAULT_CONCURRENCY, int))
+
+
+def get_run_deadline():
+    """Đọc deadline tổng của một lần chạy (giây) từ COLLECTOR_RUN_DEADLINE."""
+    return _env_number('COLLECTOR_RUN_DEADLINE', DEFAULT_RUN_DEADLINE, float)
+
+
+def get_exec_timeout():
+    """Đọc timeout exec của Telegraf (giây) từ COLLECTOR_EXEC_TIMEOUT; 0 để tắt."""
+    return _env_number('COLLECTOR_EXEC_TIMEOUT', DEFAULT_EXEC_TIMEOUT, float)
+
+
+def format_status_metric(host, status, duration, budget, timestamp=None):
+    """Line protocol trạng thái thu thập của một thiết bị (measurement collector_device_status)."""
+    return encode(
+        "collector_device_status",
+        {'agent_host': host},
+        {'status': status, 'duration_seconds': round(duration, 3), 'budget_seconds': round(budget, 3)},
+        timestamp,
+    )
+
+
+class _ThreadSlots:
+    """
+    Slot cho thread thu thập, dùng chung trong process. Slot được lấy trong event loop
+    của lần chạy và chỉ được trả khi thread thật sự kết thúc (release() gọi từ thread đó),
+    nên thread bị bỏ lại vì quá hạn vẫn được tính vào giới hạn.
+    """
+
+    def __init__(self):
+        self.limit = DEFAULT_CONCURRENCY
+        self._busy = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._busy < self.limit and not self._waiters:
+                self._busy += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # Slot đã được chuyển cho waiter này ngay trước khi bị huỷ
+            if waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """Trả một slot; gọi được từ mọi thread."""
+        with self._lock:
+            while self._waiters and self._busy <= self.limit:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # Event loop của waiter đã đóng
+                    continue
+            self._busy -= 1
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+_SLOTS = _ThreadSlots()
+
+
+def _run_in_thread(loop, device_deadline, collect, device, device_stats=None):
+    """
+    Chạy collect(device) trên daemon thread với deadline và DeviceStats của thiết bị.
+    Thread đã giữ một slot của _SLOTS và trả slot khi kết thúc. Thread bị bỏ lại khi
+    quá hạn không giữ process lại lúc thoát.
+    """
+    future = loop.create_future()
+
+    def resolve(setter, value):
+        if not future.done():
+            setter(value)
+
+    def target():
+        try:
+            deadline.set_deadline(device_deadline)
+            stats.bind(device_stats)
+            try:
+                result = collect(device)
+                callback = (resolve, future.set_result, result)
+            except BaseException as exc:
+                callback = (resolve, future.set_exception, exc)
+            try:
+                loop.call_soon_threadsafe(*callback)
+            except RuntimeError:
+                # Event loop đã đóng: lần chạy đã kết thúc, kết quả này bị bỏ
+                pass
+        finally:
+            _SLOTS.release()
+
+    try:
+        threading.Thread(target=target, name=f"collect-{device['hostname']}", daemon=True).start()
+    except BaseException:
+        _SLOTS.release()
+        raise
+    return future
+
+
+async def collect_all(devices, collect, concurrency, run_deadline=None, health=None):
+    """
+    Chạy collect(device_config) cho mọi thiết bị, tối đa `concurrency` thiết bị cùng lúc.
+    Chỉ `concurrency` worker coroutine được tạo, thiết bị được lấy dần từ hàng đợi; mỗi
+    thiết bị chỉ bắt đầu khi có slot thread (thread bị bỏ lại vẫn giữ slot, xem _ThreadSlots).
+    Budget của mỗi thiết bị là phần chia đều thời gian còn lại cho số "lượt" thiết bị
+    còn phải chạy, nên thiết bị nhanh nhường thời gian cho thiết bị sau.
+    Thiết bị mà `health` (HealthStore) chưa cho phép thử lại được trả về ngay với STATUS_BACKOFF.
+
+    Yields:
+        tuple: (device_config, metrics, exception, status, duration, budget, DeviceStats hoặc None
+                nếu thiết bị không được chạy) theo thứ tự hoàn thành
+    """
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue()
+    for device in devices:
+        pending.put_nowait(device)
+    results = asyncio.Queue()
+    worker_count = max(1, min(len(devices), concurrency))
+    _SLOTS.limit = concurrency
+    queued_at = time.monotonic()
+    run_end = queued_at + run_deadline if run_deadline else None
+
+    async def worker():
+        while True:
+            try:
+                device = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            if health is not None and not health.allow(device['hostname']):
+                await results.put((device, [], None, STATUS_BACKOFF, 0.0, 0.0, None))
+                continue
+
+            try:
+                if run_end is None:
+                    await _SLOTS.acquire()
+                else:
+                    await asyncio.wait_for(_SLOTS.acquire(), max(0.0, run_end - time.monotonic()))
+            except asyncio.TimeoutError:
+                # Mọi slot bị thread treo giữ tới hết lần chạy
+                await results.put((device, [], None, STATUS_SKIPPED, 0.0, 0.0, None))
+                continue
+
+            budget = None
+            if run_end is not None:
+                waves = math.ceil((pending.qsize() + 1) / worker_count)
+                budget = max(0.0, run_end - time.monotonic()) / waves
+                if budget <= 0:
+                    _SLOTS.release()
+                    await results.put((device, [], None, STATUS_SKIPPED, 0.0, 0.0, None))
+                    continue
+
+            start = time.monotonic()
+            device_stats = stats.DeviceStats(device['hostname'], device.get('driver'), queue_wait=start - queued_at)
+            device_deadline = start + budget if budget is not None else None
+            future = _run_in_thread(loop, device_deadline, collect, device, device_stats)
+            metrics, exc, status = [], None, STATUS_COMPLETED
+            try:
+                timeout = budget + CANCEL_GRACE if budget is not None else None
+                metrics = await asyncio.wait_for(future, timeout)
+                if device_deadline is not None and time.monotonic() >= device_deadline:
+                    status = STATUS_TIMEOUT
+            except asyncio.TimeoutError:
+                # Thread vẫn chạy: ghi ra phần metrics nó đã thu thập xong
+                metrics, status = list(device_stats.metrics), STATUS_TIMEOUT
+            except DeviceUnreachable as e:
+                exc, status = e, STATUS_BACKOFF
+            except DeviceBusy as e:
+                exc, status = e, STATUS_BUSY
+            except Exception as e:
+                exc, status = e, STATUS_ERROR
+            duration = time.monotonic() - start
+            await results.put((device, metrics, exc, status, duration, budget or 0.0, device_stats))
+
+    workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+    for _ in range(len(devices)):
+        yield await results.get()
+    await asyncio.gather(*workers)
+
+
+def run_collection(devices, collect, writer, concurrency=None, run_deadline=None, health=None, profiler=None):
+    """
+    Thu thập metrics từ toàn bộ thiết bị bằng event loop asyncio và ghi ra ngay
+    khi từng thiết bị hoàn tất.
+    Args:
+        devices (list): Danh sách device_config
+        collect: Hàm (device_config) -> list metrics, ví dụ collect_metrics_from_device
+        writer (LineWriter | InfluxWriter): Nơi ghi line protocol, kèm một dòng collector_device_status mỗi thiết bị
+                và các dòng collector_stats (tắt bằng COLLECTOR_STATS=0)
+        concurrency (int): Số thiết bị xử lý đồng thời, mặc định lấy từ COLLECTOR_CONCURRENCY
+        run_deadline (float): Deadline tổng (giây), mặc định lấy từ COLLECTOR_RUN_DEADLINE;
+                              0 để tắt giới hạn
+        health (HealthStore): Circuit breaker theo thiết bị (HealthStore.from_env()), None để tắt;
+                              thiết bị đang lỗi có thêm một dòng collector_device_health
+        profiler (Profiler): Profiling lần chạy (Profiler.from_env()), None để tắt
+
+    Deadline của process (common.deadline.set_process_deadline) được đặt theo
+    COLLECTOR_EXEC_TIMEOUT tính từ đầu lần chạy, để writer.close() sau đó không
+    vượt timeout exec của Telegraf.
+
+    Returns:
+        int: Số dòng metrics đã ghi trong lần chạy này
+    """
+    exec_timeout = get_exec_timeout()
+    deadline.set_process_deadline(
+        time.monotonic() + max(0.0, exec_timeout - EXEC_TIMEOUT_MARGIN) if exec_timeout > 0 else None)
+    if concurrency is None:
+        concurrency = get_concurrency()
+    if run_deadline is None:
+        run_deadline = get_run_deadline()
+
+    if health is not None:
+        collect = health.guard(collect)
+
+    profile = profiler.begin() if profiler is not None else None
+    if profile is not None:
+        collect = profile.wrap(collect)
+
+    run_stats = stats.RunStats(concurrency) if stats.stats_enabled() else None
+    include_commands = stats.command_stats_enabled()
+
+    async def _run():
+        written = 0
+        async for device, device_metrics, exc, status, duration, budget, device_stats in collect_all(
+                devices, collect, concurrency, run_deadline, health):
+            host = device['hostname']
+            if status == STATUS_BACKOFF:
+                print(f"Device {host} skipped: circuit open" + (f" ({exc})" if exc else ""), file=sys.stderr)
+            elif status == STATUS_BUSY:
+                print(f"Device {host} skipped: {exc}", file=sys.stderr)
+            elif exc is not None:
+                print(f"Device {host} generated an exception: {exc}", file=sys.stderr)
+            elif status == STATUS_TIMEOUT:
+                print(f"Device {host} exceeded its {budget:.1f}s budget ({len(device_metrics)} partial metrics kept)", file=sys.stderr)
+            elif status == STATUS_SKIPPED:
+                print(f"Device {host} skipped: run deadline reached", file=sys.stderr)
+            lines = device_metrics + [format_status_metric(host, status, duration, budget)]
+            if run_stats is not None:
+                run_stats.add(status, device_stats)
+                if device_stats is not None:
+                    lines.extend(device_stats.format_lines(include_commands=include_commands))
+            health_line = health.format_metric(host) if health is not None else None
+            if health_line:
+                lines.append(health_line)
+            writer.write_lines(lines)
+            written += len(lines)
+        if run_stats is not None:
+            writer.write_lines([run_stats.format_line()])
+            written += 1
+        return written
+
+    try:
+        return asyncio.run(_run())
+    finally:
+        if health is not None:
+            health.save()
+        if profile is not None:
+            profile.finish()
@@ -0,0 +1,162 @@
+"""
+Chế độ Telegraf execd: process thường trú, giữ session SSH giữa các chu kỳ.
+
+Telegraf gửi một dòng vào stdin mỗi interval (signal = "STDIN"); mỗi lần nhận
+được trigger, collector poll toàn bộ thiết bị bằng session đã xác thực sẵn và
+ghi line protocol ra stdout (hoặc thẳng vào InfluxDB với COLLECTOR_OUTPUT=influx,
+xem common/output.py). Session chỉ được mở lại khi bị mất.
+
+Mỗi session chỉ được một thread dùng tại một thời điểm: thread của thiết bị quá hạn
+bị engine bỏ lại vẫn giữ session cho tới khi nó kết thúc (và session đó bị đóng vì
+hết budget). Lần poll sau gặp thiết bị này khi thread cũ chưa xong sẽ báo
+SessionBusy (status="busy", không tính vào circuit breaker) thay vì gửi lệnh xen
+kẽ trên cùng một shell.
+
+Cấu hình Telegraf tương ứng:
+
+    [[inputs.execd]]
+      command = ["python3", "/scripts/cisco-sg/device_cisco.py", "--execd"]
+      signal = "STDIN"
+      restart_delay = "10s"
+      data_format = "influx"
+"""
+import sys
+import threading
+from functools import partial
+
+from common import deadline, stats
+from common.engine import run_collection
+from common.health import DeviceBusy
+from common.output import create_writer
+
+
+class SessionBusy(DeviceBusy):
+    """Session của thiết bị còn đang được thread của một lần poll trước (đã quá hạn) dùng."""
+
+
+class SessionPool:
+    """
+    Giữ tối đa một session đã xác thực cho mỗi thiết bị, giao cho một thread tại một
+    thời điểm (get() ... release()).
+    Args:
+        open_session: Hàm (device_config) -> (session hoặc None, metrics của bước login).
+                      Session phải có is_alive() và close().
+    """
+
+    def __init__(self, open_session):
+        self.open_session = open_session
+        self.sessions = {}
+        self._in_use = set()
+        self._lock = threading.Lock()
+
+    def get(self, device_config):
+        """
+        Lấy độc quyền session của thiết bị; chỉ mở session mới khi chưa có hoặc đã chết.
+        Session (khác None) phải được trả lại bằng release().
+
+        Returns:
+            tuple: (session hoặc None, login_metrics)
+
+        Raises:
+            SessionBusy: Session đang được thread khác dùng
+        """
+        host = device_config['hostname']
+        with self._lock:
+            if host in self._in_use:
+                raise SessionBusy(f"session to {host} is still used by an unfinished poll")
+            self._in_use.add(host)
+            session = self.sessions.get(host)
+        try:
+            if session is not None:
+                if session.is_alive():
+                    return session, []
+                print(f"Session to {host} lost, reconnecting...", file=sys.stderr)
+                stats.retry()
+                self.discard(host)
+
+            session, login_metrics = self.open_session(device_config)
+        except BaseException:
+            self.release(host)
+            raise
+        if session is None:
+            self.release(host)
+        else:
+            with self._lock:
+                self.sessions[host] = session
+        return session, login_metrics
+
+    def release(self, host, discard=False):
+        """Trả session lấy bằng get(); discard=True để đóng nó (lần poll sau kết nối lại)."""
+        if discard:
+            self.discard(host)
+        with self._lock:
+            self._in_use.discard(host)
+
+    def discard(self, host):
+        """Đóng và bỏ session của một thiết bị (lần poll sau sẽ kết nối lại)."""
+        with self._lock:
+            session = self.sessions.pop(host, None)
+        if session is not None:
+            session.close()
+
+    def retain(self, hosts):
+        """Đóng session của các thiết bị không còn trong `hosts` (ví dụ sau khi inventory thay đổi)."""
+        with self._lock:
+            removed = [host for host in self.sessions if host not in hosts]
+        for host in removed:
+            self.discard(host)
+
+    def close_all(self):
+        with self._lock:
+            sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+def poll_device(pool, device_config, collect_from_session):
+    """Thu thập metrics của một thiết bị bằng session trong pool."""
+    host = device_config['hostname']
+    session, device_metrics = pool.get(device_config)
+    if session is None:
+        return device_metrics
+    reuse = False
+    try:
+        device_metrics.extend(collect_from_session(session, host))
+        # Session có thể còn dở lệnh khi hết budget, không dùng lại
+        reuse = not deadline.expired() and session.is_alive()
+    finally:
+        pool.release(host, discard=not reuse)
+    return device_metrics
+
+
+def run_execd(devices, open_session, collect_from_session, concurrency=None, stdin=None, stdout=None,
+              reload=None, health=None, profiler=None):
+    """
+    Vòng lặp execd: mỗi dòng đọc được từ stdin là một lần poll toàn bộ thiết bị.
+    Kết thúc khi stdin đóng (Telegraf dừng plugin).
+    Args:
+        reload: Hàm không tham số được gọi trước mỗi lần poll, trả về danh sách thiết bị
+                mới khi inventory thay đổi hoặc None nếu không đổi (ví dụ Inventory.reloader())
+        health (HealthStore): Circuit breaker theo thiết bị, xem common/health.py
+        profiler (Profiler): Profiling các lần poll (COLLECTOR_PROFILE_EVERY), xem common/profiling.py
+    """
+    stdin = stdin or sys.stdin
+    writer = create_writer(stdout)
+    pool = SessionPool(open_session)
+    collect = partial(poll_device, pool, collect_from_session=collect_from_session)
+
+    try:
+        while stdin.readline():
+            if reload is not None:
+                updated = reload()
+                if updated is not None:
+                    devices = updated
+                    pool.retain({device['hostname'] for device in devices})
+                    print(f"Inventory reloaded: {len(devices)} device(s)", file=sys.stderr)
+            written = run_collection(devices, collect, writer, concurrency, health=health, profiler=profiler)
+            print(f"Poll completed: {written} metrics, {len(pool.sessions)} open session(s)", file=sys.stderr)
+    finally:
+        pool.close_all()
+        # execd không có timeout exec: bỏ deadline process do lần poll cuối đặt
+        deadline.set_process_deadline(None)
+        writer.close()
@@ -0,0 +1,211 @@
+"""
+Circuit breaker theo thiết bị, lưu bền vững giữa các lần chạy.
+
+Với mỗi host, collector ghi nhận số lần thất bại liên tiếp, thời điểm được thử
+lại và loại lỗi gần nhất (health.json trong thư mục trạng thái, common/state.py).
+Sau COLLECTOR_BREAKER_THRESHOLD lần thất bại liên tiếp, breaker "mở": thiết bị bị
+bỏ qua (status="backoff") mà không chiếm worker nào cho đến khi hết backoff
+(tăng gấp đôi sau mỗi lần thất bại, từ COLLECTOR_BREAKER_BACKOFF đến
+COLLECTOR_BREAKER_MAX_BACKOFF giây). Khi hết backoff, một TCP connect rẻ tới cổng
+SSH được thử trước; chỉ khi cổng mở thì mới chạy login/collect đầy đủ.
+
+Thất bại được tính khi collect ném exception (trừ DeviceBusy), hoặc khi driver báo
+kết nối/login thất bại bằng mark_failure() (open_session của các script vendor).
+"""
+import os
+import socket
+import sys
+import threading
+import time
+
+from common import deadline
+from common.lineproto import encode
+from common.state import load_json, state_path, update_json
+
+DEFAULT_THRESHOLD = 2
+DEFAULT_BACKOFF = 60.0
+DEFAULT_MAX_BACKOFF = 1800.0
+
+# Timeout của TCP probe khi hết backoff
+PROBE_TIMEOUT = 3.0
+
+HEALTH_FILE = "health.json"
+
+_local = threading.local()
+
+
+class DeviceUnreachable(Exception):
+    """TCP probe tới thiết bị đang ở trạng thái open thất bại; thiết bị bị bỏ qua lần này."""
+
+
+class DeviceBusy(Exception):
+    """
+    Thiết bị còn đang được thread của một lần chạy trước thu thập; thiết bị bị bỏ qua
+    lần này và không tính là thất bại.
+    """
+
+
+def mark_failure(error):
+    """Driver báo thiết bị trên thread hiện tại không kết nối/login được (error: tên loại lỗi)."""
+    _local.error = error
+
+
+def _take_failure():
+    error = getattr(_local, 'error', None)
+    _local.error = None
+    return error
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        print(f"Warning: Invalid {name}, using default {default}", file=sys.stderr)
+        return default
+
+
+class HealthStore:
+    """
+    Trạng thái sức khoẻ của các thiết bị, đọc/ghi ở `path`.
+    Args:
+        path (str): File JSON lưu trạng thái
+        threshold (int): Số lần thất bại liên tiếp để mở breaker
+        backoff (float): Backoff đầu tiên (giây) khi breaker mở
+        max_backoff (float): Backoff tối đa (giây)
+        probe (bool): Thử TCP connect trước khi collect thiết bị vừa hết backoff
+    """
+
+    def __init__(self, path, threshold=DEFAULT_THRESHOLD, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, probe=True):
+        self.path = path
+        self.threshold = max(1, threshold)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.probe = probe
+        self.hosts = load_json(path, {}) or {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """HealthStore theo biến môi trường COLLECTOR_BREAKER*, hoặc None nếu COLLECTOR_BREAKER=0."""
+        if os.getenv('COLLECTOR_BREAKER', '1').lower() in ('0', 'false', 'no', 'off'):
+            return None
+        return cls(
+            state_path(HEALTH_FILE),
+            threshold=int(_env_float('COLLECTOR_BREAKER_THRESHOLD', DEFAULT_THRESHOLD)),
+            backoff=_env_float('COLLECTOR_BREAKER_BACKOFF', DEFAULT_BACKOFF),
+            max_backoff=_env_float('COLLECTOR_BREAKER_MAX_BACKOFF', DEFAULT_MAX_BACKOFF),
+            probe=os.getenv('COLLECTOR_BREAKER_PROBE', '1').lower() not in ('0', 'false', 'no', 'off'),
+        )
+
+    def _is_open(self, state):
+        return state.get('failures', 0) >= self.threshold
+
+    def allow(self, host, now=None):
+        """False nếu breaker của host đang mở và chưa hết backoff (bỏ qua, không tốn worker)."""
+        with self._lock:
+            state = self.hosts.get(host)
+            if not state or not self._is_open(state):
+                return True
+            return (now or time.time()) >= state.get('next_retry', 0)
+
+    def needs_probe(self, host):
+        """True nếu host đang open (vừa hết backoff) và cần TCP probe trước khi collect."""
+        with self._lock:
+            state = self.hosts.get(host)
+            return self.probe and bool(state) and self._is_open(state)
+
+    def record_success(self, host):
+        with self._lock:
+            if self.hosts.pop(host, None) is not None:
+                self._dirty.add(host)
+
+    def record_failure(self, host, error, now=None):
+        """Tăng số lần thất bại; khi đạt ngưỡng thì đặt next_retry theo backoff lũy thừa."""
+        now = now or time.time()
+        with self._lock:
+            state = self.hosts.setdefault(host, {'failures': 0})
+            state['failures'] += 1
+            state['last_error'] = error
+            state['last_failure'] = now
+            if self._is_open(state):
+                exponent = state['failures'] - self.threshold
+                state['next_retry'] = now + min(self.max_backoff, self.backoff * (2 ** min(exponent, 32)))
+            self._dirty.add(host)
+
+    def tcp_probe(self, device_config):
+        """Thử mở TCP tới cổng SSH của thiết bị. Returns None nếu được, ngược lại tên loại lỗi."""
+        try:
+            with socket.create_connection((device_config['hostname'], device_config.get('port', 22)),
+                                          timeout=deadline.clamp(PROBE_TIMEOUT)):
+                return None
+        except OSError as e:
+            return type(e).__name__
+
+    def guard(self, collect):
+        """
+        Bọc hàm collect(device_config) (chạy trên thread của thiết bị): probe nếu cần,
+        rồi ghi nhận thành công/thất bại vào store.
+
+        Raises:
+            DeviceUnreachable: Probe thất bại, thiết bị không được collect
+        """
+        def guarded(device_config):
+            host = device_config['hostname']
+            if self.needs_probe(host):
+                error = self.tcp_probe(device_config)
+                if error is not None:
+                    self.record_failure(host, f"Probe{error}")
+                    raise DeviceUnreachable(f"TCP probe to {host}:{device_config.get('port', 22)} failed ({error})")
+            _take_failure()
+            try:
+                metrics = collect(device_config)
+            except DeviceBusy:
+                raise
+            except Exception as e:
+                self.record_failure(host, type(e).__name__)
+                raise
+            error = _take_failure()
+            if error is not None:
+                self.record_failure(host, error)
+            else:
+                self.record_success(host)
+            return metrics
+        return guarded
+
+    def format_metric(self, host, timestamp=None, now=None):
+        """
+        Line protocol collector_device_health cho host đang có lỗi, hoặc None nếu host khoẻ.
+        state là "open" (đang backoff) hoặc "failing" (chưa đạt ngưỡng).
+        """
+        with self._lock:
+            state = self.hosts.get(host)
+            if not state:
+                return None
+            state = dict(state)
+        is_open = self._is_open(state)
+        retry_in = max(0.0, state.get('next_retry', 0) - (now or time.time())) if is_open else 0.0
+        return encode(
+            "collector_device_health",
+            {'agent_host': host},
+            {
+                'state': 'open' if is_open else 'failing',
+                'consecutive_failures': state['failures'],
+                'retry_in_seconds': round(retry_in, 1),
+                'last_error': state.get('last_error', ''),
+            },
+            timestamp,
+        )
+
+    def save(self):
+        """Ghi các host đã thay đổi vào file (không ghi đè host do process khác cập nhật)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            updates = {host: self.hosts.get(host) for host in dirty}
+        try:
+            update_json(self.path, updates)
+        except OSError as e:
+            print(f"Warning: Cannot save device health to {self.path}: {e}", file=sys.stderr)
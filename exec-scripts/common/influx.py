@@ -0,0 +1,385 @@
+"""
+Ghi line protocol thẳng vào InfluxDB v2 (/api/v2/write), không qua stdout và parser
+của Telegraf.
+
+Bật bằng COLLECTOR_OUTPUT=influx (mặc định vẫn là stdout, xem common/output.py).
+InfluxWriter có cùng giao diện với LineWriter: engine gọi write_lines() cho từng
+thiết bị, các dòng được đưa vào một hàng đợi trong bộ nhớ có giới hạn
+(COLLECTOR_INFLUX_MAX_QUEUE dòng, đầy thì bỏ dòng cũ nhất). Một thread nền gom
+batch theo kích thước (COLLECTOR_INFLUX_BATCH_SIZE) hoặc thời gian
+(COLLECTOR_INFLUX_FLUSH_INTERVAL), nén gzip và POST trên một kết nối keep-alive
+dùng lại giữa các batch.
+
+Lỗi mạng, 429 và 5xx: batch được ghi vào spool trên đĩa (common/spool.py) và sink
+được thử lại với backoff lũy thừa (tôn trọng Retry-After); khi gửi được trở lại, spool
+được gửi lại theo batch. Dòng tràn hàng đợi hoặc chưa gửi kịp khi đóng writer cũng vào
+spool. Không có spool (COLLECTOR_SPOOL=0) thì batch lỗi được giữ ở đầu hàng đợi và
+dòng tràn bị bỏ. Các lỗi 4xx khác (line protocol sai, token sai) không thử lại được
+nên batch bị bỏ kèm cảnh báo.
+
+URL, org, bucket và token mặc định lấy từ INFLUX_URL / INFLUX_ORG / INFLUX_BUCKET /
+INFLUX_TOKEN (đã có trong container telegraf), đổi bằng COLLECTOR_INFLUX_*.
+Lưu ý: dữ liệu ghi thẳng không đi qua processor/global_tags/name_override của Telegraf.
+"""
+import collections
+import gzip
+import http.client
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from common import deadline
+from common.spool import Spool
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_QUEUE = 200000
+DEFAULT_TIMEOUT = 10.0
+# Thời gian tối đa chờ gửi hết hàng đợi khi đóng writer (cuối một lần chạy exec)
+DEFAULT_CLOSE_TIMEOUT = 10.0
+
+MIN_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+GZIP_LEVEL = 6
+
+
+class WriteError(Exception):
+    """InfluxDB trả lỗi cho một batch. retryable=False nếu gửi lại cũng không thành công."""
+
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _env_number(name, default, cast=float):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        print(f"Warning: Invalid {name}, using default {default}", file=sys.stderr)
+        return default
+
+
+class InfluxWriter:
+    """
+    Writer gửi batch gzip tới InfluxDB v2.
+    Args:
+        url (str): Ví dụ http://influxdb:8086
+        org (str): Organization
+        bucket (str): Bucket
+        token (str): API token
+        batch_size (int): Số dòng tối đa mỗi request; đủ số này thì gửi ngay
+        flush_interval (float): Gửi phần còn lại sau tối đa chừng này giây
+        max_queue (int): Số dòng tối đa chờ gửi trong bộ nhớ
+        timeout (float): Timeout của mỗi request (giây)
+        spool (Spool): Spool trên đĩa cho dòng không gửi được (common/spool.py), None để bỏ các dòng đó
+    """
+
+    def __init__(self, url, org, bucket, token=None, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT,
+                 spool=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Invalid InfluxDB URL: {url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/") + "/api/v2/write?" + urlencode(
+            {'org': org, 'bucket': bucket, 'precision': 'ns'})
+        self.headers = {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Encoding': 'gzip',
+        }
+        if token:
+            self.headers['Authorization'] = f"Token {token}"
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max(self.batch_size, max_queue)
+        self.timeout = timeout
+
+        self.spool = spool
+        self.count = 0
+        self.sent = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.requests = 0
+        self._queue = collections.deque()
+        self._in_flight = 0
+        # Batch lấy từ hàng đợi đang được gửi; close() đưa nó vào spool nếu thread chưa xong
+        self._batch = None
+        self._flush_waiters = 0
+        self._retry_delay = 0.0
+        self._closed = False
+        # _exited: thread gửi đã kết thúc; _detached: close() đã trả về trước đó, thread tự dọn dẹp
+        self._exited = False
+        self._detached = False
+        self._connection = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls):
+        """InfluxWriter theo COLLECTOR_INFLUX_* (mặc định INFLUX_URL/INFLUX_ORG/INFLUX_BUCKET/INFLUX_TOKEN)."""
+        url = os.getenv('COLLECTOR_INFLUX_URL') or os.getenv('INFLUX_URL')
+        org = os.getenv('COLLECTOR_INFLUX_ORG') or os.getenv('INFLUX_ORG')
+        bucket = os.getenv('COLLECTOR_INFLUX_BUCKET') or os.getenv('INFLUX_BUCKET')
+        if not (url and org and bucket):
+            raise ValueError("COLLECTOR_OUTPUT=influx needs COLLECTOR_INFLUX_URL, COLLECTOR_INFLUX_ORG and "
+                             "COLLECTOR_INFLUX_BUCKET (or INFLUX_URL, INFLUX_ORG, INFLUX_BUCKET)")
+        return cls(
+            url, org, bucket,
+            token=os.getenv('COLLECTOR_INFLUX_TOKEN') or os.getenv('INFLUX_TOKEN'),
+            batch_size=_env_number('COLLECTOR_INFLUX_BATCH_SIZE', DEFAULT_BATCH_SIZE, int),
+            flush_interval=_env_number('COLLECTOR_INFLUX_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+            max_queue=_env_number('COLLECTOR_INFLUX_MAX_QUEUE', DEFAULT_MAX_QUEUE, int),
+            timeout=_env_number('COLLECTOR_INFLUX_TIMEOUT', DEFAULT_TIMEOUT),
+            spool=Spool.from_env(),
+        )
+
+    def write_lines(self, lines):
+        """Đưa các dòng của một thiết bị vào hàng đợi (không chặn chờ mạng)."""
+        if not lines:
+            return
+        overflow_lines = None
+        with self._cond:
+            self._queue.extend(lines)
+            self.count += len(lines)
+            overflow = len(self._queue) - self.max_queue
+            if overflow > 0:
+                overflow_lines = [self._queue.popleft() for _ in range(overflow)]
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        if overflow_lines:
+            self._overflow(overflow_lines, "write queue full")
+
+    def _overflow(self, lines, reason):
+        """Dòng không giữ được trong bộ nhớ: ghi vào spool nếu có, ngược lại bỏ."""
+        if self.spool is not None:
+            try:
+                self.spool.append(lines)
+                with self._cond:
+                    self.spooled += len(lines)
+                return
+            except OSError as e:
+                print(f"Warning: Cannot write to spool {self.spool.directory}: {e}", file=sys.stderr)
+        with self._cond:
+            self.dropped += len(lines)
+        print(f"Warning: InfluxDB {reason}, dropped {len(lines)} line(s)", file=sys.stderr)
+
+    def _spool_ready(self):
+        return self.spool is not None and self._retry_delay == 0 and self.spool.pending()
+
+    def _take_batch(self):
+        """
+        Chờ tới khi đủ một batch, hết flush_interval (và có dữ liệu) hoặc có yêu cầu flush.
+        Khi hàng đợi trống và sink đang hoạt động, lấy batch từ spool.
+
+        Returns:
+            tuple: (lines, spool_token) - spool_token là None với batch từ hàng đợi;
+                   (None, None) khi writer đã đóng
+        """
+        with self._cond:
+            flush_at = time.monotonic() + self.flush_interval
+            while not self._closed and len(self._queue) < self.batch_size:
+                if self._queue and (self._flush_waiters or time.monotonic() >= flush_at):
+                    break
+                if not self._queue and self._spool_ready():
+                    break
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    flush_at = time.monotonic() + self.flush_interval
+                    remaining = self.flush_interval
+                self._cond.wait(remaining)
+            if self._closed:
+                return None, None
+            if self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._batch = batch
+                return batch, None
+            self._in_flight = 1
+        # Đọc spool ngoài khoá để write_lines không phải chờ I/O đĩa
+        try:
+            batch, token = self.spool.read_batch(self.batch_size)
+        except OSError as e:
+            print(f"Warning: Cannot read spool {self.spool.directory}: {e}", file=sys.stderr)
+            batch, token = None, None
+        if not batch:
+            if token is not None:
+                self.spool.commit(token)
+            self._done(0)
+            return [], None
+        return batch, token
+
+    def _requeue(self, batch):
+        with self._cond:
+            self._queue.extendleft(reversed(batch))
+            # Hàng đợi đầy trong lúc batch đang gửi: bỏ các dòng cũ nhất
+            overflow = len(self._queue) - self.max_queue
+            for _ in range(max(0, overflow)):
+                self._queue.popleft()
+            if overflow > 0:
+                self.dropped += overflow
+            self._in_flight = 0
+            self._batch = None
+            self._cond.notify_all()
+
+    def _done(self, sent, dropped=0):
+        with self._cond:
+            self.sent += sent
+            self.dropped += dropped
+            self._in_flight = 0
+            self._batch = None
+            self._cond.notify_all()
+
+    def _claim(self, batch):
+        """True nếu batch đang gửi chưa bị close() lấy lại để đưa vào spool."""
+        with self._cond:
+            return self._batch is batch
+
+    def _run(self):
+        try:
+            self._send_loop()
+        finally:
+            with self._cond:
+                self._exited = True
+                detached = self._detached
+            if detached:
+                self._shutdown()
+
+    def _send_loop(self):
+        while True:
+            batch, spool_token = self._take_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                self._post("".join(line + "\n" for line in batch).encode('utf-8'))
+            except WriteError as e:
+                if not e.retryable:
+                    print(f"Warning: InfluxDB rejected a batch of {len(batch)} line(s), dropping it: {e}", file=sys.stderr)
+                    if spool_token is not None:
+                        self.spool.commit(spool_token)
+                    self._done(0, dropped=len(batch))
+                    continue
+                self._retry_delay = min(MAX_RETRY_DELAY, max(MIN_RETRY_DELAY, self._retry_delay * 2))
+                delay = max(self._retry_delay, e.retry_after or 0)
+                if spool_token is not None:
+                    # Batch vẫn nằm trong spool (chưa commit), sẽ được đọc lại
+                    print(f"Warning: InfluxDB write failed ({e}), spool replay paused for {delay:.0f}s", file=sys.stderr)
+                    self._done(0)
+                elif self.spool is not None:
+                    print(f"Warning: InfluxDB write failed ({e}), spooling {len(batch)} line(s), retry in {delay:.0f}s", file=sys.stderr)
+                    if self._claim(batch):
+                        self._overflow(batch, "write failed")
+                    self._done(0)
+                else:
+                    print(f"Warning: InfluxDB write failed ({e}), retrying {len(batch)} line(s) in {delay:.0f}s", file=sys.stderr)
+                    self._requeue(batch)
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=delay)
+                    if self._closed:
+                        return
+                continue
+            if spool_token is not None:
+                self.spool.commit(spool_token)
+                self.replayed += len(batch)
+            self._retry_delay = 0.0
+            self._done(len(batch))
+
+    def _connect(self):
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+        return self._connection
+
+    def _post(self, body):
+        """Gửi một batch trên kết nối keep-alive; mở lại kết nối nếu server đã đóng nó."""
+        payload = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        try:
+            connection = self._connect()
+            connection.request("POST", self.path, body=payload, headers=self.headers)
+            response = connection.getresponse()
+            detail = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._reset()
+            raise WriteError(type(e).__name__)
+        self.requests += 1
+        if response.will_close:
+            self._reset()
+        if 200 <= response.status < 300:
+            return
+        message = f"HTTP {response.status}: {detail[:200].decode('utf-8', 'replace').strip()}"
+        retry_after = response.getheader('Retry-After')
+        retryable = response.status == 429 or response.status >= 500
+        raise WriteError(message, retryable=retryable,
+                         retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+    def _reset(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def flush(self, timeout=None):
+        """
+        Chờ tới khi mọi dòng trong hàng đợi đã được gửi (hoặc bị bỏ/đưa vào spool), và
+        khi sink đang hoạt động thì tới khi spool cũng đã được gửi hết.
+
+        Returns:
+            bool: False nếu hết `timeout` mà vẫn còn dòng chưa gửi
+        """
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not self._queue and not self._in_flight and not self._spool_ready(), timeout=timeout)
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout=None):
+        """
+        Gửi nốt hàng đợi rồi dừng thread, tổng cộng tối đa `timeout` giây (mặc định
+        COLLECTOR_INFLUX_CLOSE_TIMEOUT, không quá thời gian còn lại trước deadline của
+        process). Phần chưa gửi được ghi vào spool để lần chạy sau gửi tiếp.
+        """
+        if timeout is None:
+            timeout = _env_number('COLLECTOR_INFLUX_CLOSE_TIMEOUT', DEFAULT_CLOSE_TIMEOUT)
+            left = deadline.process_remaining()
+            if left is not None:
+                timeout = min(timeout, left)
+        end = time.monotonic() + timeout
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        # Thread đang gửi dở một batch chỉ được chờ trong phần budget còn lại
+        self._thread.join(timeout=max(0.0, end - time.monotonic()))
+        with self._cond:
+            pending = list(self._queue)
+            self._queue.clear()
+            # Thread chưa xong: batch đang gửi được đưa vào spool (nếu request đó vẫn tới
+            # được InfluxDB thì các điểm trùng chỉ ghi đè lên nhau)
+            if self._batch is not None:
+                pending = self._batch + pending
+                self._batch = None
+        if pending:
+            self._overflow(pending, "not reachable before shutdown")
+        if self.spool is not None and (self.spooled or self.replayed):
+            print(f"Spool: {self.spooled} line(s) spooled, {self.replayed} replayed, "
+                  f"{self.spool.size // 1024} KB pending", file=sys.stderr)
+        with self._cond:
+            # Thread vẫn đang dùng spool và kết nối: để nó đóng chúng khi kết thúc
+            self._detached = not self._exited
+        if not self._detached:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.spool is not None:
+            self.spool.close()
+        self._reset()
@@ -0,0 +1,227 @@
+"""
+Inventory thiết bị dạng file (YAML hoặc CSV) thay cho biến môi trường đánh số.
+
+File được parse một lần và đánh index theo host, vendor (tên driver), site và tag.
+Ở chế độ execd, reload_if_changed() chỉ stat file trước mỗi lần poll và load lại
+khi mtime/kích thước thay đổi, nên có thể thêm/bớt thiết bị mà không phải khởi
+động lại collector. Entry lỗi chỉ làm bỏ qua chính entry đó.
+
+YAML (cần PyYAML):
+
+    defaults:
+      port: 22
+      username: ${SWITCH_USERNAME}
+      password: ${SWITCH_PASSWORD}
+    devices:
+      - host: 172.18.10.11
+        vendor: cisco_sg
+        site: hq
+        tags: [core, floor1]
+      - host: 172.18.10.20
+        vendor: hillstone
+        site: dc1
+        password: ${FW_PASSWORD}
+
+CSV (header bắt buộc, tags phân cách bằng ';'):
+
+    host,vendor,site,tags,port,username,password,enable_password
+    172.18.10.11,cisco_sg,hq,core;floor1,22,admin,${SWITCH_PASSWORD},
+
+Giá trị dạng ${VAR} được thay bằng biến môi trường để mật khẩu không nằm trong file.
+Entry tham chiếu biến môi trường chưa được đặt bị bỏ qua (kèm cảnh báo) thay vì thử
+login với chính chuỗi ${VAR}; mật khẩu có ký tự '$' cần đặt qua biến môi trường.
+"""
+import csv
+import os
+import re
+import sys
+import threading
+
+DEFAULT_PORT = 22
+REQUIRED_FIELDS = ('hostname', 'driver', 'username', 'password')
+
+TAG_SEPARATOR = re.compile(r"[;,\s]+")
+# Cùng cú pháp với os.path.expandvars: $VAR hoặc ${VAR}
+ENV_REFERENCE = re.compile(r"\$(\w+|\{([^}]*)\})")
+
+
+def _expand(value, field):
+    """Thay ${VAR} bằng biến môi trường; ValueError nếu biến chưa được đặt."""
+    if isinstance(value, str) and '$' in value:
+        unset = [match.group(2) or match.group(1) for match in ENV_REFERENCE.finditer(value)
+                 if (match.group(2) or match.group(1)) not in os.environ]
+        if unset:
+            raise ValueError(f"{field} references unset environment variable(s) {', '.join(unset)}")
+        return os.path.expandvars(value)
+    return value
+
+
+def _split_tags(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [tag for tag in TAG_SEPARATOR.split(value) if tag]
+    return [str(tag) for tag in value]
+
+
+def _read_yaml(path):
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("PyYAML is required for YAML inventories (pip3 install pyyaml), or use a CSV inventory")
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(path) as f:
+        data = yaml.load(f, Loader=loader) or {}
+    if isinstance(data, list):
+        return {}, data
+    return data.get('defaults') or {}, data.get('devices') or []
+
+
+def _read_csv(path):
+    with open(path, newline='') as f:
+        rows = [
+            {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+            for row in csv.DictReader(f)
+        ]
+    return {}, rows
+
+
+def _device_config(entry, defaults):
+    """Chuyển một entry của file thành device_config (cùng dạng với load_device_configs)."""
+    entry = {**defaults, **entry}
+    return {
+        'hostname': str(entry.get('host') or entry.get('hostname') or ''),
+        'port': int(entry.get('port') or DEFAULT_PORT),
+        'username': _expand(entry.get('username'), 'username'),
+        'password': _expand(entry.get('password'), 'password'),
+        'enable_password': _expand(entry.get('enable_password'), 'enable_password') or None,
+        'driver': entry.get('vendor') or entry.get('driver'),
+        'site': entry.get('site'),
+        'tags': _split_tags(entry.get('tags')),
+    }
+
+
+class Inventory:
+    """
+    Danh sách thiết bị đọc từ file YAML (.yaml/.yml) hoặc CSV (.csv), có index.
+    Args:
+        path (str): Đường dẫn file inventory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = []
+        self.by_host = {}
+        self.by_vendor = {}
+        self.by_site = {}
+        self.by_tag = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        if self.path.lower().endswith('.csv'):
+            return _read_csv(self.path)
+        return _read_yaml(self.path)
+
+    def load(self):
+        """Parse file và dựng lại các index. Returns số thiết bị đã load."""
+        stamp = self._stat()
+        defaults, entries = self._read()
+
+        devices, by_host, by_vendor, by_site, by_tag = [], {}, {}, {}, {}
+        skipped = 0
+        for position, entry in enumerate(entries, 1):
+            try:
+                device_config = _device_config(entry, defaults)
+            except (TypeError, ValueError, AttributeError) as e:
+                print(f"Warning: Inventory entry {position} in {self.path} is invalid ({e}), skipping", file=sys.stderr)
+                skipped += 1
+                continue
+            missing = [field for field in REQUIRED_FIELDS if not device_config[field]]
+            if missing:
+                print(f"Warning: Inventory entry {position} in {self.path} is missing {', '.join(missing)}, skipping", file=sys.stderr)
+                skipped += 1
+                continue
+            host = device_config['hostname']
+            if host in by_host:
+                print(f"Warning: Duplicate host {host} at inventory entry {position}, keeping the first one", file=sys.stderr)
+                skipped += 1
+                continue
+
+            devices.append(device_config)
+            by_host[host] = device_config
+            by_vendor.setdefault(device_config['driver'], []).append(device_config)
+            if device_config['site']:
+                by_site.setdefault(device_config['site'], []).append(device_config)
+            for tag in device_config['tags']:
+                by_tag.setdefault(tag, []).append(device_config)
+
+        with self._lock:
+            self.devices = devices
+            self.by_host, self.by_vendor, self.by_site, self.by_tag = by_host, by_vendor, by_site, by_tag
+            self._stamp = stamp
+        print(f"Loaded {len(devices)} device(s) from inventory {self.path}"
+              + (f" ({skipped} entries skipped)" if skipped else ""), file=sys.stderr)
+        return len(devices)
+
+    def reload_if_changed(self):
+        """
+        Load lại file nếu mtime hoặc kích thước đã thay đổi kể từ lần load trước.
+        Nếu file mới bị lỗi, danh sách cũ được giữ nguyên.
+
+        Returns:
+            bool: True nếu inventory vừa được load lại
+        """
+        try:
+            stamp = self._stat()
+        except OSError as e:
+            print(f"Warning: Cannot stat inventory {self.path}: {e}", file=sys.stderr)
+            return False
+        if stamp == self._stamp:
+            return False
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Warning: Inventory {self.path} changed but could not be loaded, keeping previous devices: {e}", file=sys.stderr)
+            self._stamp = stamp
+            return False
+        return True
+
+    def select(self, vendor=None, site=None, tag=None, shard=None):
+        """
+        Lọc thiết bị theo vendor (tên driver), site và tag (điều kiện AND), rồi giữ
+        phần thuộc `shard` nếu có (common/shard.py).
+        Dùng index nhỏ nhất làm tập ứng viên thay vì quét toàn bộ danh sách.
+
+        Returns:
+            list: device_config theo thứ tự trong file
+        """
+        with self._lock:
+            indexes = [
+                index.get(key, []) for index, key in
+                ((self.by_vendor, vendor), (self.by_site, site), (self.by_tag, tag)) if key
+            ]
+            candidates = min(indexes, key=len) if indexes else self.devices
+        return [
+            device_config for device_config in candidates
+            if (not vendor or device_config['driver'] == vendor)
+            and (not site or device_config['site'] == site)
+            and (not tag or tag in device_config['tags'])
+            and (shard is None or shard.owns(device_config['hostname']))
+        ]
+
+    def reloader(self, **filters):
+        """
+        Hàm reload cho run_execd: trả về danh sách thiết bị (đã lọc theo `filters`)
+        khi file vừa thay đổi, None nếu không đổi.
+        """
+        def reload():
+            if self.reload_if_changed():
+                return self.select(**filters)
+            return None
+        return reload
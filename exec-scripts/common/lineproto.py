@@ -0,0 +1,203 @@
+"""
+Encoder InfluxDB line protocol dùng chung cho mọi collector.
+
+    measurement,tag1=v1,tag2=v2 field1=1i,field2=0.5,field3="text",field4=true 1700000000000000000
+
+Escape theo spec line protocol:
+- measurement: dấu phẩy, khoảng trắng
+- tag key, tag value, field key: dấu phẩy, dấu bằng, khoảng trắng
+- field string: dấu nháy kép
+Backslash được escape thành \\ ở mọi vị trí (InfluxDB đọc "\\" là một backslash), nên
+giá trị kết thúc bằng backslash không nuốt mất ký tự phân cách phía sau. Xuống dòng,
+CR và tab (không được phép trong một dòng) được thay bằng backslash + n/r/t.
+
+Kiểu field theo kiểu Python: bool -> true/false, int -> 12i, float -> 0.5 (NaN/inf bị
+bỏ vì line protocol không biểu diễn được), str -> "...". Field None bị bỏ; point không
+còn field nào thì không sinh dòng.
+
+SeriesEncoder escape sẵn measurement và các tag cố định (ví dụ agent_host) một lần,
+rồi dùng lại cho mọi point của series đó.
+
+Đường nóng (mỗi field của mỗi point) tránh gọi hàm: kiểu giá trị được xét trực tiếp,
+"key=" của field và ",key=value" của tag đã escape được cache, chuỗi không có ký tự
+đặc biệt không qua translate. Chi phí còn lại so với f-string không escape: xem
+benchmarks/bench_lineproto.py.
+"""
+import functools
+import math
+import re
+import time
+
+_CONTROL = {'\n': '\\\\n', '\r': '\\\\r', '\t': '\\\\t'}
+
+_MEASUREMENT_ESCAPES = str.maketrans({'\\': '\\\\', ',': '\\,', ' ': '\\ ', **_CONTROL})
+_KEY_ESCAPES = str.maketrans({'\\': '\\\\', ',': '\\,', '=': '\\=', ' ': '\\ ', **_CONTROL})
+_STRING_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', **_CONTROL})
+_STRING_SPECIAL = re.compile(r'[\\"\n\r\t]')
+_KEY_SPECIAL = re.compile(r'[\\,= \n\r\t]')
+
+# Measurement, tag và field key lặp lại ở mọi lần chạy (host, tên field) nên kết quả
+# escape được cache
+ESCAPE_CACHE_SIZE = 8192
+
+
+def now_ns():
+    """Timestamp hiện tại (nano giây) cho line protocol."""
+    return time.time_ns()
+
+
+@functools.lru_cache(maxsize=ESCAPE_CACHE_SIZE, typed=True)
+def escape_measurement(name):
+    return str(name).translate(_MEASUREMENT_ESCAPES)
+
+
+@functools.lru_cache(maxsize=ESCAPE_CACHE_SIZE, typed=True)
+def escape_key(key):
+    """Escape tag key, tag value hoặc field key."""
+    key = str(key)
+    return key.translate(_KEY_ESCAPES) if _KEY_SPECIAL.search(key) else key
+
+
+@functools.lru_cache(maxsize=ESCAPE_CACHE_SIZE, typed=True)
+def _tag(key, value):
+    return f",{escape_key(key)}={escape_key(value)}"
+
+
+def _format_string(value):
+    # isalnum() rẻ hơn regex và đúng với phần lớn giá trị (số, tên trạng thái)
+    if not value.isalnum() and _STRING_SPECIAL.search(value):
+        value = value.translate(_STRING_ESCAPES)
+    return '"' + value + '"'
+
+
+def _format_float(value):
+    return repr(value) if math.isfinite(value) else None
+
+
+# Định dạng theo đúng class (bool là lớp con của int nên phải tra chính xác)
+_FORMATTERS = {
+    bool: lambda value: "true" if value else "false",
+    int: lambda value: f"{value}i",
+    float: _format_float,
+    str: _format_string,
+}
+
+
+def format_field_value(value):
+    """Giá trị field theo kiểu, hoặc None nếu không biểu diễn được (None, NaN, inf)."""
+    formatter = _FORMATTERS.get(value.__class__)
+    if formatter is not None:
+        return formatter(value)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{int(value)}i"
+    if isinstance(value, float):
+        return _format_float(float(value))
+    return _format_string(str(value))
+
+
+def _tag_set(tags):
+    # Tag có giá trị rỗng/None không hợp lệ trong line protocol nên bị bỏ; sắp xếp theo
+    # key như InfluxDB khuyến nghị
+    tag_set = ""
+    for key in sorted(tags) if len(tags) > 1 else tags:
+        value = tags[key]
+        if value is not None and value != "":
+            tag_set += _tag(key, value)
+    return tag_set
+
+
+# field key -> "key=" đã escape, dùng bởi encode(); SeriesEncoder có cache riêng
+_FIELD_KEYS = {}
+
+
+def _field_set(fields, keys=_FIELD_KEYS):
+    parts = []
+    for key, value in fields.items():
+        cls = value.__class__
+        if cls is int:
+            formatted = f"{value}i"
+        elif cls is float:
+            # NaN và inf: value - value không phải 0
+            if value - value != 0:
+                continue
+            formatted = repr(value)
+        elif cls is str:
+            formatted = _format_string(value)
+        else:
+            formatted = format_field_value(value)
+            if formatted is None:
+                continue
+        prefix = keys.get(key)
+        if prefix is None:
+            if len(keys) >= ESCAPE_CACHE_SIZE:
+                keys.clear()
+            prefix = keys[key] = escape_key(key) + "="
+        parts.append(prefix + formatted)
+    return ",".join(parts)
+
+
+def encode(measurement, tags, fields, timestamp=None):
+    """
+    Một dòng line protocol.
+    Args:
+        measurement (str): Tên measurement
+        tags (dict): tag -> giá trị (str)
+        fields (dict): field -> giá trị (bool/int/float/str)
+        timestamp (int): Nano giây, mặc định là thời điểm hiện tại
+
+    Returns:
+        str: Dòng line protocol, hoặc None nếu không có field hợp lệ
+    """
+    field_set = _field_set(fields)
+    if not field_set:
+        return None
+    if timestamp is None:
+        timestamp = now_ns()
+    return f"{escape_measurement(measurement)}{_tag_set(tags or {})} {field_set} {timestamp}"
+
+
+class SeriesEncoder:
+    """
+    Encoder cho các point cùng measurement và tag cố định (ví dụ mọi interface của một host).
+    Args:
+        measurement (str): Tên measurement
+        **tags: Tag dùng chung cho mọi point
+    """
+
+    def __init__(self, measurement, **tags):
+        self.measurement = measurement
+        self.tags = tags
+        self._prefix = escape_measurement(measurement) + _tag_set(tags)
+        self._last_key = max(tags) if tags else ""
+        self._field_keys = {}
+
+    def encode(self, fields, timestamp=None, **tags):
+        """Một dòng của series; `tags` là tag riêng của point (gộp với tag cố định, sắp theo key)."""
+        field_set = _field_set(fields, self._field_keys)
+        if not field_set:
+            return None
+        if timestamp is None:
+            timestamp = now_ns()
+        prefix = self._prefix
+        if tags:
+            if min(tags) > self._last_key:
+                # Tag riêng đứng sau mọi tag cố định: chỉ nối thêm vào prefix đã escape
+                prefix += _tag_set(tags)
+            else:
+                prefix = escape_measurement(self.measurement) + _tag_set({**self.tags, **tags})
+        return f"{prefix} {field_set} {timestamp}"
+
+
+def encode_batch(points, timestamp=None):
+    """
+    Render nhiều point (measurement, tags, fields) thành một buffer duy nhất để ghi
+    bằng một lần write; mọi point dùng chung một timestamp.
+    """
+    if timestamp is None:
+        timestamp = now_ns()
+    lines = [encode(measurement, tags, fields, timestamp) for measurement, tags, fields in points]
+    return "".join(line + "\n" for line in lines if line is not None)
@@ -0,0 +1,172 @@
+"""
+State machine đăng nhập tương tác dùng chung cho các collector.
+
+Đi từ banner -> Username -> Password -> '>' -> enable -> '#' dựa trên prompt
+nhận được, thay cho các cặp `time.sleep(1)` + đọc channel cố định 5 giây.
+Mỗi bước kết thúc ngay khi prompt tương ứng xuất hiện. Thời gian login và enable
+được ghi vào collector_stats (phase login / enable, common/stats.py).
+
+Prompt '#' / '>' phải là cả dòng cuối có dạng prompt (common.channel.PROMPT_NAME), và
+chỉ được chấp nhận khi channel im lặng PROMPT_SETTLE giây sau đó: dòng MOTD/banner
+kết thúc bằng '#' rơi đúng ranh giới chunk không kết thúc login sớm hay bị học làm prompt.
+"""
+import re
+import time
+
+from common import deadline, stats
+from common.channel import PROMPT_NAME, TAIL_WINDOW, PromptReader
+from common.lineproto import encode
+
+PRESS_ENTER_PATTERN = re.compile(r"Press <?(?:Enter|any key)>? to continue\W*$", re.IGNORECASE)
+USERNAME_PATTERN = re.compile(r"(?:User ?Name|Username|login)\s*:\s*$", re.IGNORECASE)
+PASSWORD_PATTERN = re.compile(r"Password\s*:\s*$", re.IGNORECASE)
+PRIVILEGED_PROMPT_PATTERN = re.compile(r"(?:^|[\r\n])" + PROMPT_NAME + r"#\s*\Z")
+USER_PROMPT_PATTERN = re.compile(r"(?:^|[\r\n])" + PROMPT_NAME + r">\s*\Z")
+
+# Thời gian channel phải im lặng sau một dòng giống prompt
+PROMPT_SETTLE = 0.2
+
+# Thứ tự phải khớp với các hằng số trạng thái bên dưới
+LOGIN_PATTERNS = [
+    PRESS_ENTER_PATTERN,
+    USERNAME_PATTERN,
+    PASSWORD_PATTERN,
+    PRIVILEGED_PROMPT_PATTERN,
+    USER_PROMPT_PATTERN,
+]
+PRESS_ENTER, USERNAME, PASSWORD, PRIVILEGED, USER_MODE = range(len(LOGIN_PATTERNS))
+
+
+def _tail_state(output):
+    tail = output[-TAIL_WINDOW:]
+    for index, pattern in enumerate(LOGIN_PATTERNS):
+        if pattern.search(tail):
+            return index
+    return None
+
+
+class LoginStateMachine:
+    """
+    Thực hiện login tương tác trên một channel đã mở.
+    Args:
+        channel: paramiko.Channel (hoặc đối tượng có cùng giao diện)
+        username, password: Thông tin đăng nhập
+        enable_password (str): Mật khẩu enable, None nếu không có
+        enable (bool): Gửi 'enable' khi gặp prompt '>'; nếu False thì '>' bị coi là thất bại
+        timeout (float): Giới hạn trên cho toàn bộ quá trình login
+    """
+
+    def __init__(self, channel, username, password, enable_password=None, enable=True, timeout=30):
+        self.reader = PromptReader(channel)
+        self.channel = channel
+        self.username = username
+        self.password = password
+        self.enable_password = enable_password
+        self.enable = enable
+        self.timeout = timeout
+        self.output = ""
+        self.error = None
+        self.duration = None
+        # Thời điểm gửi 'enable', để tách phase enable khỏi phase login
+        self.enable_started = None
+
+    def _fail(self, error):
+        self.error = error
+        return False
+
+    def run(self):
+        """
+        Chạy state machine cho đến khi vào được prompt '#' hoặc thất bại.
+
+        Returns:
+            bool: True nếu login thành công; lỗi nằm ở self.error, output cuối ở self.output
+        """
+        start = time.monotonic()
+        try:
+            return self._run(start + deadline.clamp(self.timeout))
+        finally:
+            end = time.monotonic()
+            self.duration = end - start
+            enable_seconds = end - self.enable_started if self.enable_started is not None else 0.0
+            stats.add_phase("login", self.duration - enable_seconds)
+            if self.enable_started is not None:
+                stats.add_phase("enable", enable_seconds)
+
+    def _read_state(self, login_deadline):
+        """
+        Đọc đến prompt kế tiếp. Dòng giống prompt '#'/'>' mà sau đó channel còn gửi thêm
+        output (banner đang in dở) không được tính, đọc tiếp đến prompt thật.
+
+        Returns:
+            tuple: (output, trạng thái hoặc None nếu hết giờ / channel đóng)
+        """
+        output, state = self.reader.read_until(LOGIN_PATTERNS, login_deadline - time.monotonic())
+        while state in (PRIVILEGED, USER_MODE):
+            extra = self.reader.read_quiet(PROMPT_SETTLE, max(0.0, login_deadline - time.monotonic()))
+            if not extra:
+                break
+            output += extra
+            state = _tail_state(output)
+            if state is None:
+                more, state = self.reader.read_until(LOGIN_PATTERNS, max(0.0, login_deadline - time.monotonic()))
+                output += more
+        return output, state
+
+    def _run(self, login_deadline):
+        username_sent = password_sent = enable_sent = enable_password_sent = False
+
+        while True:
+            remaining = login_deadline - time.monotonic()
+            if remaining <= 0:
+                return self._fail("login timed out")
+            output, state = self._read_state(login_deadline)
+            self.output = output
+
+            if state is None:
+                return self._fail("login timed out waiting for prompt")
+
+            if state == PRESS_ENTER:
+                self.channel.send("\n")
+
+            elif state == USERNAME:
+                if username_sent:
+                    return self._fail("authentication rejected")
+                self.channel.send(self.username + "\n")
+                username_sent = True
+
+            elif state == PASSWORD:
+                if enable_sent:
+                    if not self.enable_password:
+                        return self._fail("enable password required but none provided")
+                    if enable_password_sent:
+                        return self._fail("enable password rejected")
+                    self.channel.send(self.enable_password + "\n")
+                    enable_password_sent = True
+                else:
+                    if password_sent:
+                        return self._fail("authentication rejected")
+                    self.channel.send(self.password + "\n")
+                    password_sent = True
+
+            elif state == PRIVILEGED:
+                self.reader.learn_prompt(output)
+                return True
+
+            elif state == USER_MODE:
+                if not self.enable:
+                    return self._fail("no privileged prompt")
+                if enable_sent:
+                    return self._fail("could not enter privileged EXEC mode")
+                self.channel.send("enable\n")
+                self.enable_started = time.monotonic()
+                enable_sent = True
+
+
+def format_login_metric(host, vendor, success, duration, timestamp=None):
+    """Line protocol cho thời gian login của một thiết bị (measurement collector_login)."""
+    return encode(
+        "collector_login",
+        {'agent_host': host, 'vendor': vendor},
+        {'success': int(bool(success)), 'login_seconds': round(duration, 3)},
+        timestamp,
+    )
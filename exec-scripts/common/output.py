@@ -0,0 +1,50 @@
+"""
+Stage xuất line protocol theo dạng streaming.
+
+Metrics của mỗi thiết bị được ghi và flush ra stdout ngay khi thiết bị đó hoàn tất,
+thay vì gom vào một list lớn và in ở cuối. Telegraf (exec/execd) nhận dữ liệu dần
+dần và bộ nhớ của collector không tăng theo kích thước fleet.
+
+COLLECTOR_OUTPUT=influx thay stdout bằng InfluxWriter (common/influx.py), ghi batch
+gzip thẳng vào InfluxDB.
+"""
+import os
+import sys
+import threading
+
+from common.influx import InfluxWriter
+
+
+class LineWriter:
+    """Ghi line protocol ra một stream, mỗi lần một thiết bị, có khoá để an toàn giữa các thread."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write_lines(self, lines):
+        """Ghi một nhóm dòng (của một thiết bị) bằng một lần write rồi flush."""
+        if not lines:
+            return
+        data = "\n".join(lines) + "\n"
+        with self._lock:
+            self.stream.write(data)
+            self.stream.flush()
+            self.count += len(lines)
+
+    def close(self):
+        self.stream.flush()
+
+
+def create_writer(stream=None):
+    """
+    Writer theo COLLECTOR_OUTPUT: "stdout" (mặc định, LineWriter ghi ra `stream`)
+    hoặc "influx" (InfluxWriter). Gọi close() khi kết thúc để gửi nốt dữ liệu.
+    """
+    output = os.getenv('COLLECTOR_OUTPUT', 'stdout').strip().lower()
+    if output == 'influx':
+        return InfluxWriter.from_env()
+    if output not in ('', 'stdout'):
+        print(f"Warning: Unknown COLLECTOR_OUTPUT '{output}', writing to stdout", file=sys.stderr)
+    return LineWriter(stream)
@@ -0,0 +1,265 @@
+"""
+Chế độ profiling: chạy một lần thu thập dưới cProfile và tracemalloc.
+
+Bật bằng --profile trên các entry point (script vendor, collector.py) hoặc
+COLLECTOR_PROFILE=1. Mỗi lần chạy được profile ghi vào thư mục báo cáo
+(COLLECTOR_PROFILE_DIR, mặc định <thư mục trạng thái>/profiles/<script>):
+
+    <thời điểm>-<pid>-<lần chạy>.pstats   dữ liệu cProfile (pstats, snakeviz...)
+    <thời điểm>-<pid>-<lần chạy>.txt      hàm tốn thời gian nhất và điểm cấp phát lớn nhất
+
+Chỉ COLLECTOR_PROFILE_KEEP lần chạy gần nhất được giữ lại (mặc định 20). Ở chế độ
+execd, COLLECTOR_PROFILE_EVERY=N chỉ profile một trên N lần poll (lần 1, N+1, ...)
+để có thể bật thường xuyên trên production. Cuối mỗi lần chạy được profile, stderr
+có thêm phần tóm tắt: thời gian theo nhóm (regex, đọc channel, giao vận SSH, định
+dạng line protocol) và các hàm nóng nhất.
+
+Thu thập chạy trên thread riêng của từng thiết bị (common/engine.py) nên mỗi lần
+collect có một cProfile.Profile riêng, gộp lại khi lần chạy kết thúc; thread thiết bị
+bị bỏ lại vì quá hạn không được tính, thread nhận gói của paramiko Transport (giải mã)
+cũng vậy. Mặc định đo CPU của từng thread (COLLECTOR_PROFILE_CLOCK=cpu);
+COLLECTOR_PROFILE_CLOCK=wall tính cả thời gian chờ thiết bị. Từ Python 3.12
+cProfile dựa trên sys.monitoring, chỉ một profiler hoạt động được và nó thấy mọi
+thread, nên một profiler duy nhất được dùng với đồng hồ wall.
+COLLECTOR_PROFILE_MEMORY=0 để bỏ tracemalloc (tracemalloc làm chậm đáng kể).
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from common.state import get_state_dir, script_name
+
+DEFAULT_KEEP = 20
+# Số hàm trong tóm tắt stderr và trong báo cáo text
+FOOTER_FUNCTIONS = 8
+REPORT_FUNCTIONS = 40
+REPORT_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 1
+
+# Python 3.12+: một profiler duy nhất thấy mọi thread
+_SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+# Nhóm thời gian trong tóm tắt: (tên, (chuỗi trong tên file...), (chuỗi trong tên hàm...)).
+# tottime không chồng lên nhau nên mỗi hàm chỉ thuộc nhóm đầu tiên khớp.
+CATEGORIES = (
+    ("regex", ("/re/", "/re.py", "sre_"), ("re.Pattern", "_sre.")),
+    ("channel reads", ("common/channel.py", "common/stream.py", "paramiko/channel.py", "paramiko/buffered_pipe.py",
+                       "pexpect/"), ("select.", "recv", "read_nonblocking")),
+    ("ssh transport", ("paramiko/", "cryptography/", "nacl/"), ()),
+    ("line formatting", ("common/lineproto.py", "common/output.py", "common/influx.py", "common/stats.py"), ()),
+    ("state files", ("/json/", "common/state.py"), ("_json.",)),
+    ("threads", ("threading.py",), ("_thread.",)),
+)
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        print(f"Warning: Invalid {name}, using default {default}", file=sys.stderr)
+        return default
+
+
+def _short_name(filename):
+    return os.path.basename(filename) if filename != "~" else ""
+
+
+def _function_label(key):
+    filename, lineno, name = key
+    if filename == "~":
+        return name
+    return f"{_short_name(filename)}:{lineno}({name})"
+
+
+def categorize(key):
+    """Nhóm của một hàm trong pstats (key = (file, dòng, tên hàm)), 'other' nếu không khớp nhóm nào."""
+    filename, _, name = key
+    filename = filename.replace(os.sep, "/")
+    for label, files, names in CATEGORIES:
+        if any(part in filename for part in files) or (filename == "~" and any(part in name for part in names)):
+            return label
+    return "other"
+
+
+class Profiler:
+    """
+    Profiling các lần chạy run_collection, xem docstring của module.
+    Args:
+        directory (str): Thư mục báo cáo
+        every (int): Profile một trên `every` lần chạy
+        keep (int): Số lần chạy giữ lại trong thư mục báo cáo
+        memory (bool): Chụp tracemalloc
+        clock (str): 'cpu' (thời gian CPU của từng thread) hoặc 'wall'
+    """
+
+    def __init__(self, directory, every=1, keep=DEFAULT_KEEP, memory=True, clock="cpu"):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.memory = memory
+        self.clock = "wall" if _SINGLE_PROFILER else clock
+        self.runs = 0
+
+    @classmethod
+    def from_env(cls, enabled=False):
+        """Profiler theo COLLECTOR_PROFILE*, hoặc None nếu không bật (bằng `enabled`/--profile hoặc COLLECTOR_PROFILE)."""
+        if not enabled and os.getenv('COLLECTOR_PROFILE', '0').lower() in ('0', 'false', 'no', 'off', ''):
+            return None
+        clock = os.getenv('COLLECTOR_PROFILE_CLOCK', 'cpu').lower()
+        if clock not in ('cpu', 'wall'):
+            print(f"Warning: Invalid COLLECTOR_PROFILE_CLOCK '{clock}', using cpu", file=sys.stderr)
+            clock = 'cpu'
+        return cls(
+            os.getenv('COLLECTOR_PROFILE_DIR') or os.path.join(get_state_dir(), "profiles", script_name()),
+            every=_env_int('COLLECTOR_PROFILE_EVERY', 1),
+            keep=_env_int('COLLECTOR_PROFILE_KEEP', DEFAULT_KEEP),
+            memory=os.getenv('COLLECTOR_PROFILE_MEMORY', '1').lower() not in ('0', 'false', 'no', 'off'),
+            clock=clock,
+        )
+
+    def begin(self):
+        """Bắt đầu một lần chạy; trả về RunProfile nếu lần chạy này được lấy mẫu, ngược lại None."""
+        self.runs += 1
+        if (self.runs - 1) % self.every:
+            return None
+        return RunProfile(self, self.runs)
+
+    def rotate(self):
+        """Xoá báo cáo cũ, chỉ giữ `keep` lần chạy gần nhất (tên file bắt đầu bằng thời điểm)."""
+        runs = {}
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            if ext in ('.pstats', '.txt'):
+                runs.setdefault(stem, []).append(name)
+        for stem in sorted(runs)[:-self.keep]:
+            for name in runs[stem]:
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class RunProfile:
+    """Một lần chạy đang được profile: Profile của thread chính, của từng thiết bị và tracemalloc."""
+
+    def __init__(self, profiler, run_number):
+        self.profiler = profiler
+        self.run_number = run_number
+        self.started = datetime.now()
+        self.start = time.monotonic()
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        if profiler.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._main = self._new_profile()
+        self._main.enable()
+
+    def _new_profile(self):
+        if self.profiler.clock == "cpu":
+            return cProfile.Profile(time.thread_time)
+        return cProfile.Profile()
+
+    def wrap(self, collect):
+        """Bọc hàm collect(device_config) để mỗi thread thiết bị có Profile riêng."""
+        if _SINGLE_PROFILER:
+            return collect
+
+        def profiled(device_config):
+            profile = self._new_profile()
+            profile.enable()
+            try:
+                return collect(device_config)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append(profile)
+        return profiled
+
+    def finish(self, stream=None):
+        """
+        Dừng profile, ghi báo cáo vào thư mục, xoay vòng thư mục và in tóm tắt ra stderr.
+        Lỗi khi ghi báo cáo chỉ được cảnh báo, không làm hỏng lần chạy.
+        """
+        self._main.disable()
+        wall = time.monotonic() - self.start
+        snapshot, peak = None, 0
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        with self._lock:
+            profiles = [self._main] + self._profiles
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+
+        stream = stream or sys.stderr
+        base = None
+        try:
+            os.makedirs(self.profiler.directory, exist_ok=True)
+            base = os.path.join(self.profiler.directory,
+                                f"{self.started:%Y%m%d-%H%M%S}-{os.getpid()}-{self.run_number}")
+            stats.dump_stats(base + ".pstats")
+            with open(base + ".txt", "w") as f:
+                f.write(self._report(stats, snapshot, peak, wall))
+            self.profiler.rotate()
+        except OSError as e:
+            print(f"Warning: Cannot write profile report to {self.profiler.directory}: {e}", file=stream)
+            base = None
+        print(self._footer(stats, snapshot, peak, wall, base), file=stream)
+
+    def _report(self, stats, snapshot, peak, wall):
+        out = io.StringIO()
+        out.write(f"Run {self.run_number} of {script_name()} at {self.started:%Y-%m-%d %H:%M:%S}, "
+                  f"{wall:.2f}s wall, clock={self.profiler.clock}\n\n")
+        out.write("Time by area (tottime):\n")
+        for label, seconds in _by_category(stats):
+            out.write(f"  {label:<16} {seconds:10.3f}s\n")
+        for sort in ('tottime', 'cumulative'):
+            out.write(f"\nTop functions by {sort}:\n")
+            stats.stream = out
+            stats.sort_stats(sort).print_stats(REPORT_FUNCTIONS)
+        if snapshot is not None:
+            out.write(f"Top allocations (peak traced memory {peak / 1048576:.1f} MiB):\n")
+            for stat in snapshot.statistics('lineno')[:REPORT_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                out.write(f"  {stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}\n")
+        return out.getvalue()
+
+    def _footer(self, stats, snapshot, peak, wall, base):
+        total = stats.total_tt
+        lines = [f"Profile: run {self.run_number}, {wall:.2f}s wall, {total:.2f}s profiled ({self.profiler.clock})"
+                 + (f" -> {base}.txt" if base else "")]
+        lines.append("  by area: " + ", ".join(f"{label} {seconds:.2f}s" for label, seconds in _by_category(stats)))
+        lines.append("  hottest functions (tottime):")
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:FOOTER_FUNCTIONS]
+        for key, (_, calls, tottime, cumtime, _) in entries:
+            lines.append(f"    {tottime:8.3f}s {cumtime:8.3f}s cum {calls:>8}x  {_function_label(key)} [{categorize(key)}]")
+        if snapshot is not None:
+            top = snapshot.statistics('lineno')[:3]
+            lines.append(f"  memory: peak {peak / 1048576:.1f} MiB traced; top: " + ", ".join(
+                f"{_short_name(stat.traceback[0].filename)}:{stat.traceback[0].lineno} {stat.size / 1024:.0f} KiB"
+                for stat in top))
+        return "\n".join(lines)
+
+
+def _by_category(stats):
+    """[(nhóm, tổng tottime)] theo thứ tự giảm dần."""
+    totals = {}
+    for key, (_, _, tottime, _, _) in stats.stats.items():
+        label = categorize(key)
+        totals[label] = totals.get(label, 0.0) + tottime
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,176 @@
+"""
+Scheduler đa chu kỳ cho các nhóm metrics.
+
+Mỗi nhóm (cpu, memory, interfaces, inventory, ...) có chu kỳ riêng; mỗi lần chạy
+chỉ gửi lệnh của các nhóm đã đến hạn. Thời điểm chạy gần nhất của từng nhóm được
+lưu theo thiết bị trong thư mục trạng thái (schedule/<driver>-<host>.json, xem
+common/state.py), nên lịch vẫn đúng với [[inputs.exec]] khởi động lại mỗi chu kỳ.
+
+Nhóm có cache=True (dữ liệu ít thay đổi như 'show inventory') lưu output thô vào
+cùng file: trong thời gian TTL (= chu kỳ của nhóm), metrics được parse lại từ cache
+với timestamp mới thay vì gửi lệnh tới thiết bị.
+
+Chu kỳ mặc định do từng script vendor đặt, đổi bằng COLLECTOR_INTERVAL_<NHÓM>
+(giây, ví dụ COLLECTOR_INTERVAL_INVENTORY=86400; 0 = chạy mọi lần).
+COLLECTOR_SCHEDULE=0 để tắt: mọi nhóm chạy mỗi lần như trước.
+
+Kết quả của mỗi nhóm đến hạn (có metrics hay không) và thời gian parse được ghi vào
+collector_stats (parse_ok, parse_failed, parse_seconds; common/stats.py).
+"""
+import os
+import sys
+import threading
+import time
+
+from common import stats
+from common.state import get_state_dir, load_json, safe_filename, save_json
+
+SCHEDULE_DIR = "schedule"
+
+# Nhóm được coi là đến hạn sớm hơn chu kỳ một chút (10%, tối đa 15s) để jitter
+# của Telegraf không làm nhóm 60s bị lỡ sang chu kỳ sau
+DUE_SLACK_RATIO = 0.1
+MAX_DUE_SLACK = 15.0
+
+
+class MetricGroup:
+    """
+    Một nhóm metrics.
+    Args:
+        name (str): Tên nhóm, dùng cho biến COLLECTOR_INTERVAL_<NAME>
+        interval (float): Chu kỳ mặc định (giây)
+        command (str): Lệnh CLI, được gộp batch với lệnh của các nhóm khác cùng đến hạn
+        parse (callable): parse(output, host, timestamp) -> list metrics, dùng cùng `command`
+        collect (callable): collect(ssh_client, host, timestamp) -> list metrics, cho nhóm không gộp batch được
+        cache (bool): Lưu output vào đĩa và parse lại từ cache khi chưa đến hạn
+        label (str): Tên hiển thị trong log (mặc định là `name`)
+    """
+
+    def __init__(self, name, interval, command=None, parse=None, collect=None, cache=False, label=None):
+        if (command is None) == (collect is None) or (command is not None and parse is None):
+            raise ValueError(f"Metric group '{name}' needs either command and parse, or collect")
+        if cache and command is None:
+            raise ValueError(f"Metric group '{name}': cache needs a command whose raw output can be stored")
+        self.name = name
+        self.interval = interval
+        self.command = command
+        self.parse = parse
+        self.collect = collect
+        self.cache = cache
+        self.label = label or name
+
+
+def _interval_from_env(group):
+    name = f"COLLECTOR_INTERVAL_{group.name.upper()}"
+    value = os.getenv(name)
+    if not value:
+        return group.interval
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        print(f"Warning: Invalid {name}, using default {group.interval}", file=sys.stderr)
+        return group.interval
+
+
+def is_due(last_run, interval, now):
+    """True nếu nhóm chưa từng chạy hoặc đã qua (gần đủ) một chu kỳ kể từ last_run."""
+    if last_run is None:
+        return True
+    return now - last_run >= interval - min(interval * DUE_SLACK_RATIO, MAX_DUE_SLACK)
+
+
+class Scheduler:
+    """
+    Lịch chạy các nhóm metrics của một driver.
+    Args:
+        driver_name (str): Tên driver (phân biệt file trạng thái giữa các vendor)
+        groups (list): Các MetricGroup theo thứ tự xuất metrics
+    """
+
+    def __init__(self, driver_name, groups):
+        self.driver_name = driver_name
+        self.groups = list(groups)
+        self.intervals = {group.name: _interval_from_env(group) for group in self.groups}
+        self.enabled = os.getenv('COLLECTOR_SCHEDULE', '1').lower() not in ('0', 'false', 'no', 'off')
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _path(self, host):
+        directory = os.path.join(get_state_dir(), SCHEDULE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, safe_filename(f"{self.driver_name}-{host}") + ".json")
+
+    def _state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = (load_json(self._path(host), {}) or {}) if self.enabled else {}
+                self._hosts[host] = state
+            return state
+
+    def due_groups(self, host, now=None):
+        """Các nhóm đến hạn của host ở thời điểm `now`."""
+        if not self.enabled:
+            return list(self.groups)
+        now = now or time.time()
+        state = self._state(host)
+        return [
+            group for group in self.groups
+            if is_due((state.get(group.name) or {}).get('last_run'), self.intervals[group.name], now)
+        ]
+
+    def collect(self, ssh_client, host, now=None):
+        """
+        Chạy các nhóm đến hạn trên session `ssh_client` (lệnh của chúng gửi trong một
+        batch) và lấy nhóm cache=True chưa đến hạn từ cache. Với ssh_client=None chỉ
+        trả về metrics từ cache.
+
+        Mọi metrics của lần chạy dùng chung một timestamp.
+
+        Returns:
+            list: Metrics theo thứ tự các nhóm
+        """
+        now = now or time.time()
+        timestamp = int(now * 1e9)
+        state = self._state(host)
+        due = self.due_groups(host, now) if ssh_client is not None else []
+        batched = [group.command for group in due if group.command is not None]
+        outputs = ssh_client.send_commands(batched) if batched else {}
+
+        device_metrics = []
+        changed = False
+        for group in self.groups:
+            entry = state.get(group.name) or {}
+            if group in due:
+                output = None
+                if group.command is not None:
+                    output = outputs.get(group.command)
+                    parse_start = time.monotonic()
+                    metrics = group.parse(output, host, timestamp)
+                    stats.parsed(bool(metrics), time.monotonic() - parse_start)
+                else:
+                    # Nhóm tự gửi lệnh: thời gian lệnh đã nằm trong phase commands
+                    metrics = group.collect(ssh_client, host, timestamp)
+                    stats.parsed(bool(metrics))
+                if not metrics:
+                    # Không đánh dấu đã chạy để lần sau thử lại
+                    print(f"No {group.label} metrics collected from {host}.", file=sys.stderr)
+                    continue
+                entry = {'last_run': now}
+                if group.cache and output:
+                    entry['output'] = output
+                state[group.name] = entry
+                changed = True
+            elif group.cache and entry.get('output'):
+                metrics = group.parse(entry['output'], host, timestamp)
+            else:
+                continue
+            device_metrics.extend(metrics)
+            stats.add_metrics(metrics)
+
+        if changed and self.enabled:
+            try:
+                save_json(self._path(host), state)
+            except OSError as e:
+                print(f"Warning: Cannot save metric schedule for {host}: {e}", file=sys.stderr)
+        return device_metrics
@@ -0,0 +1,112 @@
+"""
+Chia fleet cho nhiều instance collector (sharding).
+
+Mỗi instance chỉ poll phần thiết bị thuộc về nó, theo một trong hai cách:
+
+- index/count: COLLECTOR_SHARD_INDEX (bắt đầu từ 0) và COLLECTOR_SHARD_COUNT. Thiết bị
+  thuộc shard hash(hostname) % count. Đơn giản, nhưng đổi count làm phần lớn thiết bị
+  đổi instance.
+- Consistent-hash ring: COLLECTOR_SHARD_RING là danh sách ID của mọi instance (phân
+  cách bằng dấu phẩy), COLLECTOR_INSTANCE_ID là ID của instance này (mặc định hostname).
+  Thêm/bớt một instance chỉ chuyển khoảng 1/N thiết bị.
+
+Hash là SHA-1 của hostname (không dùng hash() của Python vốn thay đổi theo process),
+nên mọi instance tính ra cùng một cách chia và việc chia lại khi fleet thay đổi là
+xác định.
+"""
+import bisect
+import hashlib
+import os
+import socket
+import sys
+
+DEFAULT_VNODES = 128
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class ModuloShard:
+    """Shard `index` trong `count` shard, theo hash(hostname) % count."""
+
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}: need 0 <= COLLECTOR_SHARD_INDEX < COLLECTOR_SHARD_COUNT")
+        self.index = index
+        self.count = count
+
+    def owns(self, host):
+        return _hash(host) % self.count == self.index
+
+    def select(self, devices):
+        return [device_config for device_config in devices if self.owns(device_config['hostname'])]
+
+    def __str__(self):
+        return f"shard {self.index}/{self.count}"
+
+
+class HashRing:
+    """
+    Consistent-hash ring của các instance, mỗi instance có `vnodes` điểm trên ring.
+    Args:
+        instances (list): ID của các instance
+        vnodes (int): Số điểm ảo mỗi instance (nhiều hơn thì chia đều hơn)
+    """
+
+    def __init__(self, instances, vnodes=DEFAULT_VNODES):
+        if not instances:
+            raise ValueError("Hash ring needs at least one instance")
+        self.instances = sorted(set(instances))
+        points = sorted(
+            (_hash(f"{instance}#{vnode}"), instance)
+            for instance in self.instances for vnode in range(vnodes)
+        )
+        self._positions = [position for position, _ in points]
+        self._owners = [instance for _, instance in points]
+
+    def owner(self, key):
+        """Instance sở hữu key: điểm đầu tiên trên ring theo chiều kim đồng hồ."""
+        index = bisect.bisect(self._positions, _hash(key)) % len(self._positions)
+        return self._owners[index]
+
+
+class RingShard:
+    """Phần fleet của instance `instance_id` trên `ring`."""
+
+    def __init__(self, ring, instance_id):
+        if instance_id not in ring.instances:
+            print(f"Warning: Instance '{instance_id}' is not in COLLECTOR_SHARD_RING, it owns no devices", file=sys.stderr)
+        self.ring = ring
+        self.instance_id = instance_id
+
+    def owns(self, host):
+        return self.ring.owner(host) == self.instance_id
+
+    def select(self, devices):
+        return [device_config for device_config in devices if self.owns(device_config['hostname'])]
+
+    def __str__(self):
+        return f"ring member {self.instance_id} of {len(self.ring.instances)}"
+
+
+def shard_from_env():
+    """
+    Shard của instance này theo biến môi trường, hoặc None nếu không bật sharding.
+    COLLECTOR_SHARD_RING được ưu tiên hơn COLLECTOR_SHARD_INDEX/COLLECTOR_SHARD_COUNT.
+
+    Raises:
+        ValueError: Cấu hình sharding không hợp lệ (tránh việc mọi instance cùng poll cả fleet)
+    """
+    ring = [instance.strip() for instance in os.getenv('COLLECTOR_SHARD_RING', '').split(",") if instance.strip()]
+    if ring:
+        instance_id = os.getenv('COLLECTOR_INSTANCE_ID') or socket.gethostname()
+        return RingShard(HashRing(ring), instance_id)
+
+    count = os.getenv('COLLECTOR_SHARD_COUNT')
+    if not count:
+        return None
+    try:
+        return ModuloShard(int(os.getenv('COLLECTOR_SHARD_INDEX', '0')), int(count))
+    except ValueError as e:
+        raise ValueError(f"Invalid COLLECTOR_SHARD_INDEX/COLLECTOR_SHARD_COUNT: {e}") from None
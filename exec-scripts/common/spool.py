@@ -0,0 +1,209 @@
+"""
+Spool trên đĩa cho line protocol chưa gửi được.
+
+Khi sink (InfluxWriter, common/influx.py) chậm hoặc không truy cập được, các dòng
+không gửi được và các dòng tràn hàng đợi trong bộ nhớ được ghi nối tiếp vào các
+segment (seg-<số thứ tự>.lp) trong thư mục spool thay vì bị bỏ. Khi sink hoạt động
+lại, drainer đọc segment cũ nhất trước và gửi lại theo batch lớn. Vị trí đã gửi
+được lưu trong file cursor, nên process bị kill giữa chừng chỉ gửi lại tối đa một batch.
+
+Segment được xoay vòng khi đạt COLLECTOR_SPOOL_SEGMENT_MB. Khi tổng dung lượng
+vượt COLLECTOR_SPOOL_MAX_MB, segment cũ nhất bị xoá (dữ liệu cũ nhất mất trước).
+Mỗi script dùng một thư mục riêng (spool/<script> trong thư mục trạng thái) có khoá
+flock, nên hai lần chạy chồng nhau của cùng một script không ghi lẫn vào nhau.
+"""
+import fcntl
+import os
+import re
+import sys
+import threading
+
+from common.state import get_state_dir, script_name
+
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SEGMENT_PATTERN = re.compile(r"^seg-(\d{12})\.lp$")
+CURSOR_FILE = "cursor"
+LOCK_FILE = ".lock"
+
+
+class SpoolLocked(Exception):
+    """Thư mục spool đang được process khác dùng."""
+
+
+def default_spool_dir():
+    """spool/<thư mục script>-<tên script> trong thư mục trạng thái, ví dụ spool/cisco-sg-device_cisco."""
+    return os.path.join(get_state_dir(), "spool", script_name())
+
+
+class Spool:
+    """
+    Hàng đợi dòng line protocol trên đĩa, chia thành các segment.
+    Args:
+        directory (str): Thư mục spool (tạo nếu chưa có)
+        segment_bytes (int): Kích thước để xoay sang segment mới
+        max_bytes (int): Tổng dung lượng tối đa; vượt quá thì xoá segment cũ nhất
+
+    Raises:
+        SpoolLocked: Process khác đang giữ thư mục
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.segment_bytes = max(1, segment_bytes)
+        self.max_bytes = max(self.segment_bytes, max_bytes)
+        self.evicted_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise SpoolLocked(f"Spool directory {directory} is in use by another process")
+
+        self._segments = sorted(
+            int(match.group(1)) for match in map(SEGMENT_PATTERN.match, os.listdir(directory)) if match
+        )
+        self._sizes = {sequence: os.path.getsize(self._path(sequence)) for sequence in self._segments}
+        self._cursor = self._load_cursor()
+        self._writer = None
+
+    @classmethod
+    def from_env(cls):
+        """Spool theo COLLECTOR_SPOOL_*, hoặc None nếu COLLECTOR_SPOOL=0 hay thư mục đang bị process khác giữ."""
+        if os.getenv('COLLECTOR_SPOOL', '1').lower() in ('0', 'false', 'no', 'off'):
+            return None
+        try:
+            segment_mb = float(os.getenv('COLLECTOR_SPOOL_SEGMENT_MB', DEFAULT_SEGMENT_BYTES / 1048576))
+            max_mb = float(os.getenv('COLLECTOR_SPOOL_MAX_MB', DEFAULT_MAX_BYTES / 1048576))
+        except ValueError:
+            print("Warning: Invalid COLLECTOR_SPOOL_SEGMENT_MB/COLLECTOR_SPOOL_MAX_MB, using defaults", file=sys.stderr)
+            segment_mb, max_mb = DEFAULT_SEGMENT_BYTES / 1048576, DEFAULT_MAX_BYTES / 1048576
+        try:
+            return cls(os.getenv('COLLECTOR_SPOOL_DIR') or default_spool_dir(),
+                       segment_bytes=int(segment_mb * 1048576), max_bytes=int(max_mb * 1048576))
+        except (SpoolLocked, OSError) as e:
+            print(f"Warning: Spool disabled for this run: {e}", file=sys.stderr)
+            return None
+
+    def _path(self, sequence):
+        return os.path.join(self.directory, f"seg-{sequence:012d}.lp")
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                sequence, offset = f.read().split()
+                return int(sequence), int(offset)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cursor(self, sequence, offset):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + ".tmp", 'w') as f:
+            f.write(f"{sequence} {offset}\n")
+        os.replace(path + ".tmp", path)
+
+    @property
+    def size(self):
+        """Tổng số byte đang nằm trong spool (kể cả phần đã gửi của segment đang đọc)."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def pending(self):
+        with self._lock:
+            if not self._segments:
+                return False
+            if len(self._segments) > 1:
+                return True
+            sequence = self._segments[0]
+            offset = self._cursor[1] if self._cursor and self._cursor[0] == sequence else 0
+            return self._sizes[sequence] > offset
+
+    def append(self, lines):
+        """Ghi nối tiếp các dòng vào segment hiện tại (xoay segment và xoá segment cũ khi cần)."""
+        if not lines:
+            return
+        data = "".join(line + "\n" for line in lines).encode('utf-8')
+        with self._lock:
+            if self._writer is None or self._sizes[self._segments[-1]] >= self.segment_bytes:
+                self._rotate()
+            self._writer.write(data)
+            self._writer.flush()
+            self._sizes[self._segments[-1]] += len(data)
+            self._evict()
+
+    def _rotate(self):
+        if self._writer is not None:
+            self._writer.close()
+        sequence = self._segments[-1] + 1 if self._segments else 1
+        self._writer = open(self._path(sequence), 'ab')
+        self._segments.append(sequence)
+        self._sizes[sequence] = 0
+
+    def _evict(self):
+        while len(self._segments) > 1 and sum(self._sizes.values()) > self.max_bytes:
+            sequence = self._segments.pop(0)
+            size = self._sizes.pop(sequence)
+            self.evicted_bytes += size
+            os.unlink(self._path(sequence))
+            print(f"Warning: Spool over {self.max_bytes // 1048576} MB, evicted oldest segment "
+                  f"({size // 1024} KB)", file=sys.stderr)
+
+    def read_batch(self, max_lines):
+        """
+        Đọc tối đa `max_lines` dòng từ segment cũ nhất, bắt đầu ở cursor.
+
+        Returns:
+            tuple: (lines, token) hoặc (None, None) nếu spool trống; gọi commit(token) sau khi gửi thành công
+        """
+        with self._lock:
+            if not self._segments:
+                return None, None
+            sequence = self._segments[0]
+            if sequence == self._segments[-1] and self._writer is not None:
+                # Không đọc segment đang ghi dở: đóng nó, lần append sau sẽ mở segment mới
+                self._writer.close()
+                self._writer = None
+            offset = self._cursor[1] if self._cursor and self._cursor[0] == sequence else 0
+            with open(self._path(sequence), 'rb') as f:
+                f.seek(offset)
+                lines = []
+                while len(lines) < max_lines:
+                    raw = f.readline()
+                    if not raw.endswith(b"\n"):
+                        # Hết file (hoặc dòng cuối bị cắt do process bị kill khi đang ghi)
+                        if raw:
+                            offset += len(raw)
+                        break
+                    offset += len(raw)
+                    lines.append(raw[:-1].decode('utf-8', 'replace'))
+            return lines, (sequence, offset)
+
+    def commit(self, token):
+        """Đánh dấu đã gửi tới vị trí `token`; segment đã gửi hết thì bị xoá."""
+        sequence, offset = token
+        with self._lock:
+            if sequence not in self._sizes:
+                return
+            if offset >= self._sizes[sequence] and (sequence != self._segments[-1] or self._writer is None):
+                self._segments.remove(sequence)
+                del self._sizes[sequence]
+                os.unlink(self._path(sequence))
+                self._cursor = None
+                try:
+                    os.unlink(os.path.join(self.directory, CURSOR_FILE))
+                except FileNotFoundError:
+                    pass
+            else:
+                self._cursor = (sequence, offset)
+                self._save_cursor(sequence, offset)
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        self._lock_file.close()
@@ -0,0 +1,82 @@
+"""
+Thư mục trạng thái bền vững của collector (giữ qua các lần chạy exec).
+
+Mặc định /tmp/collector-state, đổi bằng COLLECTOR_STATE_DIR. File JSON được ghi
+nguyên tử (ghi file tạm rồi os.replace) để một lần chạy bị kill giữa chừng không
+để lại file hỏng.
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), "collector-state")
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def get_state_dir():
+    """Thư mục trạng thái (tạo nếu chưa có)."""
+    path = os.getenv('COLLECTOR_STATE_DIR') or DEFAULT_STATE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def script_name():
+    """Tên định danh script đang chạy: <thư mục>-<tên script>, ví dụ cisco-sg-device_cisco."""
+    script = os.path.abspath(sys.argv[0] or "collector")
+    return f"{os.path.basename(os.path.dirname(script))}-{os.path.splitext(os.path.basename(script))[0]}"
+
+
+def safe_filename(name):
+    """Tên file an toàn từ tên thiết bị, lệnh...: ký tự không an toàn thay bằng "_"."""
+    return UNSAFE_FILENAME_CHARS.sub("_", name)
+
+
+def state_path(name):
+    return os.path.join(get_state_dir(), name)
+
+
+def load_json(path, default=None):
+    """Đọc file JSON; trả về `default` nếu file chưa có hoặc bị hỏng."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        print(f"Warning: Cannot read state file {path}, starting fresh: {e}", file=sys.stderr)
+        return default
+
+
+def save_json(path, data):
+    """Ghi file JSON nguyên tử."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def update_json(path, updates):
+    """
+    Ghi một số key vào file JSON dạng dict mà không xoá key khác: file được đọc lại
+    ngay trước khi ghi để giữ phần do process khác (script vendor khác) ghi vào.
+    Args:
+        updates (dict): key -> giá trị mới, hoặc None để xoá key
+    """
+    merged = load_json(path, {}) or {}
+    for key, value in updates.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    save_json(path, merged)
@@ -0,0 +1,218 @@
+"""
+Self-instrumentation: chi phí thu thập của từng thiết bị và từng lần chạy, ghi ra
+measurement collector_stats cạnh metrics của thiết bị.
+
+Engine gắn một DeviceStats vào thread đang thu thập thiết bị (giống common.deadline).
+Các lớp bên dưới ghi số đo qua các hàm module, không cần truyền đối tượng qua tham số:
+
+    phase(name)             context manager cộng thời gian vào phase (connect, auth, login...)
+    add_phase(name, s)      cộng sẵn một khoảng thời gian vào phase
+    set_vendor(name)        tag vendor khi device_config không có 'driver'
+    add_bytes(n)            byte nhận được từ thiết bị
+    retry()                 một lần thử lại (bộ thuật toán / phương thức xác thực khác, kết nối lại)
+    command(name, s, n)     thời gian và số byte của một lệnh
+    parsed(ok, s)           kết quả parse một nhóm metrics
+    add_metrics(lines)      metrics đã thu thập xong, engine ghi ra nếu thiết bị bị bỏ lại
+
+Ngoài thread do engine quản lý (không có DeviceStats) các hàm này không làm gì.
+
+Mỗi thiết bị đã chạy có một dòng scope=device (các phase *_seconds, bytes_received,
+retries, commands, parse_ok, parse_failed, queue_wait_seconds) và một dòng scope=command
+cho mỗi lệnh (seconds, bytes, count); mỗi lần chạy có một dòng scope=run.
+COLLECTOR_STATS=0 để tắt, COLLECTOR_STATS_COMMANDS=0 để bỏ các dòng scope=command.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from common.lineproto import encode
+from common.state import script_name
+
+MEASUREMENT = "collector_stats"
+
+_local = threading.local()
+
+
+def _enabled(name):
+    return os.getenv(name, '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def stats_enabled():
+    return _enabled('COLLECTOR_STATS')
+
+
+def command_stats_enabled():
+    return _enabled('COLLECTOR_STATS_COMMANDS')
+
+
+class DeviceStats:
+    """
+    Số đo của một thiết bị trong một lần chạy.
+    Args:
+        host (str): Hostname thiết bị
+        vendor (str): Tên driver (tag vendor), None nếu không biết
+        queue_wait (float): Thời gian chờ trong hàng đợi worker trước khi được thu thập
+    """
+
+    def __init__(self, host, vendor=None, queue_wait=0.0):
+        self.host = host
+        self.vendor = vendor
+        self.queue_wait = queue_wait
+        self.phases = {}
+        # lệnh -> [số lần, tổng giây, tổng byte]
+        self.commands = {}
+        self.bytes_received = 0
+        self.retries = 0
+        self.parse_ok = 0
+        self.parse_failed = 0
+        # Metrics đã thu thập xong (add_metrics), dùng khi thread quá hạn bị bỏ lại
+        self.metrics = []
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_command(self, name, seconds, nbytes=0):
+        entry = self.commands.setdefault(name, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += nbytes
+        self.add_phase("commands", seconds)
+
+    def add_parse(self, ok, seconds=None):
+        if ok:
+            self.parse_ok += 1
+        else:
+            self.parse_failed += 1
+        if seconds is not None:
+            self.add_phase("parse", seconds)
+
+    def format_lines(self, timestamp=None, include_commands=True):
+        """Line protocol collector_stats của thiết bị (scope=device và scope=command)."""
+        tags = {'agent_host': self.host, 'vendor': self.vendor}
+        # Bản sao: thread của thiết bị quá hạn có thể vẫn đang ghi số đo
+        phases = dict(self.phases)
+        commands = dict(self.commands)
+        fields = {f"{name}_seconds": round(seconds, 4) for name, seconds in phases.items()}
+        fields.update({
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'commands': sum(entry[0] for entry in commands.values()),
+            'parse_ok': self.parse_ok,
+            'parse_failed': self.parse_failed,
+            'queue_wait_seconds': round(self.queue_wait, 4),
+        })
+        lines = [encode(MEASUREMENT, dict(tags, scope='device'), fields, timestamp)]
+        if include_commands:
+            for name, (count, seconds, nbytes) in commands.items():
+                lines.append(encode(MEASUREMENT, dict(tags, scope='command', command=name),
+                                    {'count': count, 'seconds': round(seconds, 4), 'bytes': nbytes}, timestamp))
+        return lines
+
+
+class RunStats:
+    """Tổng hợp một lần chạy của engine (dòng scope=run)."""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.start = time.monotonic()
+        self.statuses = {}
+        self.queue_waits = []
+        self.bytes_received = 0
+        self.retries = 0
+        self.commands = 0
+        self.parse_ok = 0
+        self.parse_failed = 0
+
+    def add(self, status, device_stats=None):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if device_stats is not None:
+            self.queue_waits.append(device_stats.queue_wait)
+            self.bytes_received += device_stats.bytes_received
+            self.retries += device_stats.retries
+            self.commands += sum(entry[0] for entry in list(device_stats.commands.values()))
+            self.parse_ok += device_stats.parse_ok
+            self.parse_failed += device_stats.parse_failed
+
+    def format_line(self, timestamp=None):
+        waits = self.queue_waits
+        fields = {
+            'devices': sum(self.statuses.values()),
+            'wall_seconds': round(time.monotonic() - self.start, 3),
+            'concurrency': self.concurrency,
+            'queue_wait_avg_seconds': round(sum(waits) / len(waits), 4) if waits else 0.0,
+            'queue_wait_max_seconds': round(max(waits), 4) if waits else 0.0,
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'commands': self.commands,
+            'parse_ok': self.parse_ok,
+            'parse_failed': self.parse_failed,
+        }
+        fields.update({status: count for status, count in self.statuses.items()})
+        return encode(MEASUREMENT, {'scope': 'run', 'collector': script_name()}, fields, timestamp)
+
+
+def bind(stats):
+    """Gắn DeviceStats vào thread hiện tại (None để gỡ)."""
+    _local.stats = stats
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def set_vendor(name):
+    """Gắn tag vendor cho thiết bị đang thu thập nếu engine chưa biết (device_config không có 'driver')."""
+    stats = current()
+    if stats is not None and not stats.vendor:
+        stats.vendor = name
+
+
+def add_phase(name, seconds):
+    stats = current()
+    if stats is not None:
+        stats.add_phase(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Đo thời gian khối lệnh vào phase `name` (kể cả khi khối lệnh ném exception)."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        add_phase(name, time.monotonic() - start)
+
+
+def add_bytes(count):
+    stats = current()
+    if stats is not None:
+        stats.bytes_received += count
+
+
+def retry():
+    stats = current()
+    if stats is not None:
+        stats.retries += 1
+
+
+def command(name, seconds, nbytes=0):
+    stats = current()
+    if stats is not None:
+        stats.add_command(name, seconds, nbytes)
+
+
+def parsed(ok, seconds=None):
+    stats = current()
+    if stats is not None:
+        stats.add_parse(ok, seconds)
+
+
+def add_metrics(lines):
+    """
+    Ghi nhận metrics thiết bị đã có; engine ghi chúng ra khi thread quá hạn bị bỏ lại
+    trước khi collect trả về.
+    """
+    stats = current()
+    if stats is not None:
+        stats.metrics.extend(lines)
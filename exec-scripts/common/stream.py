@@ -0,0 +1,61 @@
+"""
+Streaming parser cho các lệnh có output rất lớn (ví dụ 'show tech-support memory').
+
+Extractor nhận output theo từng chunk ngay khi đọc được từ channel, chỉ giữ lại
+phần text cần thiết và báo "done" khi đã có đủ field. PromptReader.stream_command
+khi đó ngắt phần output còn lại (Ctrl-C) thay vì đọc hết cả bản dump.
+"""
+
+
+class RegexStreamExtractor:
+    """
+    Extractor dựa trên một regex.
+    Args:
+        pattern: Regex đã compile chứa các field cần lấy
+        anchor (str): Đoạn text đánh dấu vùng chứa field; trước anchor chỉ giữ phần đuôi
+                      đủ để nhận ra anchor bị cắt giữa hai chunk
+        max_window (int): Kích thước tối đa của vùng text được giữ lại
+    """
+
+    def __init__(self, pattern, anchor=None, max_window=8192):
+        self.pattern = pattern
+        self.anchor = anchor
+        self.max_window = max_window
+        self.match = None
+        self.text = ""
+        self.done = False
+        self.chars_seen = 0
+        self._buffer = ""
+        self._anchored = anchor is None
+
+    def feed(self, chunk):
+        """
+        Nhận thêm một đoạn output.
+
+        Returns:
+            bool: True khi đã lấy đủ field (self.match / self.text đã sẵn sàng)
+        """
+        if self.done:
+            return True
+        self.chars_seen += len(chunk)
+        self._buffer += chunk
+
+        if not self._anchored:
+            position = self._buffer.find(self.anchor)
+            if position < 0:
+                keep = len(self.anchor) - 1
+                self._buffer = self._buffer[-keep:] if keep else ""
+                return False
+            self._buffer = self._buffer[position:]
+            self._anchored = True
+
+        match = self.pattern.search(self._buffer)
+        if match:
+            self.match = match
+            self.text = self._buffer[:match.end()]
+            self.done = True
+        elif len(self._buffer) > self.max_window:
+            # Field không nằm gần anchor: bỏ vùng này và tìm anchor tiếp theo
+            self._buffer = self._buffer[-self.max_window:]
+            self._anchored = self.anchor is None
+        return self.done
@@ -0,0 +1,209 @@
+"""
+Template khai báo cho output lệnh CLI (kiểu TextFSM/TTP), dùng chung cho mọi vendor.
+
+Mỗi lệnh của một driver có một Template: regex viết như bình thường, trong đó các
+field cần lấy được đánh dấu bằng {tên:kiểu}. Template được compile một lần (lần parse
+đầu tiên) và trả về record đã ép kiểu, không cần gọi int()/float() trong parser:
+
+    CPU_TEMPLATE = Template("hillstone", "show cpu", [
+        r"Average cpu utilization\\s*:\\s*{avg:float}%",
+        r"Last 1 minute\\s*:\\s*{min1:float}%",
+    ])
+    CPU_TEMPLATE.parse_one(output)  # {'avg': 0.9, 'min1': 2.1} hoặc None
+
+Kiểu field (TYPES): int, float, word (\\S+), quoted (chuỗi trong ngoặc kép, bỏ ngoặc),
+hoặc danh sách lựa chọn a|b|c (giữ nguyên chuỗi). Tên "_" chỉ khớp, không lấy giá trị.
+
+Hai chế độ:
+- Một record (mặc định): mỗi dòng mẫu là một regex riêng, tìm lần khớp đầu tiên trong
+  output (không phụ thuộc thứ tự dòng). Không gộp thành một regex luân phiên: regex
+  luân phiên mất tối ưu tìm theo tiền tố cố định của re và chậm hơn hàng chục lần trên
+  output lớn. parse_one trả về None nếu thiếu field không nằm trong `optional`.
+- each=True: output được quét một lượt, mỗi lần khớp của mẫu (một chuỗi, có thể trải
+  nhiều dòng) là một record; regex chạy với re.MULTILINE để ^ khớp đầu mỗi dòng.
+
+`start`: chỉ tìm sau lần xuất hiện đầu tiên của chuỗi này (ví dụ tiêu đề một mục
+trong bản dump dài); không có `start` trong output thì không có record nào.
+
+Template tự đăng ký theo (driver, lệnh), xem get() và registered().
+"""
+import re
+from functools import lru_cache
+
+# Kiểu field: tên -> (regex của giá trị, hàm ép kiểu); giá trị quoted không gồm ngoặc kép
+TYPES = {
+    'int': (r"\d+", int),
+    'float': (r"\d+(?:\.\d+)?", float),
+    'word': (r"\S+", str),
+    'quoted': (r'[^"]*', str),
+}
+
+PLACEHOLDER = re.compile(r"\{(\w+):([\w|-]+)\}")
+
+_REGISTRY = {}
+
+
+def _field_regex(name, kind):
+    """Regex của một placeholder và hàm ép kiểu (None với field "_")."""
+    if "|" in kind:
+        value, convert = "|".join(re.escape(choice) for choice in kind.split("|")), str
+    elif kind in TYPES:
+        value, convert = TYPES[kind]
+    else:
+        raise ValueError(f"Unknown template field type '{kind}' for '{name}'")
+    group = f"(?:{value})" if name == "_" else f"(?P<{name}>{value})"
+    if kind == 'quoted':
+        group = f'"{group}"'
+    return group, (None if name == "_" else convert)
+
+
+class _Line:
+    """
+    Một dòng mẫu đã compile.
+    Args:
+        pattern (str): Dòng mẫu có placeholder
+        flags (int): Cờ re
+    """
+
+    def __init__(self, pattern, flags=0):
+        fields = []
+
+        def replace(match):
+            name, kind = match.groups()
+            regex, convert = _field_regex(name, kind)
+            if convert is not None:
+                fields.append((name, convert))
+            return regex
+        self.regex = re.compile(PLACEHOLDER.sub(replace, pattern), flags)
+        self.names = tuple(name for name, _ in fields)
+        # str không cần ép kiểu (None)
+        self.fields = tuple((name, None if convert is str else convert) for name, convert in fields)
+        self.converters = tuple((name, convert) for name, convert in self.fields if convert is not None)
+
+    def record(self, match):
+        """Record (dict) của một lần khớp; bỏ nhóm không khớp (trong (...)?)."""
+        values = match.groupdict()
+        if None in values.values():
+            values = {name: value for name, value in values.items() if value is not None}
+        for name, convert in self.converters:
+            if name in values:
+                values[name] = convert(values[name])
+        return values
+
+
+@lru_cache(maxsize=None)
+def compile_lines(lines, each=False):
+    """Compile các dòng mẫu (tuple) thành danh sách _Line; kết quả được cache theo nội dung mẫu."""
+    if each and len(lines) != 1:
+        raise ValueError("A template with each=True takes a single pattern")
+    compiled = [_Line(line, re.MULTILINE if each else 0) for line in lines]
+    names = [name for line in compiled for name in line.names]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate template fields: {', '.join(duplicates)}")
+    return compiled
+
+
+class Template:
+    """
+    Template của một lệnh, xem docstring của module.
+    Args:
+        driver (str): Tên driver (cisco_sg, hillstone, ...)
+        command (str): Lệnh CLI sinh ra output
+        lines (str | list): Dòng mẫu (một chuỗi hoặc danh sách, mỗi phần tử một dòng)
+        each (bool): Mỗi lần khớp là một record
+        start (str): Chỉ tìm sau chuỗi này
+        optional (tuple): Field có thể thiếu (chế độ một record)
+    """
+
+    def __init__(self, driver, command, lines, each=False, start=None, optional=()):
+        self.driver = driver
+        self.command = command
+        self.lines = (lines,) if isinstance(lines, str) else tuple(lines)
+        self.each = each
+        self.start = start
+        self.optional = frozenset(optional)
+        self._compiled = None
+        _REGISTRY[(driver, command)] = self
+
+    def __repr__(self):
+        return f"Template({self.driver!r}, {self.command!r})"
+
+    def _compile(self):
+        if self._compiled is None:
+            lines = compile_lines(self.lines, self.each)
+            required = frozenset(name for line in lines for name in line.names) - self.optional
+            self._compiled = (lines, required)
+        return self._compiled
+
+    @property
+    def regex(self):
+        """Regex đã compile của template một dòng mẫu (ví dụ cho RegexStreamExtractor)."""
+        lines, _ = self._compile()
+        if len(lines) != 1:
+            raise ValueError(f"{self!r} has {len(lines)} patterns, no single regex")
+        return lines[0].regex
+
+    @property
+    def fields(self):
+        return [name for line in self._compile()[0] for name in line.names]
+
+    def _offset(self, output):
+        """Vị trí bắt đầu tìm, -1 nếu output rỗng hoặc không có `start`."""
+        if not output:
+            return -1
+        if self.start is None:
+            return 0
+        position = output.find(self.start)
+        return -1 if position < 0 else position + len(self.start)
+
+    def records(self, output):
+        """Sinh các record (dict field -> giá trị đã ép kiểu) theo thứ tự trong output."""
+        if not self.each:
+            record = self.parse_one(output)
+            if record is not None:
+                yield record
+            return
+        offset = self._offset(output)
+        if offset < 0:
+            return
+        line = self._compile()[0][0]
+        for match in line.regex.finditer(output, offset):
+            yield line.record(match)
+
+    def parse(self, output):
+        """Danh sách record (each=True) hoặc [record] / [] với chế độ một record."""
+        return list(self.records(output))
+
+    def parse_one(self, output):
+        """Record đầu tiên, None nếu không khớp hoặc thiếu field bắt buộc."""
+        offset = self._offset(output)
+        if offset < 0:
+            return None
+        lines, required = self._compile()
+        if self.each:
+            match = lines[0].regex.search(output, offset)
+            return lines[0].record(match) if match is not None else None
+        record = {}
+        for line in lines:
+            match = line.regex.search(output, offset)
+            if match is None:
+                continue
+            # Vòng lặp trực tiếp: dòng mẫu thường chỉ có một hai field, rẻ hơn groupdict()
+            for name, convert in line.fields:
+                value = match[name]
+                if value is not None:
+                    record[name] = convert(value) if convert is not None else value
+        if not record or not required <= record.keys():
+            return None
+        return record
+
+
+def get(driver, command):
+    """Template đã đăng ký cho lệnh `command` của `driver`, None nếu không có."""
+    return _REGISTRY.get((driver, command))
+
+
+def registered(driver=None):
+    """Các template đã đăng ký (của một driver nếu có)."""
+    return [template for (name, _), template in sorted(_REGISTRY.items()) if driver is None or name == driver]
@@ -1,10 +1,8 @@
+import argparse
 import paramiko
-import time
 import os
 import re
 import sys
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # --- Thông tin kết nối và xác thực ---
@@ -13,38 +11,58 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(script_dir, '.env')
 load_dotenv(env_path)
 
+# Thư viện dùng chung nằm ở exec-scripts/common
+sys.path.insert(0, os.path.dirname(script_dir))
+from common import deadline, stats
+from common.channel import PromptReader
+from common.engine import run_collection
+from common.execd import run_execd
+from common.health import HealthStore, mark_failure
+from common.profiling import Profiler
+from common.inventory import Inventory
+from common.shard import shard_from_env
+from common.templates import Template
+from common.output import create_writer
+from common.schedule import MetricGroup, Scheduler
+from common.lineproto import encode
+from common.login import LoginStateMachine, format_login_metric
+
+# Tên driver trong collector hợp nhất (common.drivers), cũng là tag vendor của collector_login
+DRIVER_NAME = "hillstone"
+
 # Load cấu hình thiết bị từ biến môi trường
 
-def load_device_configs():
+def load_device_configs(env=None):
     """Load tất cả cấu hình thiết bị Hillstone từ biến môi trường"""
+    env = os.environ if env is None else env
     devices = []
-    device_num = 1
-    
-    while True:
-        host_key = f'HILLSTONE_HOST_{device_num}'
-        host = os.getenv(host_key)
-        
+    # Quét mọi chỉ số có trong env: một chỉ số bị thiếu không làm mất các thiết bị phía sau
+    host_keys = re.compile(r"HILLSTONE_HOST_(\d+)$")
+    device_nums = sorted(int(match.group(1)) for match in map(host_keys.match, env) if match)
+
+    for device_num in device_nums:
+        host = env.get(f'HILLSTONE_HOST_{device_num}')
         if not host:
-            break
-            
+            continue
+
         device_config = {
             'hostname': host,
-            'port': int(os.getenv(f'HILLSTONE_PORT_{device_num}', 22)),
-            'username': os.getenv(f'HILLSTONE_USERNAME_{device_num}'),
-            'password': os.getenv(f'HILLSTONE_PASSWORD_{device_num}')
+            'port': int(env.get(f'HILLSTONE_PORT_{device_num}') or 22),
+            'username': env.get(f'HILLSTONE_USERNAME_{device_num}'),
+            'password': env.get(f'HILLSTONE_PASSWORD_{device_num}')
         }
         
         # Validate required fields
         if device_config['username'] and device_config['password']:
             devices.append(device_config)
-            print(f"Loaded device config for {host}", file=sys.stderr)
         else:
             print(f"Warning: Incomplete config for device {device_num}, skipping", file=sys.stderr)
-            
-        device_num += 1
     
     return devices
 
+# Lệnh khởi tạo phiên: tắt phân trang để output dài không dừng ở "--More--"
+TERMINAL_SETUP_COMMANDS = ["terminal length 0"]
+
 # --- Lớp xử lý kết nối và tương tác SSH ---
 class HillstoneSSHClient:
     def __init__(self, hostname, port, username, password):
@@ -54,32 +72,31 @@ class HillstoneSSHClient:
         self.password = password
         self.client = None
         self.channel = None
-
-    def _read_channel_output(self, timeout=5):
-        output = ""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.channel and self.channel.recv_ready():
-                output += self.channel.recv(4096).decode('utf-8', errors='ignore')
-            else:
-                time.sleep(0.1)
-        return output
+        self.reader = None
+        self.login_duration = None
+        # Loại lỗi kết nối/login gần nhất, dùng cho circuit breaker (common.health)
+        self.last_error = None
 
     def connect(self):
         try:
             self.client = paramiko.SSHClient()
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.client.connect(
-                hostname=self.hostname,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                timeout=15
-            )
+            # SSHClient.connect gồm cả key exchange và xác thực: cả hai nằm trong phase connect
+            with stats.phase("connect"):
+                self.client.connect(
+                    hostname=self.hostname,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password,
+                    timeout=deadline.clamp(15),
+                    banner_timeout=deadline.clamp(15),
+                    auth_timeout=deadline.clamp(15)
+                )
             print(f"SSH connected to {self.hostname}.", file=sys.stderr)
             return True
         except Exception as e:
             print(f"Error: SSH connection failed to {self.hostname}: {e}", file=sys.stderr)
+            self.last_error = type(e).__name__
             self.client = None
             return False
 
@@ -88,167 +105,226 @@ class HillstoneSSHClient:
             return False
         try:
             self.channel = self.client.invoke_shell()
-            time.sleep(1)
-            output = self._read_channel_output()
-
-            if "Username:" in output or "login:" in output:
-                self.channel.send(self.username + "\n")
-                time.sleep(1)
-                output = self._read_channel_output()
-
-            if "Password:" in output:
-                self.channel.send(self.password + "\n")
-                time.sleep(1)
-                output = self._read_channel_output()
-
-            # Hillstone: chỉ cần có dòng kết thúc bằng # hoặc chứa [DBG]# là login thành công
-            lines = output.strip().splitlines()
-            has_prompt = any(line.strip().endswith('#') or '[DBG]#' in line for line in lines)
-            if has_prompt:
+            # Hillstone: chỉ cần có prompt kết thúc bằng # (kể cả [DBG]#) là login thành công
+            login = LoginStateMachine(self.channel, self.username, self.password, enable=False)
+            success = login.run()
+            self.login_duration = login.duration
+            if success:
+                self.reader = login.reader
+                if not self.reader.setup_terminal(TERMINAL_SETUP_COMMANDS):
+                    print(f"Warning: Terminal setup did not complete on {self.hostname}, relying on --More-- handling.", file=sys.stderr)
                 return True
             else:
-                print(f"Error: Could not login to {self.hostname}. Final output: {output}", file=sys.stderr)
+                print(f"Error: Could not login to {self.hostname} ({login.error}). Final output: {login.output}", file=sys.stderr)
                 return False
         except Exception as e:
             print(f"Error: Interactive login failed on {self.hostname}: {e}", file=sys.stderr)
             self.channel = None
             return False
 
-    def send_command(self, command, delay=2):
-        if not self.channel:
+    def _clean_output(self, output, command):
+        output_lines = output.strip().splitlines()
+        clean_output = []
+        for line in output_lines:
+            if not line.strip().startswith(command.strip()) and \
+               not line.strip().endswith('#') and \
+               not line.strip() == '':
+                clean_output.append(line.strip())
+        return "\n".join(clean_output).strip()
+
+    def send_command(self, command, timeout=10):
+        if not self.channel or not self.reader:
             print(f"Error: No channel available to execute command '{command}'.", file=sys.stderr)
             return None
         try:
-            self.channel.send(command + "\n")
-            time.sleep(delay)
-            output = ""
-            start_time = time.time()
-            while time.time() - start_time < 10:
-                if self.channel.recv_ready():
-                    output += self.channel.recv(4096).decode('utf-8', errors='ignore')
-                else:
-                    time.sleep(0.1)
-                if output.strip().endswith('#'):
-                    break
-            output_lines = output.strip().splitlines()
-            clean_output = []
-            for line in output_lines:
-                if not line.strip().startswith(command.strip()) and \
-                   not line.strip().endswith('#') and \
-                   not line.strip() == '':
-                    clean_output.append(line.strip())
-            return "\n".join(clean_output).strip()
+            output, complete = self.reader.send_command(command, timeout)
+            if not complete:
+                print(f"Warning: Prompt not seen within {timeout}s for '{command}' on {self.hostname}, output may be truncated.", file=sys.stderr)
+            return self._clean_output(output, command)
         except Exception as e:
             print(f"Error: Failed to execute command '{command}' on {self.hostname}: {e}", file=sys.stderr)
             return None
 
+    def send_commands(self, commands, timeout=10):
+        """Gửi nhiều lệnh trong một round-trip. Returns dict lệnh -> output đã làm sạch."""
+        if not self.channel or not self.reader:
+            print(f"Error: No channel available to execute commands {commands}.", file=sys.stderr)
+            return {command: None for command in commands}
+        try:
+            outputs, complete = self.reader.send_batch(commands, timeout * len(commands))
+            if not complete:
+                print(f"Warning: Not all prompts seen for {commands} on {self.hostname}, some outputs may be truncated.", file=sys.stderr)
+            results = {}
+            for command, output in zip(commands, outputs):
+                if output.strip() and not output.strip().startswith(command.strip()):
+                    print(f"Warning: Echo of '{command}' not found at start of its output on {self.hostname}.", file=sys.stderr)
+                results[command] = self._clean_output(output, command)
+            return results
+        except Exception as e:
+            print(f"Error: Failed to execute commands {commands} on {self.hostname}: {e}", file=sys.stderr)
+            return {command: None for command in commands}
+
+    def is_alive(self):
+        if not self.client or not self.channel or self.channel.closed:
+            return False
+        if self.reader and not self.reader.in_sync:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
     def close(self):
         if self.client:
             self.client.close()
 
 # --- Hàm thu thập metrics và format cho Telegraf ---
-def get_cpu_stats(ssh_client, host):
-    """Thu thập CPU metrics từ lệnh 'show cpu' trên Hillstone."""
-    output = ssh_client.send_command("show cpu")
+# Ví dụ output:
+# Average cpu utilization : 0.9%
+# Current cpu utilization : 2.0%
+# Last 1 minute : 2.1%
+# Last 5 minutes : 1.7%
+# Last 15 minutes : 1.8%
+CPU_TEMPLATE = Template(DRIVER_NAME, "show cpu", [
+    r"Average cpu utilization\s*:\s*{avg:float}%",
+    r"Current cpu utilization\s*:\s*{cur:float}%",
+    r"Last 1 minute\s*:\s*{min1:float}%",
+    r"Last 5 minutes\s*:\s*{min5:float}%",
+    r"Last 15 minutes\s*:\s*{min15:float}%",
+])
+
+def parse_cpu_stats(output, host, timestamp=None):
+    """Parse output của 'show cpu' trên Hillstone thành CPU metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
     if output:
-        # Ví dụ output:
-        # Average cpu utilization : 0.9%
-        # Current cpu utilization : 2.0%
-        # Last 1 minute : 2.1%
-        # Last 5 minutes : 1.7%
-        # Last 15 minutes : 1.8%
-        avg_pattern = r"Average cpu utilization\s*:\s*([\d.]+)%"
-        cur_pattern = r"Current cpu utilization\s*:\s*([\d.]+)%"
-        min1_pattern = r"Last 1 minute\s*:\s*([\d.]+)%"
-        min5_pattern = r"Last 5 minutes\s*:\s*([\d.]+)%"
-        min15_pattern = r"Last 15 minutes\s*:\s*([\d.]+)%"
-        avg = re.search(avg_pattern, output)
-        cur = re.search(cur_pattern, output)
-        min1 = re.search(min1_pattern, output)
-        min5 = re.search(min5_pattern, output)
-        min15 = re.search(min15_pattern, output)
-        if avg and cur and min1 and min5 and min15:
-            metrics.append(
-                f"hillstone_cpu,agent_host={host} avg={float(avg.group(1))},cur={float(cur.group(1))},min1={float(min1.group(1))},min5={float(min5.group(1))},min15={float(min15.group(1))} {timestamp}"
-            )
+        cpu = CPU_TEMPLATE.parse_one(output)
+        if cpu:
+            # Thứ tự field cố định, không phụ thuộc thứ tự dòng trong output
+            fields = {name: cpu[name] for name in ('avg', 'cur', 'min1', 'min5', 'min15')}
+            metrics.append(encode("hillstone_cpu", {'agent_host': host}, fields, timestamp))
         else:
             print(f"Warning: 'show cpu' output not parsed as expected for {host}. Raw output:\n{output}", file=sys.stderr)
     return metrics
 
-def get_memory_stats(ssh_client, host):
-    """Thu thập Memory metrics từ 'show memory' trên Hillstone."""
-    output = ssh_client.send_command("show memory")
+def get_cpu_stats(ssh_client, host, timestamp=None):
+    """Thu thập CPU metrics từ lệnh 'show cpu' trên Hillstone."""
+    return parse_cpu_stats(ssh_client.send_command("show cpu"), host, timestamp)
+
+# Ví dụ output:
+# The percentage of memory utilization: 25%
+#    total(KB)    used(KB)   free(KB)
+#    2097152      528078     1569074
+MEMORY_TEMPLATE = Template(DRIVER_NAME, "show memory", [
+    r"The percentage of memory utilization:\s*{usage:float}%",
+    r"{total:int}\s+{used:int}\s+{free:int}",
+])
+
+def parse_memory_stats(output, host, timestamp=None):
+    """Parse output của 'show memory' trên Hillstone thành Memory metrics."""
     metrics = []
-    timestamp = int(time.time() * 1e9)
     if output:
-        # Ví dụ output:
-        # The percentage of memory utilization: 25%
-        #    total(KB)    used(KB)   free(KB)
-        #    2097152      528078     1569074   
-        percent_pattern = r"The percentage of memory utilization:\s*([\d.]+)%"
-        mem_pattern = r"(\d+)\s+(\d+)\s+(\d+)"
-        percent = re.search(percent_pattern, output)
-        mem = re.search(mem_pattern, output)
-        if percent and mem:
-            total = int(mem.group(1))
-            used = int(mem.group(2))
-            free = int(mem.group(3))
-            usage = float(percent.group(1))
-            metrics.append(
-                f"hillstone_memory,agent_host={host} total={total}i,used={used}i,free={free}i,usage={usage} {timestamp}"
-            )
+        memory = MEMORY_TEMPLATE.parse_one(output)
+        if memory:
+            fields = {name: memory[name] for name in ('total', 'used', 'free', 'usage')}
+            metrics.append(encode("hillstone_memory", {'agent_host': host}, fields, timestamp))
         else:
             print(f"Warning: 'show memory' output not parsed as expected for {host}. Raw output:\n{output}", file=sys.stderr)
     return metrics
 
-def collect_metrics_from_device(device_config):
+def get_memory_stats(ssh_client, host, timestamp=None):
+    """Thu thập Memory metrics từ 'show memory' trên Hillstone."""
+    return parse_memory_stats(ssh_client.send_command("show memory"), host, timestamp)
+
+def open_session(device_config):
+    """Kết nối và login. Returns (HillstoneSSHClient hoặc None, metrics của bước login)."""
     host = device_config['hostname']
-    print(f"Starting metrics collection for {host}", file=sys.stderr)
+    stats.set_vendor(DRIVER_NAME)
     ssh_client = HillstoneSSHClient(
         hostname=device_config['hostname'],
         port=device_config['port'],
         username=device_config['username'],
         password=device_config['password']
     )
-    device_metrics = []
-    if ssh_client.connect() and ssh_client.interactive_login():
-        print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
-        cpu_metrics = get_cpu_stats(ssh_client, host)
-        if cpu_metrics:
-            device_metrics.extend(cpu_metrics)
-        else:
-            print(f"No CPU metrics collected from {host}.", file=sys.stderr)
-        memory_metrics = get_memory_stats(ssh_client, host)
-        if memory_metrics:
-            device_metrics.extend(memory_metrics)
-        else:
-            print(f"No Memory metrics collected from {host}.", file=sys.stderr)
+    login_metrics = []
+    logged_in = ssh_client.connect() and ssh_client.interactive_login()
+    if ssh_client.login_duration is not None:
+        login_metrics.append(format_login_metric(host, DRIVER_NAME, logged_in, ssh_client.login_duration))
+        stats.add_metrics(login_metrics)
+    if not logged_in:
+        print(f"Failed to establish SSH connection or login for {host}. Check credentials and device configuration.", file=sys.stderr)
+        mark_failure(ssh_client.last_error or "LoginFailed")
+        ssh_client.close()
+        return None, login_metrics
+    print(f"Successfully connected to {host}, collecting metrics...", file=sys.stderr)
+    return ssh_client, login_metrics
+
+def replay_session(channel):
+    """Client trên channel phát lại (common.capture.ReplayChannel), dùng bởi benchmarks/bench_replay.py."""
+    ssh_client = HillstoneSSHClient("replay", 22, None, None)
+    ssh_client.channel = channel
+    ssh_client.reader = PromptReader(channel)
+    if channel.prompt:
+        ssh_client.reader.learn_prompt(channel.prompt)
+    return ssh_client
+
+# Các nhóm metrics và chu kỳ mặc định (giây, đổi bằng COLLECTOR_INTERVAL_<NHÓM>);
+# lệnh của các nhóm đến hạn được gửi trong cùng một round-trip
+METRIC_GROUPS = [
+    MetricGroup("cpu", 30, command="show cpu", parse=parse_cpu_stats, label="CPU"),
+    MetricGroup("memory", 60, command="show memory", parse=parse_memory_stats, label="Memory"),
+]
+
+SCHEDULER = Scheduler(DRIVER_NAME, METRIC_GROUPS)
+
+def collect_metrics_from_session(ssh_client, host):
+    return SCHEDULER.collect(ssh_client, host)
+
+def collect_metrics_from_device(device_config):
+    host = device_config['hostname']
+    if not SCHEDULER.due_groups(host):
+        print(f"No metric groups due for {host}, skipping connection", file=sys.stderr)
+        return SCHEDULER.collect(None, host)
+    print(f"Starting metrics collection for {host}", file=sys.stderr)
+    ssh_client, device_metrics = open_session(device_config)
+    if ssh_client:
+        device_metrics.extend(collect_metrics_from_session(ssh_client, host))
         ssh_client.close()
         print(f"Completed metrics collection for {host}", file=sys.stderr)
-    else:
-        print(f"Failed to establish SSH connection or login for {host}. Check credentials and device configuration.", file=sys.stderr)
     return device_metrics
 
 # --- Main execution ---
 if __name__ == "__main__":
-    devices = load_device_configs()
+    parser = argparse.ArgumentParser(description="Collect Hillstone firewall metrics for Telegraf")
+    parser.add_argument("--execd", action="store_true",
+                        help="Run as a resident Telegraf execd process (poll on each stdin line, keep sessions open)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile runs with cProfile/tracemalloc (same as COLLECTOR_PROFILE=1, see common/profiling.py)")
+    parser.add_argument("--inventory", default=os.getenv('COLLECTOR_INVENTORY'),
+                        help=f"Device inventory file (YAML/CSV) instead of numbered env vars; only {DRIVER_NAME} entries are used")
+    args = parser.parse_args()
+    # Load all device configurations (inventory file nếu có, ngược lại từ biến môi trường)
+    inventory = Inventory(args.inventory) if args.inventory else None
+    devices = inventory.select(vendor=DRIVER_NAME) if inventory else load_device_configs()
     if not devices:
         print("No valid device configurations found in .env file.", file=sys.stderr)
         sys.exit(1)
+    # Sharding: nhiều instance chia nhau fleet, instance này chỉ poll phần của nó
+    # (COLLECTOR_SHARD_INDEX/COLLECTOR_SHARD_COUNT hoặc COLLECTOR_SHARD_RING)
+    shard = shard_from_env()
+    if shard is not None:
+        total = len(devices)
+        devices = shard.select(devices)
+        print(f"Sharding ({shard}): {len(devices)} of {total} device(s) assigned to this instance", file=sys.stderr)
+
     print(f"Found {len(devices)} device(s) to monitor", file=sys.stderr)
-    all_metrics = []
-    LIMIT_WORKERS = 3
-    max_workers = min(len(devices), LIMIT_WORKERS)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_device = {executor.submit(collect_metrics_from_device, device): device for device in devices}
-        for future in as_completed(future_to_device):
-            device = future_to_device[future]
-            try:
-                device_metrics = future.result()
-                all_metrics.extend(device_metrics)
-            except Exception as exc:
-                print(f"Device {device['hostname']} generated an exception: {exc}", file=sys.stderr)
-    for metric_line in all_metrics:
-        print(metric_line)
\ No newline at end of file
+    # Circuit breaker: thiết bị lỗi liên tiếp bị bỏ qua theo backoff (COLLECTOR_BREAKER=0 để tắt)
+    health = HealthStore.from_env()
+    # Profiling: --profile hoặc COLLECTOR_PROFILE=1, báo cáo trong COLLECTOR_PROFILE_DIR
+    profiler = Profiler.from_env(args.profile)
+    if args.execd:
+        reload = inventory.reloader(vendor=DRIVER_NAME, shard=shard) if inventory else None
+        run_execd(devices, open_session, collect_metrics_from_session, reload=reload, health=health, profiler=profiler)
+        sys.exit(0)
+    # Thu thập song song trên event loop asyncio, giới hạn bởi COLLECTOR_CONCURRENCY;
+    # metrics của mỗi thiết bị được ghi ra stdout ngay khi thiết bị đó hoàn tất
+    writer = create_writer()
+    run_collection(devices, collect_metrics_from_device, writer, health=health, profiler=profiler)
+    writer.close()